@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Project, Eval, EndpointIntegration, EvalSet, EvalSetItem, 
-    CodeVersion, EvalRun, RunResult
+    CodeVersion, EvalRun, EvalRunShard, RunResult, RunMetricSummary, Job
 )
 
 
@@ -69,7 +69,7 @@ class CodeVersionAdmin(admin.ModelAdmin):
     list_display = ['eval', 'version', 'is_active', 'created_by', 'created_at']
     list_filter = ['is_active', 'created_at', 'eval']
     search_fields = ['eval__name', 'created_by__username']
-    readonly_fields = ['id', 'created_at', 'version']
+    readonly_fields = ['id', 'created_at', 'version', 'code_sha256']
     
     def get_readonly_fields(self, request, obj=None):
         if obj:
@@ -91,3 +91,27 @@ class RunResultAdmin(admin.ModelAdmin):
     list_filter = ['created_at', 'run__status']
     search_fields = ['run__eval__name']
     readonly_fields = ['id', 'created_at']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'worker', 'lease_expires_at', 'created_at', 'completed_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['worker', 'error']
+    readonly_fields = ['id', 'created_at', 'started_at', 'heartbeat_at', 'completed_at']
+
+
+@admin.register(EvalRunShard)
+class EvalRunShardAdmin(admin.ModelAdmin):
+    list_display = ['run', 'index', 'first_row', 'last_row', 'status', 'worker', 'attempts', 'lease_expires_at']
+    list_filter = ['status']
+    search_fields = ['worker', 'error']
+    readonly_fields = ['id', 'heartbeat_at', 'started_at', 'completed_at']
+
+
+@admin.register(RunMetricSummary)
+class RunMetricSummaryAdmin(admin.ModelAdmin):
+    list_display = ['run', 'source', 'name', 'count', 'minimum', 'maximum', 'updated_at']
+    list_filter = ['source']
+    search_fields = ['name']
+    readonly_fields = ['id', 'updated_at']
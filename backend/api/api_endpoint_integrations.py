@@ -1,12 +1,18 @@
-from ninja import Router
+from ninja import Query, Router
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
-from typing import List
+from typing import List, Optional
 import json
 
-from .models import Eval, EndpointIntegration, CodeVersion, EvalSet
-from .completion_gateway import LLMCompletionsGateway
-from .helpers import retrieve_csv_from_azure
+from .models import Eval, EndpointIntegration, CodeVersion, EvalSet, hash_code
+from .completion_gateway import get_gateway
+from .helpers import aget_object_or_404, validate_sample_size
+from .pagination import paginate
+from .sample_cache import aget_eval_set_sample
 from .schemas import (
     EndpointIntegrationCreateSchema,
     EndpointIntegrationUpdateSchema,
@@ -38,17 +44,38 @@ def create_endpoint_integration(request, integration_data: EndpointIntegrationCr
     return integration
 
 
-@router.get("/endpoint-integrations", response=List[EndpointIntegrationListSchema])
-def list_endpoint_integrations(request):
+@router.get(
+    "/endpoint-integrations",
+    response=List[EndpointIntegrationListSchema],
+)
+def list_endpoint_integrations(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
     integrations = EndpointIntegration.objects.all()
-    return integrations
+    return paginate(
+        integrations, EndpointIntegrationListSchema, cursor, limit, fields
+    )
 
 
-@router.get("/evals/{eval_id}/endpoint-integrations", response=List[EndpointIntegrationListSchema])
-def list_eval_endpoint_integrations(request, eval_id: str):
+@router.get(
+    "/evals/{eval_id}/endpoint-integrations",
+    response=List[EndpointIntegrationListSchema],
+)
+def list_eval_endpoint_integrations(
+    request,
+    eval_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
     eval_obj = get_object_or_404(Eval, id=eval_id)
     integrations = EndpointIntegration.objects.filter(eval=eval_obj)
-    return integrations
+    return paginate(
+        integrations, EndpointIntegrationListSchema, cursor, limit, fields
+    )
 
 
 @router.get("/endpoint-integrations/{integration_id}", response=EndpointIntegrationResponseSchema)
@@ -85,30 +112,38 @@ def delete_endpoint_integration(request, integration_id: str):
     return {"message": "Endpoint integration deleted successfully"}
 
 
-@router.post("/generate-eval-runner", response=GenerateEvalRunnerResponseSchema)
-def generate_eval_runner(request, data: GenerateEvalRunnerSchema):
-    eval_obj = get_object_or_404(Eval, id=data.eval_id)
-    endpoint_integration = get_object_or_404(
+async def load_generation_context(data: GenerateEvalRunnerSchema):
+    """
+    Load and validate the eval, integration and eval set a runner is generated
+    for, along with the CSV sample shown to the LLM.
+    """
+    validate_sample_size(data.sample_size)
+    eval_obj = await aget_object_or_404(Eval, id=data.eval_id)
+    endpoint_integration = await aget_object_or_404(
         EndpointIntegration, id=data.endpoint_integration_id
     )
-    eval_set = get_object_or_404(EvalSet, id=data.eval_set_id)
+    eval_set = await aget_object_or_404(EvalSet, id=data.eval_set_id)
 
-    if endpoint_integration.eval != eval_obj:
+    if endpoint_integration.eval_id != eval_obj.id:
         raise ValueError("Endpoint integration must belong to the specified eval")
 
-    if eval_set.eval != eval_obj:
+    if eval_set.eval_id != eval_obj.id:
         raise ValueError("Eval set must belong to the specified eval")
 
-    # Retrieve CSV data from Azure Blob Storage
-    csv_data = retrieve_csv_from_azure(eval_set.file_url, data.sample_size)
+    # Retrieve CSV sample data, from the sample cache when possible
+    csv_data = await aget_eval_set_sample(eval_set, data.sample_size)
     if not csv_data:
         raise ValueError("Failed to retrieve CSV data from blob storage")
 
+    return eval_obj, endpoint_integration, eval_set, csv_data
+
+
+def build_eval_runner_prompt(
+    eval_obj, endpoint_integration, eval_set, csv_data, instructions
+) -> str:
     csv_sample_rows = csv_data["sample_rows"]
     total_rows = csv_data["total_rows"]
 
-    llm_gateway = LLMCompletionsGateway()
-
     prompt = f"""
 You are an expert Python developer tasked with generating a complete, runnable Python script that will:
 1. Read CSV data from a file
@@ -139,7 +174,7 @@ Here's the context:
 {json.dumps(csv_sample_rows, indent=2)}
 
 **Additional Instructions:**
-{data.instructions or "No additional instructions provided"}
+{instructions or "No additional instructions provided"}
 
 **Requirements:**
 1. Generate complete, runnable Python code
@@ -168,23 +203,70 @@ The code should be production-ready and handle edge cases gracefully.
 ONLY return the code, never ever return anything else aside the the code, everything you output need to be executable. 
 do not include ``` ``` quotations in your response just the code
 """
+    return prompt
 
-    # Generate the code using the LLM
-    generated_code = llm_gateway.create_completion(prompt)
 
-    # Create a new CodeVersion entry
+def save_code_version(eval_id, eval_set, endpoint_integration, code, user) -> CodeVersion:
+    """
+    Save `code` as the eval's active version. Code identical to an existing
+    version of the eval reuses that row (re-activating it if needed), so
+    autosaves and repeated generations don't snapshot the same script again.
+    """
+    with transaction.atomic():
+        CodeVersion.lock_eval(eval_id)
+        existing = (
+            CodeVersion.objects.filter(eval_id=eval_id, code_sha256=hash_code(code))
+            .select_related("eval_set", "endpoint_integration")
+            .order_by("-version")
+            .first()
+        )
+        if existing:
+            if not existing.is_active:
+                existing.is_active = True
+                existing.save(update_fields=["is_active"])
+            return existing
+
+        return CodeVersion.objects.create(
+            eval_id=eval_id,
+            eval_set=eval_set,
+            endpoint_integration=endpoint_integration,
+            code=code,
+            created_by=user,
+            is_active=True,
+        )
+
+
+async def save_generated_code(eval_obj, endpoint_integration, eval_set, generated_code, user):
+    return await sync_to_async(save_code_version)(
+        eval_obj.id, eval_set, endpoint_integration, generated_code, user
+    )
+
+
+async def get_generation_user():
     # Get the first user since we don't have authentication set up yet
-    user = User.objects.first()
+    user = await User.objects.afirst()
     if not user:
         raise ValueError("No users found. Please create a user first.")
+    return user
 
-    code_version = CodeVersion.objects.create(
-        eval=eval_obj,
-        eval_set=eval_set,
-        endpoint_integration=endpoint_integration,
-        code=generated_code,
-        created_by=user,
-        is_active=True,
+
+async def create_eval_runner(data: GenerateEvalRunnerSchema) -> GenerateEvalRunnerResponseSchema:
+    """
+    Generate an eval runner with the LLM and save it as the active CodeVersion.
+    Shared by the HTTP view and the background job handler.
+    """
+    eval_obj, endpoint_integration, eval_set, csv_data = await load_generation_context(data)
+    prompt = build_eval_runner_prompt(
+        eval_obj, endpoint_integration, eval_set, csv_data, data.instructions
+    )
+
+    # Generate the code using the LLM
+    generated_code = await get_gateway().async_create_completion(prompt)
+
+    # Create a new CodeVersion entry
+    user = await get_generation_user()
+    code_version = await save_generated_code(
+        eval_obj, endpoint_integration, eval_set, generated_code, user
     )
 
     return GenerateEvalRunnerResponseSchema(
@@ -195,15 +277,96 @@ do not include ``` ``` quotations in your response just the code
     )
 
 
+@router.post("/generate-eval-runner", response=GenerateEvalRunnerResponseSchema)
+async def generate_eval_runner(request, data: GenerateEvalRunnerSchema):
+    return await create_eval_runner(data)
+
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.post("/generate-eval-runner/stream")
+async def stream_eval_runner(request, data: GenerateEvalRunnerSchema):
+    """
+    Stream the generated eval runner as server-sent events: `delta` events carry
+    tokens as they arrive, and a final `done` event carries the saved CodeVersion.
+    """
+    eval_obj, endpoint_integration, eval_set, csv_data = await load_generation_context(data)
+    prompt = build_eval_runner_prompt(
+        eval_obj, endpoint_integration, eval_set, csv_data, data.instructions
+    )
+    user = await get_generation_user()
+
+    async def events():
+        deltas = []
+        try:
+            async for delta in get_gateway().async_stream_completion(prompt):
+                deltas.append(delta)
+                yield sse_event("delta", {"content": delta})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+
+        # Only persist once the whole script has been generated
+        generated_code = "".join(deltas)
+        code_version = await save_generated_code(
+            eval_obj, endpoint_integration, eval_set, generated_code, user
+        )
+        yield sse_event(
+            "done",
+            GenerateEvalRunnerResponseSchema(
+                generated_code=generated_code,
+                code_version=code_version.version,
+                eval_id=eval_obj.id,
+                code_version_id=code_version.id,
+            ).model_dump(mode="json"),
+        )
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def code_version_response(code_version: CodeVersion) -> CodeVersionResponseSchema:
+    """
+    Build the response from a CodeVersion fetched with its eval set and
+    endpoint integration select_related, so no further queries are made.
+    """
+    eval_set = code_version.eval_set
+    endpoint_integration = code_version.endpoint_integration
+    return CodeVersionResponseSchema(
+        id=code_version.id,
+        eval_id=code_version.eval_id,
+        version=code_version.version,
+        code=code_version.code,
+        code_sha256=code_version.code_sha256,
+        created_at=code_version.created_at,
+        is_active=code_version.is_active,
+        code_version_id=code_version.id,
+        eval_set_id=code_version.eval_set_id,
+        eval_set_name=eval_set.name if eval_set else None,
+        endpoint_integration_id=code_version.endpoint_integration_id,
+        endpoint_integration_name=(
+            endpoint_integration.name if endpoint_integration else None
+        ),
+    )
+
+
 @router.put("/code-versions/{code_version_id}", response=CodeVersionResponseSchema)
 def update_code_version(
     request, code_version_id: str, update_data: CodeVersionUpdateSchema
 ):
     """
-    Update the code of an existing code version. This creates a new version with the updated code.
+    Update the code of an existing code version. This creates a new version with the
+    updated code, unless the eval already has a version with identical code.
     """
-    # Get the existing code version
-    existing_code_version = get_object_or_404(CodeVersion, id=code_version_id)
+    # Get the existing code version, with the related rows the response needs
+    existing_code_version = get_object_or_404(
+        CodeVersion.objects.select_related("eval_set", "endpoint_integration").defer("code"),
+        id=code_version_id,
+    )
 
     # Get the first user since we don't have authentication set up yet
     user = User.objects.first()
@@ -211,38 +374,15 @@ def update_code_version(
         raise ValueError("No users found. Please create a user first.")
 
     # Create a new code version with the updated code
-    new_code_version = CodeVersion.objects.create(
-        eval=existing_code_version.eval,
-        eval_set=existing_code_version.eval_set,
-        endpoint_integration=existing_code_version.endpoint_integration,
-        code=update_data.code,
-        created_by=user,
-        is_active=True,
+    new_code_version = save_code_version(
+        existing_code_version.eval_id,
+        existing_code_version.eval_set,
+        existing_code_version.endpoint_integration,
+        update_data.code,
+        user,
     )
 
-    return CodeVersionResponseSchema(
-        id=new_code_version.id,
-        eval_id=new_code_version.eval.id,
-        version=new_code_version.version,
-        code=new_code_version.code,
-        created_at=new_code_version.created_at,
-        is_active=new_code_version.is_active,
-        code_version_id=new_code_version.id,
-        eval_set_id=new_code_version.eval_set.id if new_code_version.eval_set else None,
-        eval_set_name=(
-            new_code_version.eval_set.name if new_code_version.eval_set else None
-        ),
-        endpoint_integration_id=(
-            new_code_version.endpoint_integration.id
-            if new_code_version.endpoint_integration
-            else None
-        ),
-        endpoint_integration_name=(
-            new_code_version.endpoint_integration.name
-            if new_code_version.endpoint_integration
-            else None
-        ),
-    )
+    return code_version_response(new_code_version)
 
 
 @router.get("/code-versions/{code_version_id}", response=CodeVersionResponseSchema)
@@ -250,51 +390,48 @@ def get_code_version(request, code_version_id: str):
     """
     Get a specific code version by ID.
     """
-    code_version = get_object_or_404(CodeVersion, id=code_version_id)
-
-    return CodeVersionResponseSchema(
-        id=code_version.id,
-        eval_id=code_version.eval.id,
-        version=code_version.version,
-        code=code_version.code,
-        created_at=code_version.created_at,
-        is_active=code_version.is_active,
-        code_version_id=code_version.id,
-        eval_set_id=code_version.eval_set.id if code_version.eval_set else None,
-        eval_set_name=code_version.eval_set.name if code_version.eval_set else None,
-        endpoint_integration_id=(
-            code_version.endpoint_integration.id
-            if code_version.endpoint_integration
-            else None
-        ),
-        endpoint_integration_name=(
-            code_version.endpoint_integration.name
-            if code_version.endpoint_integration
-            else None
-        ),
+    code_version = get_object_or_404(
+        CodeVersion.objects.select_related("eval_set", "endpoint_integration"),
+        id=code_version_id,
     )
+    return code_version_response(code_version)
 
 
 @router.get("/evals/{eval_id}/code-versions", response=List[CodeVersionListSchema])
-def list_eval_code_versions(request, eval_id: str):
+def list_eval_code_versions(
+    request, eval_id: str, collapse_duplicates: bool = Query(False)
+):
     """
-    List all code versions for a specific evaluation.
+    List all code versions for a specific evaluation. With `collapse_duplicates`,
+    only the newest version of each distinct code is listed.
     """
     eval_obj = get_object_or_404(Eval, id=eval_id)
-    code_versions = CodeVersion.objects.filter(eval=eval_obj).order_by("-version")
+    # One query for every version and its related names; the code itself isn't listed
+    code_versions = (
+        CodeVersion.objects.filter(eval=eval_obj)
+        .select_related("eval_set", "endpoint_integration")
+        .defer("code")
+        .order_by("-version")
+    )
+    if collapse_duplicates:
+        newest_with_same_code = (
+            CodeVersion.objects.filter(eval=OuterRef("eval"), code_sha256=OuterRef("code_sha256"))
+            .order_by("-version")
+            .values("version")[:1]
+        )
+        code_versions = code_versions.filter(version=Subquery(newest_with_same_code))
 
     return [
         CodeVersionListSchema(
             id=cv.id,
-            eval_id=cv.eval.id,
+            eval_id=cv.eval_id,
             version=cv.version,
+            code_sha256=cv.code_sha256,
             created_at=cv.created_at,
             is_active=cv.is_active,
-            eval_set_id=cv.eval_set.id if cv.eval_set else None,
+            eval_set_id=cv.eval_set_id,
             eval_set_name=cv.eval_set.name if cv.eval_set else None,
-            endpoint_integration_id=(
-                cv.endpoint_integration.id if cv.endpoint_integration else None
-            ),
+            endpoint_integration_id=cv.endpoint_integration_id,
             endpoint_integration_name=(
                 cv.endpoint_integration.name if cv.endpoint_integration else None
             ),
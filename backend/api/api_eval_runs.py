@@ -0,0 +1,203 @@
+from ninja import Router
+from ninja.errors import HttpError
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from typing import List, Optional
+
+from .comparison import compare_metrics, paired_results, regressions
+from .jobs import enqueue_job
+from .models import Eval, EvalRun, CodeVersion
+from .pagination import (
+    decode_cursor_id,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    page_limit,
+    paginate,
+)
+from .run_summary import summary_response
+from .sharding import resume_sharded_run, shard_eval_run
+from .schemas import (
+    EvalRunCreateSchema,
+    EvalRunListSchema,
+    EvalRunResponseSchema,
+    EvalRunResumeSchema,
+    EvalRunShardSchema,
+    EvalRunSummarySchema,
+    RunComparisonSchema,
+)
+
+router = Router()
+
+
+@router.post("/eval-runs", response=EvalRunResponseSchema)
+def create_eval_run(request, run_data: EvalRunCreateSchema):
+    """
+    Create a pending EvalRun and queue it for execution by a worker. With
+    `shard_size`, the run is split into row ranges that any number of
+    `run_shard_worker` processes execute in parallel instead.
+    """
+    code_version = get_object_or_404(CodeVersion, id=run_data.code_version_id)
+    if run_data.shard_size is not None and run_data.shard_size < 1:
+        raise HttpError(400, "shard_size must be positive")
+
+    with transaction.atomic():
+        run = EvalRun.objects.create(
+            eval_id=code_version.eval_id,
+            code_version=code_version,
+            run_params=run_data.run_params or {},
+        )
+        if run_data.shard_size is not None:
+            try:
+                run.shard_count = len(shard_eval_run(run, run_data.shard_size))
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            run.refresh_from_db(fields=["status", "completed_at"])
+        else:
+            run.job_id = enqueue_job("eval_run", eval_run=run).id
+    return run
+
+
+@router.get("/eval-runs/{run_id}", response=EvalRunResponseSchema)
+def get_eval_run(request, run_id: str):
+    run = get_object_or_404(EvalRun, id=run_id)
+    run.job_id = run.jobs.values_list("id", flat=True).first()
+    run.shard_count = run.shards.count()
+    return run
+
+
+@router.get("/eval-runs/{run_id}/shards", response=List[EvalRunShardSchema])
+def list_eval_run_shards(request, run_id: str):
+    run = get_object_or_404(EvalRun, id=run_id)
+    return list(run.shards.all())
+
+
+@router.post("/eval-runs/{run_id}/resume", response=EvalRunResponseSchema)
+def resume_eval_run(request, run_id: str, resume_data: EvalRunResumeSchema):
+    """
+    Queue an interrupted run again. Only items without a result are
+    dispatched; with `retry_failed`, items whose result errored are retried
+    as well. A run that still has a pending or running job is rejected
+    unless `force` is set, e.g. when its worker died mid-run, in which case
+    the stale jobs are marked failed. Sharded runs requeue their failed
+    shards instead; shards of dead workers are re-leased once their lease
+    expires.
+    """
+    with transaction.atomic():
+        run = get_object_or_404(EvalRun.objects.select_for_update(), id=run_id)
+        run.shard_count = run.shards.count()
+        if run.shard_count:
+            resume_sharded_run(run, retry_failed=resume_data.retry_failed)
+            run.refresh_from_db(fields=["status", "completed_at"])
+            return run
+
+        active_jobs = run.jobs.filter(status__in=["pending", "running"])
+        if active_jobs.exists():
+            if not resume_data.force:
+                raise HttpError(409, "Run already has a pending or running job")
+            active_jobs.update(
+                status="failed", error="Superseded by resume", completed_at=timezone.now()
+            )
+
+        run.status = "pending"
+        run.completed_at = None
+        run.save(update_fields=["status", "completed_at"])
+        run.job_id = enqueue_job(
+            "eval_run", {"retry_failed": resume_data.retry_failed}, eval_run=run
+        ).id
+    return run
+
+
+@router.get("/eval-runs/{run_id}/summary", response=EvalRunSummarySchema)
+def get_eval_run_summary(request, run_id: str):
+    """
+    Per-metric count, mean, stddev, min/max and p50/p95 for a run, read from
+    the incrementally maintained summary rows rather than the results.
+    """
+    run = get_object_or_404(EvalRun, id=run_id)
+    summaries = list(run.metric_summaries.all())
+    # One row per result, valued 1.0 when the result errored
+    failed = next((s for s in summaries if (s.source, s.name) == ("run", "failed")), None)
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "result_count": failed.count if failed else 0,
+        "failed_count": round(failed.total) if failed else 0,
+        "metrics": [summary_response(s) for s in summaries if s.source != "run"],
+    }
+
+
+@router.get("/eval-runs/{run_id}/compare/{other_run_id}", response=RunComparisonSchema)
+def compare_eval_runs(
+    request,
+    run_id: str,
+    other_run_id: str,
+    metrics: str,
+    source: str = "metrics",
+    lower_is_better: Optional[str] = None,
+    tolerance: float = 0.0,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Compare `other_run_id` against `run_id` item by item. Results are joined
+    on eval_set_item in the database; the response has paired statistics
+    for every metric in `metrics` and a page of the items that regressed
+    most on the first one. `lower_is_better` lists metrics where a decrease
+    is an improvement, e.g. latency_ms.
+    """
+    runs = EvalRun.objects.select_related("code_version")
+    base = get_object_or_404(runs, id=run_id)
+    other = get_object_or_404(runs, id=other_run_id)
+    if base.code_version.eval_set_id != other.code_version.eval_set_id:
+        raise HttpError(400, "Runs must be against the same eval set")
+    if source not in ("metrics", "scores"):
+        raise HttpError(400, "source must be 'metrics' or 'scores'")
+
+    names = [name.strip() for name in metrics.split(",") if name.strip()]
+    if not names:
+        raise HttpError(400, "At least one metric is required")
+    lower = {name.strip() for name in (lower_is_better or "").split(",") if name.strip()}
+    limit = page_limit(limit)
+
+    pairs = paired_results(base.id, other.id, source, names)
+    page = regressions(pairs, higher_is_better=names[0] not in lower, tolerance=tolerance)
+    if cursor:
+        loss, item_id = decode_keyset_cursor(cursor, 2)
+        if isinstance(loss, bool) or not isinstance(loss, (int, float)):
+            raise HttpError(400, "Invalid cursor")
+        item_id = decode_cursor_id(item_id)
+        page = page.filter(Q(loss__lt=loss) | Q(loss=loss, eval_set_item_id__gt=item_id))
+
+    # One extra row tells us whether there is a next page
+    rows = list(page[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_keyset_cursor(rows[-1]["loss"], str(rows[-1]["eval_set_item_id"]))
+
+    return {
+        "base_run_id": base.id,
+        "other_run_id": other.id,
+        "source": source,
+        "metrics": compare_metrics(pairs, names, lower, tolerance),
+        "regressions": rows,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/evals/{eval_id}/eval-runs", response=List[EvalRunListSchema])
+def list_eval_runs(
+    request,
+    eval_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    eval_obj = get_object_or_404(Eval, id=eval_id)
+    runs = EvalRun.objects.filter(eval=eval_obj)
+    return paginate(
+        runs, EvalRunListSchema, cursor, limit, fields,
+        ordering_field="started_at",
+    )
@@ -1,15 +1,26 @@
 from ninja import Router, File, Query
+from ninja.errors import HttpError
 from ninja.files import UploadedFile
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from typing import List
+from typing import List, Optional
 import os
 import csv
-from io import StringIO
 
 from .models import Eval, EvalSet, EndpointIntegration
 from .schemas import EvalSetResponseSchema, EvalSetListSchema, EvalSetUpdateSchema
-from .helpers import upload_csv_to_azure, delete_csv_from_azure, retrieve_csv_from_azure
+from .helpers import aget_object_or_404, aupload_csv, adelete_csv, validate_sample_size
+from .ingest import ingest_csv
+from .pagination import paginate
+from .sample_cache import (
+    PREFILL_SAMPLE_SIZE,
+    acache_sample,
+    aget_eval_set_sample,
+    ainvalidate_eval_set_samples,
+    invalidate_eval_set_samples,
+)
 
 router = Router()
 
@@ -20,16 +31,8 @@ def extract_name_from_filename(filename: str) -> str:
     return ' '.join(word.capitalize() for word in name.split())
 
 
-def count_csv_rows(file_content: str) -> int:
-    try:
-        reader = csv.reader(StringIO(file_content))
-        return sum(1 for row in reader) - 1
-    except:
-        return 0
-
-
 @router.post("/eval-sets", response=EvalSetResponseSchema)
-def create_eval_set(
+async def create_eval_set(
     request,
     file: UploadedFile = File(...),
     name: str = None,
@@ -39,39 +42,58 @@ def create_eval_set(
     if not eval_id:
         return {"error": "eval_id is required"}, 400
 
-    eval_obj = get_object_or_404(Eval, id=eval_id)
+    eval_obj = await aget_object_or_404(Eval, id=eval_id)
     endpoint_integration = None
 
     if endpoint_integration_id:
-        endpoint_integration = get_object_or_404(EndpointIntegration, id=endpoint_integration_id)
+        endpoint_integration = await aget_object_or_404(EndpointIntegration, id=endpoint_integration_id)
         if endpoint_integration.eval_id != eval_obj.id:
             return {"error": "Endpoint integration does not belong to the specified eval"}, 400
 
-    user = User.objects.first()
+    user = await User.objects.afirst()
     if not user:
         return {"error": "No users found. Please create a user first."}, 400
 
     if not name:
         name = extract_name_from_filename(file.name)
 
-    file_content = file.read().decode('utf-8')
-    row_count = count_csv_rows(file_content)
+    file_url = await aupload_csv(file, eval_id, file.name)
 
-    file.seek(0)
-    azure_url = upload_csv_to_azure(file, eval_id, file.name)
+    if not file_url:
+        return {"error": "Failed to upload file to blob storage"}, 500
 
-    if not azure_url:
-        return {"error": "Failed to upload file to Azure Blob Storage"}, 500
+    sample_rows = []
 
-    eval_set = EvalSet.objects.create(
-        name=name,
-        eval=eval_obj,
-        endpoint_integration=endpoint_integration,
-        file_url=azure_url,
-        row_count=row_count,
-        uploaded_by=user
-    )
+    def collect_sample(row):
+        if len(sample_rows) < PREFILL_SAMPLE_SIZE:
+            sample_rows.append(dict(row))
 
+    # Items, row_count and the sample cache are all filled in the same pass over the upload
+    @sync_to_async
+    def create_and_ingest():
+        with transaction.atomic():
+            eval_set = EvalSet.objects.create(
+                name=name,
+                eval=eval_obj,
+                endpoint_integration=endpoint_integration,
+                file_url=file_url,
+                uploaded_by=user
+            )
+            eval_set.row_count = ingest_csv(eval_set, file, on_row=collect_sample)
+            eval_set.save(update_fields=["row_count"])
+        return eval_set
+
+    try:
+        eval_set = await create_and_ingest()
+    except (UnicodeDecodeError, csv.Error) as e:
+        await adelete_csv(file_url)
+        raise HttpError(400, f"Invalid CSV file: {str(e)}")
+
+    await acache_sample(
+        eval_set.id,
+        PREFILL_SAMPLE_SIZE,
+        {"sample_rows": sample_rows, "total_rows": eval_set.row_count},
+    )
     return eval_set
 
 
@@ -92,27 +114,54 @@ def update_eval_set(request, eval_set_id: str, eval_set_data: EvalSetUpdateSchem
             eval_set.endpoint_integration = None
     
     eval_set.save()
+    invalidate_eval_set_samples(eval_set.id)
     return eval_set
 
 
+def paginate_eval_sets(eval_sets, cursor, limit, fields):
+    return paginate(
+        eval_sets, EvalSetListSchema, cursor, limit, fields,
+        ordering_field="uploaded_at",
+    )
+
+
 @router.get("/eval-sets", response=List[EvalSetListSchema])
-def list_eval_sets(request):
-    eval_sets = EvalSet.objects.all()
-    return eval_sets
+def list_eval_sets(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    return paginate_eval_sets(EvalSet.objects.all(), cursor, limit, fields)
 
 
 @router.get("/evals/{eval_id}/eval-sets", response=List[EvalSetListSchema])
-def list_eval_eval_sets(request, eval_id: str):
+def list_eval_eval_sets(
+    request,
+    eval_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
     eval_obj = get_object_or_404(Eval, id=eval_id)
     eval_sets = EvalSet.objects.filter(eval=eval_obj)
-    return eval_sets
+    return paginate_eval_sets(eval_sets, cursor, limit, fields)
 
 
-@router.get("/endpoint-integrations/{integration_id}/eval-sets", response=List[EvalSetListSchema])
-def list_integration_eval_sets(request, integration_id: str):
+@router.get(
+    "/endpoint-integrations/{integration_id}/eval-sets",
+    response=List[EvalSetListSchema],
+)
+def list_integration_eval_sets(
+    request,
+    integration_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
     integration = get_object_or_404(EndpointIntegration, id=integration_id)
     eval_sets = EvalSet.objects.filter(endpoint_integration=integration)
-    return eval_sets
+    return paginate_eval_sets(eval_sets, cursor, limit, fields)
 
 
 @router.get("/eval-sets/{eval_set_id}", response=EvalSetResponseSchema)
@@ -122,21 +171,23 @@ def get_eval_set(request, eval_set_id: str):
 
 
 @router.delete("/eval-sets/{eval_set_id}")
-def delete_eval_set(request, eval_set_id: str):
-    eval_set = get_object_or_404(EvalSet, id=eval_set_id)
+async def delete_eval_set(request, eval_set_id: str):
+    eval_set = await aget_object_or_404(EvalSet, id=eval_set_id)
 
     if eval_set.file_url:
-        delete_csv_from_azure(eval_set.file_url)
+        await adelete_csv(eval_set.file_url)
 
-    eval_set.delete()
+    await ainvalidate_eval_set_samples(eval_set.id)
+    await eval_set.adelete()
     return {"message": "Eval set deleted successfully"}
 
 
 @router.get("/eval-sets/{eval_set_id}/sample-data")
-def get_eval_set_sample_data(request, eval_set_id: str, sample_size: int = Query(5)):
-    eval_set = get_object_or_404(EvalSet, id=eval_set_id)
+async def get_eval_set_sample_data(request, eval_set_id: str, sample_size: int = Query(5)):
+    validate_sample_size(sample_size)
+    eval_set = await aget_object_or_404(EvalSet, id=eval_set_id)
 
-    csv_data = retrieve_csv_from_azure(eval_set.file_url, sample_size)
+    csv_data = await aget_eval_set_sample(eval_set, sample_size)
     if not csv_data:
         return {"error": "Failed to retrieve CSV data from blob storage"}, 500
 
@@ -1,8 +1,9 @@
 from ninja import Router
 from django.shortcuts import get_object_or_404
-from typing import List
+from typing import List, Optional
 
 from .models import Project, Eval
+from .pagination import paginate
 from .schemas import EvalCreateSchema, EvalUpdateSchema, EvalResponseSchema, EvalListSchema
 
 router = Router()
@@ -21,16 +22,26 @@ def create_eval(request, eval_data: EvalCreateSchema):
 
 
 @router.get("/evals", response=List[EvalListSchema])
-def list_evals(request):
-    evals = Eval.objects.all()
-    return evals
+def list_evals(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    return paginate(Eval.objects.all(), EvalListSchema, cursor, limit, fields)
 
 
 @router.get("/projects/{project_id}/evals", response=List[EvalListSchema])
-def list_project_evals(request, project_id: str):
+def list_project_evals(
+    request,
+    project_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
     project = get_object_or_404(Project, id=project_id)
     evals = Eval.objects.filter(project=project)
-    return evals
+    return paginate(evals, EvalListSchema, cursor, limit, fields)
 
 
 @router.get("/evals/{eval_id}", response=EvalResponseSchema)
@@ -0,0 +1,22 @@
+from ninja import Router
+from django.shortcuts import get_object_or_404
+
+from .jobs import enqueue_job
+from .models import Job
+from .schemas import GenerateEvalRunnerSchema, JobResponseSchema
+
+router = Router()
+
+
+@router.post("/jobs/generate-eval-runner", response=JobResponseSchema)
+def enqueue_generate_eval_runner(request, data: GenerateEvalRunnerSchema):
+    """
+    Queue eval runner generation for a worker; poll the job for the result.
+    """
+    return enqueue_job("generate_eval_runner", data.model_dump(mode="json"))
+
+
+@router.get("/jobs/{job_id}", response=JobResponseSchema)
+def get_job(request, job_id: str):
+    job = get_object_or_404(Job, id=job_id)
+    return job
@@ -1,9 +1,10 @@
 from ninja import Router
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from typing import List
+from typing import List, Optional
 
 from .models import Project
+from .pagination import paginate
 from .schemas import ProjectCreateSchema, ProjectUpdateSchema, ProjectResponseSchema, ProjectListSchema
 
 router = Router()
@@ -24,9 +25,13 @@ def create_project(request, project_data: ProjectCreateSchema):
 
 
 @router.get("/projects", response=List[ProjectListSchema])
-def list_projects(request):
-    projects = Project.objects.all()
-    return projects
+def list_projects(
+    request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    return paginate(Project.objects.all(), ProjectListSchema, cursor, limit, fields)
 
 
 @router.get("/projects/{project_id}", response=ProjectResponseSchema)
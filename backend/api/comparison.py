@@ -0,0 +1,231 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.db import NotSupportedError
+from django.db.models import Count, F, FilteredRelation, FloatField, Func, Q, Sum
+from django.db.models.fields.json import compile_json_path
+
+from .models import RunResult
+
+BETA_CF_MAX_ITERATIONS = 300
+BETA_CF_EPSILON = 3e-14
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    # Lentz's method for the continued fraction of the incomplete beta function
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, BETA_CF_MAX_ITERATIONS + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < BETA_CF_EPSILON:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    log_front = (
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    )
+    # The continued fraction converges quickly only on this side of the mean
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def paired_t_test(n: int, sum_delta: float, sum_squares: float) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Two-sided paired t-test from the count, sum and sum of squares of the
+    per-item differences. Returns (t statistic, p-value).
+    """
+    if n < 2:
+        return None, None
+    mean = sum_delta / n
+    variance = max((sum_squares - n * mean * mean) / (n - 1), 0.0)
+    if variance == 0:
+        # Every pair moved by the same amount: no spread to test against
+        return None, 1.0 if mean == 0 else 0.0
+
+    t = mean / math.sqrt(variance / n)
+    df = n - 1
+    return t, regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def sign_test(wins: int, losses: int) -> float:
+    """
+    Two-sided exact sign test p-value over the non-tied pairs.
+    """
+    n = wins + losses
+    if n == 0:
+        return 1.0
+    k = min(wins, losses)
+    # P(X <= k) for X ~ Binomial(n, 1/2)
+    return min(1.0, 2 * regularized_incomplete_beta(n - k, k + 1, 0.5))
+
+
+class JSONNumber(Func):
+    """
+    The value of a top-level JSON key as a float: numbers as they are,
+    booleans as 1.0/0.0 like the run summaries, anything else NULL. Other
+    types are never cast, since e.g. 'true'::double precision fails on Postgres.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, source: str, key: str):
+        super().__init__(F(source))
+        self.key = key
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"JSONNumber is not implemented for {connection.vendor}")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        sql = (
+            f"CASE jsonb_typeof({column} -> %s) "
+            f"WHEN 'number' THEN ({column} ->> %s)::double precision "
+            f"WHEN 'boolean' THEN CASE WHEN ({column} -> %s) = 'true'::jsonb "
+            "THEN 1.0::double precision ELSE 0.0::double precision END "
+            "END"
+        )
+        return sql, (*params, self.key, *params, self.key, *params, self.key)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        path = compile_json_path([self.key])
+        sql = (
+            f"CASE JSON_TYPE({column}, %s) "
+            f"WHEN 'integer' THEN CAST(JSON_EXTRACT({column}, %s) AS REAL) "
+            f"WHEN 'real' THEN JSON_EXTRACT({column}, %s) "
+            "WHEN 'true' THEN 1.0 WHEN 'false' THEN 0.0 "
+            "END"
+        )
+        return sql, (*params, path, *params, path, *params, path)
+
+
+def _metric_value(source: str, name: str) -> JSONNumber:
+    return JSONNumber(source, name)
+
+
+def paired_results(base_run_id, other_run_id, source: str, metrics: Sequence[str]):
+    """
+    The base run's results joined in SQL to the other run's result for the
+    same eval set item, annotated with base_<i>, other_<i> and delta_<i>
+    (other minus base) for each metric. Deltas are NULL when either side is
+    missing the metric.
+    """
+    queryset = RunResult.objects.filter(run_id=base_run_id).annotate(
+        other=FilteredRelation(
+            "eval_set_item__results",
+            condition=Q(eval_set_item__results__run_id=other_run_id),
+        )
+    )
+    annotations = {}
+    for i, name in enumerate(metrics):
+        annotations[f"base_{i}"] = _metric_value(source, name)
+        annotations[f"other_{i}"] = _metric_value(f"other__{source}", name)
+    queryset = queryset.annotate(**annotations)
+    return queryset.annotate(
+        **{f"delta_{i}": F(f"other_{i}") - F(f"base_{i}") for i in range(len(metrics))}
+    )
+
+
+def _improvement(i: int, higher_is_better: bool, tolerance: float) -> Q:
+    if higher_is_better:
+        return Q(**{f"delta_{i}__gt": tolerance})
+    return Q(**{f"delta_{i}__lt": -tolerance})
+
+
+def _regression(i: int, higher_is_better: bool, tolerance: float) -> Q:
+    return _improvement(i, not higher_is_better, tolerance)
+
+
+def compare_metrics(
+    pairs, metrics: Sequence[str], lower_is_better: Sequence[str] = (), tolerance: float = 0.0
+) -> List[Dict[str, Any]]:
+    """
+    Per-metric paired statistics for `paired_results()`, computed with
+    conditional aggregates in a single query: means, mean/stddev of the
+    deltas, win/loss/tie counts and paired t-test and sign test p-values.
+    """
+    aggregates = {}
+    for i, name in enumerate(metrics):
+        higher_is_better = name not in lower_is_better
+        paired = Q(**{f"delta_{i}__isnull": False})
+        aggregates.update(
+            {
+                f"n_{i}": Count(f"delta_{i}"),
+                f"base_sum_{i}": Sum(f"base_{i}", filter=paired),
+                f"other_sum_{i}": Sum(f"other_{i}", filter=paired),
+                f"delta_sum_{i}": Sum(f"delta_{i}"),
+                f"delta_squares_{i}": Sum(F(f"delta_{i}") * F(f"delta_{i}")),
+                f"wins_{i}": Count("id", filter=_improvement(i, higher_is_better, tolerance)),
+                f"losses_{i}": Count("id", filter=_regression(i, higher_is_better, tolerance)),
+            }
+        )
+    totals = pairs.aggregate(**aggregates)
+
+    comparisons = []
+    for i, name in enumerate(metrics):
+        n = totals[f"n_{i}"]
+        delta_sum = totals[f"delta_sum_{i}"] or 0.0
+        delta_squares = totals[f"delta_squares_{i}"] or 0.0
+        wins, losses = totals[f"wins_{i}"], totals[f"losses_{i}"]
+        t_statistic, p_value = paired_t_test(n, delta_sum, delta_squares)
+
+        stddev = None
+        if n > 1:
+            mean = delta_sum / n
+            stddev = math.sqrt(max((delta_squares - n * mean * mean) / (n - 1), 0.0))
+        comparisons.append(
+            {
+                "name": name,
+                "higher_is_better": name not in lower_is_better,
+                "paired": n,
+                "base_mean": totals[f"base_sum_{i}"] / n if n else None,
+                "other_mean": totals[f"other_sum_{i}"] / n if n else None,
+                "mean_delta": delta_sum / n if n else None,
+                "stddev_delta": stddev,
+                "wins": wins,
+                "losses": losses,
+                "ties": n - wins - losses,
+                "t_statistic": t_statistic,
+                "p_value": p_value,
+                "sign_test_p_value": sign_test(wins, losses),
+            }
+        )
+    return comparisons
+
+
+def regressions(pairs, higher_is_better: bool = True, tolerance: float = 0.0):
+    """
+    Items whose first metric got worse, worst first, as `values()` rows.
+    Ordered by (loss desc, eval_set_item_id) for keyset pagination.
+    """
+    loss = F("base_0") - F("other_0") if higher_is_better else F("other_0") - F("base_0")
+    return (
+        pairs.filter(_regression(0, higher_is_better, tolerance))
+        .annotate(loss=loss)
+        .order_by("-loss", "eval_set_item_id")
+        .values(
+            "eval_set_item_id",
+            "loss",
+            row_number=F("eval_set_item__row_number"),
+            base_value=F("base_0"),
+            other_value=F("other_0"),
+            delta=F("delta_0"),
+        )
+    )
@@ -3,13 +3,30 @@ import logging
 import time
 import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, TypeVar, Type
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    Type,
+)
 import os
+import weakref
 
 from config.env import env
-from openai import AsyncOpenAI, OpenAI
+from .completion_cache import CompletionCache
+from .rate_limiter import RateLimiter, estimate_tokens
+from .retry import RetryPolicy
 from utils.types import ChatModel
-import instructor
 from pydantic import BaseModel
 
 os.environ["INSTRUCTOR_DEBUG"] = "1"
@@ -25,9 +42,79 @@ STRUCTURED_OUTPUT_DEFAULT_MODEL_PARAMETERS = {
     "max_tokens": 16384,
 }
 
+IMAGE_CACHE_MAX_ENTRIES = 128
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+
+@dataclass
+class BatchItemResult(Generic[R]):
+    """
+    Outcome of one prompt in a batch: either `result` or the `error` it raised.
+    """
+
+    result: Optional[R] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@lru_cache(maxsize=IMAGE_CACHE_MAX_ENTRIES)
+def _encode_image_file(image_path: str, mtime_ns: int) -> str:
+    # mtime_ns is part of the cache key so edited files are re-read
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def build_image_part(image_path: str) -> Dict[str, Any]:
+    """
+    Build an image_url content part from a URL, a base64/data URI or a local file path.
+    """
+    if image_path.startswith("data:image/") or len(image_path) > 255:
+        base64_image = image_path.split(",")[-1] if "," in image_path else image_path
+    elif image_path.startswith(("http://", "https://")):
+        return {"type": "image_url", "image_url": {"url": image_path, "detail": "auto"}}
+    else:
+        try:
+            base64_image = _encode_image_file(
+                image_path, os.stat(image_path).st_mtime_ns
+            )
+        except Exception as e:
+            logger.error(f"Error processing image {image_path}: {str(e)}")
+            raise
+
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{base64_image}",
+            "detail": "auto",
+        },
+    }
+
+
+def build_messages(
+    prompt: str, images: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the chat messages for a prompt and optional images as a single
+    user message. Text-only prompts keep a plain string content.
+    """
+    if not images:
+        return [{"role": "user", "content": prompt}] if prompt else []
+
+    content = [{"type": "text", "text": prompt}] if prompt else []
+    content.extend(build_image_part(image_path) for image_path in images)
+    return [{"role": "user", "content": content}]
+
+
+def resolve_temperature(model: ChatModel, params: Dict[str, Any]) -> float:
+    # o3-mini only accepts the default temperature
+    return 1.0 if model == ChatModel.GPT_O3_MINI else params.get("temperature", 0.1)
 
 
 class CompletionsGateway(ABC):
@@ -51,6 +138,26 @@ class CompletionsGateway(ABC):
     ) -> str:
         pass
 
+    @abstractmethod
+    def stream_completion(
+        self,
+        prompt: str,
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+    ) -> Iterator[str]:
+        pass
+
+    @abstractmethod
+    def async_stream_completion(
+        self,
+        prompt: str,
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+    ) -> AsyncIterator[str]:
+        pass
+
     @abstractmethod
     def create_structured_completion(
         self,
@@ -73,20 +180,195 @@ class CompletionsGateway(ABC):
     ) -> T:
         pass
 
+    @abstractmethod
+    async def async_create_completions_batch(
+        self,
+        prompts: List[str],
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+        max_concurrency: Optional[int] = None,
+    ) -> List[BatchItemResult[str]]:
+        pass
+
+    @abstractmethod
+    async def async_create_structured_completions_batch(
+        self,
+        prompts: List[str],
+        schema: Type[T],
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = STRUCTURED_OUTPUT_DEFAULT_MODEL_PARAMETERS,
+        max_concurrency: Optional[int] = None,
+    ) -> List[BatchItemResult[T]]:
+        pass
+
+
+def build_completion_cache() -> Optional[CompletionCache]:
+    """
+    Build the completion cache configured through the environment, if any.
+    """
+    if not env.COMPLETION_CACHE_PATH:
+        return None
+    return CompletionCache(
+        env.COMPLETION_CACHE_PATH,
+        max_entries=env.COMPLETION_CACHE_MAX_ENTRIES,
+        ttl_seconds=env.COMPLETION_CACHE_TTL,
+    )
+
 
 class LLMCompletionsGateway(CompletionsGateway):
-    def __init__(self):
-        self.client = OpenAI(
-            api_key=env.OPENAI_API_KEY,
-        )
-        self.async_client = AsyncOpenAI(
-            api_key=env.OPENAI_API_KEY,
+    def __init__(
+        self,
+        cache: Optional[CompletionCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        # Opt-in: without an explicit cache or COMPLETION_CACHE_PATH every call goes to OpenAI
+        self.cache = cache if cache is not None else build_completion_cache()
+        # Shared by every async call on this gateway so concurrent batches draw from one budget
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute=env.OPENAI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=env.OPENAI_TOKENS_PER_MINUTE,
         )
-        self.instructor_client = instructor.from_openai(
-            OpenAI(api_key=env.OPENAI_API_KEY)
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=env.COMPLETION_MAX_ATTEMPTS
         )
-        self.async_instructor_client = instructor.from_openai(
-            AsyncOpenAI(api_key=env.OPENAI_API_KEY)
+        self.metrics = {"calls": 0, "retries": 0, "retried_calls": 0, "failed_calls": 0}
+        self._metrics_lock = threading.Lock()
+        # Async clients hold connections bound to an event loop, so one is kept per loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+
+    # Clients are built on first use so importing this module, or constructing
+    # a gateway that is never called, does not pay for openai/instructor setup.
+    # Retries are handled by retry_policy, so the SDK's built-in retries are disabled.
+
+    @cached_property
+    def client(self):
+        from openai import OpenAI
+
+        return OpenAI(api_key=env.OPENAI_API_KEY, max_retries=0)
+
+    @cached_property
+    def instructor_client(self):
+        import instructor
+
+        # Wraps the plain client, sharing its httpx connection pool
+        return instructor.from_openai(self.client)
+
+    def _async_clients_for_loop(self):
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            clients = self._async_clients.get(loop)
+            if clients is None:
+                import instructor
+                from openai import AsyncOpenAI
+
+                async_client = AsyncOpenAI(api_key=env.OPENAI_API_KEY, max_retries=0)
+                # Kept with the clients so the closer task lives as long as the loop
+                closer = loop.create_task(self._close_on_loop_shutdown(async_client))
+                clients = (async_client, instructor.from_openai(async_client), closer)
+                self._async_clients[loop] = clients
+        return clients
+
+    @staticmethod
+    async def _close_on_loop_shutdown(async_client) -> None:
+        """
+        Close a loop's client when the loop shuts down. asyncio.run(), and so
+        async_to_sync (a loop per request under WSGI), cancels pending tasks
+        before closing the loop; a long-lived ASGI loop keeps its client.
+        """
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await async_client.close()
+
+    @property
+    def async_client(self):
+        return self._async_clients_for_loop()[0]
+
+    @property
+    def async_instructor_client(self):
+        return self._async_clients_for_loop()[1]
+
+    def _record(self, **increments: int) -> None:
+        with self._metrics_lock:
+            for name, value in increments.items():
+                self.metrics[name] += value
+
+    def _with_retries(self, func):
+        """
+        Call `func` under the retry policy, recording attempts in metrics.
+        """
+        retries = 0
+
+        def on_retry(attempt, error, delay):
+            nonlocal retries
+            retries += 1
+            logger.warning(
+                f"Retrying OpenAI call in {delay:.2f} seconds (attempt {attempt}/{self.retry_policy.max_attempts}): {str(error)}"
+            )
+
+        try:
+            return self.retry_policy.call(func, on_retry=on_retry)
+        except Exception:
+            self._record(failed_calls=1)
+            raise
+        finally:
+            self._record(calls=1, retries=retries, retried_calls=1 if retries else 0)
+
+    async def _awith_retries(self, func, tokens: int = 0):
+        """
+        Async variant of `_with_retries`. Every attempt, retries included,
+        first waits for the rate limiter, with `tokens` counted against the
+        tokens-per-minute budget.
+        """
+        retries = 0
+
+        async def attempt():
+            await self.rate_limiter.acquire(tokens)
+            return await func()
+
+        def on_retry(attempt, error, delay):
+            nonlocal retries
+            retries += 1
+            logger.warning(
+                f"Retrying async OpenAI call in {delay:.2f} seconds (attempt {attempt}/{self.retry_policy.max_attempts}): {str(error)}"
+            )
+
+        try:
+            return await self.retry_policy.acall(attempt, on_retry=on_retry)
+        except Exception:
+            self._record(failed_calls=1)
+            raise
+        finally:
+            self._record(calls=1, retries=retries, retried_calls=1 if retries else 0)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Call and retry counters, plus completion cache counters when caching is enabled.
+        """
+        with self._metrics_lock:
+            stats = dict(self.metrics)
+        if self.cache is not None:
+            stats.update({f"cache_{k}": v for k, v in self.cache.stats().items()})
+        return stats
+
+    def _cache_key(
+        self,
+        model: ChatModel,
+        messages: List[Dict[str, Any]],
+        params: Dict[str, Any],
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return CompletionCache.make_key(
+            model.value,
+            messages,
+            {**params, "temperature": resolve_temperature(model, params)},
+            schema.__name__ if schema else None,
         )
 
     def create_completion(
@@ -98,67 +380,19 @@ class LLMCompletionsGateway(CompletionsGateway):
     ) -> str:
         try:
             start_time = time.time()
-            message_content = []
-            if prompt:
-                message_content.append({"role": "user", "content": prompt})
-
-            if images:
-                for image_path in images:
-                    if image_path.startswith("data:image/") or len(image_path) > 255:
-                        base64_image = (
-                            image_path.split(",")[-1]
-                            if "," in image_path
-                            else image_path
-                        )
-                    elif image_path.startswith(("http://", "https://")):
-                        message_content.append(
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_path,
-                                            "detail": "auto",
-                                        },
-                                    }
-                                ],
-                            }
-                        )
-                        continue
-                    else:
-                        try:
-                            with open(image_path, "rb") as image_file:
-                                base64_image = base64.b64encode(
-                                    image_file.read()
-                                ).decode("utf-8")
-                        except Exception as e:
-                            print(f"Error processing image {image_path}: {str(e)}")
-                            raise
-
-                    message_content.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}",
-                                        "detail": "auto",
-                                    },
-                                }
-                            ],
-                        }
-                    )
-
-            completion = self.client.chat.completions.create(
-                model=model.value,
-                messages=message_content,
-                temperature=(
-                    1.0
-                    if model == ChatModel.GPT_O3_MINI
-                    else params.get("temperature", 0.1)
-                ),
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params)
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            completion = self._with_retries(
+                lambda: self.client.chat.completions.create(
+                    model=model.value,
+                    messages=messages,
+                    temperature=resolve_temperature(model, params),
+                )
             )
 
             end_time = time.time()
@@ -166,6 +400,8 @@ class LLMCompletionsGateway(CompletionsGateway):
             logger.info(f"completion response time: {response_time:.2f} seconds")
             logger.info(completion.choices[0].message.content)
 
+            if cache_key:
+                self.cache.set(cache_key, completion.choices[0].message.content)
             return completion.choices[0].message.content
         except Exception as e:
             print(f"Error in LLMCompletionsGateway: {str(e)}")
@@ -180,69 +416,19 @@ class LLMCompletionsGateway(CompletionsGateway):
     ) -> str:
         try:
             start_time = asyncio.get_event_loop().time()
-            message_content = []
-            if prompt:
-                message_content.append({"role": "user", "content": prompt})
-
-            if images:
-                for image_path in images:
-                    if image_path.startswith("data:image/") or len(image_path) > 255:
-                        base64_image = (
-                            image_path.split(",")[-1]
-                            if "," in image_path
-                            else image_path
-                        )
-                    elif image_path.startswith(("http://", "https://")):
-                        message_content.append(
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_path,
-                                            "detail": "auto",
-                                        },
-                                    }
-                                ],
-                            }
-                        )
-                        continue
-                    else:
-                        try:
-                            with open(image_path, "rb") as image_file:
-                                base64_image = base64.b64encode(
-                                    image_file.read()
-                                ).decode("utf-8")
-                        except Exception as e:
-                            logger.error(
-                                f"Error processing image {image_path}: {str(e)}"
-                            )
-                            raise
-
-                    message_content.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}",
-                                        "detail": "auto",
-                                    },
-                                }
-                            ],
-                        }
-                    )
-
-            completion = await self.async_client.chat.completions.create(
-                model=model.value,
-                messages=message_content,
-                temperature=(
-                    1.0
-                    if model == ChatModel.GPT_O3_MINI
-                    else params.get("temperature", 0.1)
-                ),
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params)
+            if cache_key:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return cached
+
+            completion = await self._awith_retries(
+                lambda: self.async_client.chat.completions.create(
+                    model=model.value,
+                    messages=messages,
+                    temperature=resolve_temperature(model, params),
+                )
             )
 
             end_time = asyncio.get_event_loop().time()
@@ -250,11 +436,110 @@ class LLMCompletionsGateway(CompletionsGateway):
             logger.info(f"Async completion response time: {response_time:.2f} seconds")
             logger.info(completion.choices[0].message.content)
 
+            if cache_key:
+                await asyncio.to_thread(
+                    self.cache.set, cache_key, completion.choices[0].message.content
+                )
             return completion.choices[0].message.content
         except Exception as e:
             logger.error(f"Error in async LLMCompletionsGateway: {str(e)}")
             raise
 
+    def stream_completion(
+        self,
+        prompt: str,
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+    ) -> Iterator[str]:
+        """
+        Yield the completion text as it is generated. Retries only cover
+        opening the stream; the full text is cached once the stream ends.
+        """
+        try:
+            start_time = time.time()
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params)
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+
+            stream = self._with_retries(
+                lambda: self.client.chat.completions.create(
+                    model=model.value,
+                    messages=messages,
+                    temperature=resolve_temperature(model, params),
+                    stream=True,
+                )
+            )
+
+            deltas = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    deltas.append(delta)
+                    yield delta
+
+            end_time = time.time()
+            response_time = end_time - start_time
+            logger.info(f"Streamed completion response time: {response_time:.2f} seconds")
+
+            if cache_key:
+                self.cache.set(cache_key, "".join(deltas))
+        except Exception as e:
+            print(f"Error in LLMCompletionsGateway stream: {str(e)}")
+            raise
+
+    async def async_stream_completion(
+        self,
+        prompt: str,
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+    ) -> AsyncIterator[str]:
+        """
+        Async variant of `stream_completion`.
+        """
+        try:
+            start_time = asyncio.get_event_loop().time()
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params)
+            if cache_key:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+
+            stream = await self._awith_retries(
+                lambda: self.async_client.chat.completions.create(
+                    model=model.value,
+                    messages=messages,
+                    temperature=resolve_temperature(model, params),
+                    stream=True,
+                )
+            )
+
+            deltas = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    deltas.append(delta)
+                    yield delta
+
+            end_time = asyncio.get_event_loop().time()
+            response_time = end_time - start_time
+            logger.info(
+                f"Async streamed completion response time: {response_time:.2f} seconds"
+            )
+
+            if cache_key:
+                await asyncio.to_thread(self.cache.set, cache_key, "".join(deltas))
+        except Exception as e:
+            logger.error(f"Error in async LLMCompletionsGateway stream: {str(e)}")
+            raise
+
     def create_structured_completion(
         self,
         prompt: str,
@@ -265,69 +550,22 @@ class LLMCompletionsGateway(CompletionsGateway):
     ) -> T:
         try:
             start_time = time.time()
-            message_content = []
-            if prompt:
-                message_content.append({"role": "user", "content": prompt})
-
-            if images:
-                for image_path in images:
-                    if image_path.startswith("data:image/") or len(image_path) > 255:
-                        base64_image = (
-                            image_path.split(",")[-1]
-                            if "," in image_path
-                            else image_path
-                        )
-                    elif image_path.startswith(("http://", "https://")):
-                        message_content.append(
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_path,
-                                            "detail": "auto",
-                                        },
-                                    }
-                                ],
-                            }
-                        )
-                        continue
-                    else:
-                        try:
-                            with open(image_path, "rb") as image_file:
-                                base64_image = base64.b64encode(
-                                    image_file.read()
-                                ).decode("utf-8")
-                        except Exception as e:
-                            print(f"Error processing image {image_path}: {str(e)}")
-                            raise
-
-                    message_content.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}",
-                                        "detail": "auto",
-                                    },
-                                }
-                            ],
-                        }
-                    )
-
-            response = self.instructor_client.chat.completions.create(
-                model=model.value,
-                messages=message_content,
-                temperature=(
-                    1.0
-                    if model == ChatModel.GPT_O3_MINI
-                    else params.get("temperature", 0.1)
-                ),
-                max_tokens=params.get("max_tokens", 16384),
-                response_model=schema,
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params, schema)
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return schema.model_validate_json(cached)
+
+            # instructor appends reask messages in place, so each attempt gets a fresh copy
+            response = self._with_retries(
+                lambda: self.instructor_client.chat.completions.create(
+                    model=model.value,
+                    messages=list(messages),
+                    temperature=resolve_temperature(model, params),
+                    max_tokens=params.get("max_tokens", 16384),
+                    response_model=schema,
+                )
             )
 
             end_time = time.time()
@@ -336,6 +574,8 @@ class LLMCompletionsGateway(CompletionsGateway):
                 f"Structured completion response time: {response_time:.2f} seconds"
             )
 
+            if cache_key:
+                self.cache.set(cache_key, response.model_dump_json())
             return response
         except Exception as e:
             print(f"Error in LLMCompletionsGateway structured completion: {str(e)}")
@@ -351,71 +591,22 @@ class LLMCompletionsGateway(CompletionsGateway):
     ) -> T:
         try:
             start_time = asyncio.get_event_loop().time()
-            message_content = []
-            if prompt:
-                message_content.append({"role": "user", "content": prompt})
-
-            if images:
-                for image_path in images:
-                    if image_path.startswith("data:image/") or len(image_path) > 255:
-                        base64_image = (
-                            image_path.split(",")[-1]
-                            if "," in image_path
-                            else image_path
-                        )
-                    elif image_path.startswith(("http://", "https://")):
-                        message_content.append(
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_path,
-                                            "detail": "auto",
-                                        },
-                                    }
-                                ],
-                            }
-                        )
-                        continue
-                    else:
-                        try:
-                            with open(image_path, "rb") as image_file:
-                                base64_image = base64.b64encode(
-                                    image_file.read()
-                                ).decode("utf-8")
-                        except Exception as e:
-                            logger.error(
-                                f"Error processing image {image_path}: {str(e)}"
-                            )
-                            raise
-
-                    message_content.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}",
-                                        "detail": "auto",
-                                    },
-                                }
-                            ],
-                        }
-                    )
-
-            response = await self.async_instructor_client.chat.completions.create(
-                model=model.value,
-                messages=message_content,
-                temperature=(
-                    1.0
-                    if model == ChatModel.GPT_O3_MINI
-                    else params.get("temperature", 0.1)
-                ),
-                max_tokens=params.get("max_tokens", 16384),
-                response_model=schema,
+            messages = build_messages(prompt, images)
+            cache_key = self._cache_key(model, messages, params, schema)
+            if cache_key:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return schema.model_validate_json(cached)
+
+            # instructor appends reask messages in place, so each attempt gets a fresh copy
+            response = await self._awith_retries(
+                lambda: self.async_instructor_client.chat.completions.create(
+                    model=model.value,
+                    messages=list(messages),
+                    temperature=resolve_temperature(model, params),
+                    max_tokens=params.get("max_tokens", 16384),
+                    response_model=schema,
+                )
             )
 
             end_time = asyncio.get_event_loop().time()
@@ -424,9 +615,105 @@ class LLMCompletionsGateway(CompletionsGateway):
                 f"Async structured completion response time: {response_time:.2f} seconds"
             )
 
+            if cache_key:
+                await asyncio.to_thread(
+                    self.cache.set, cache_key, response.model_dump_json()
+                )
             return response
         except Exception as e:
             logger.error(
                 f"Error in async LLMCompletionsGateway structured completion: {str(e)}"
             )
             raise
+
+    async def _run_batch(
+        self,
+        prompts: List[str],
+        call: Callable[[str], Awaitable[R]],
+        params: Dict[str, Any],
+        max_concurrency: Optional[int],
+    ) -> List[BatchItemResult[R]]:
+        semaphore = asyncio.Semaphore(max_concurrency or env.COMPLETION_BATCH_CONCURRENCY)
+
+        async def run_one(prompt: str) -> BatchItemResult[R]:
+            async with semaphore:
+                try:
+                    return BatchItemResult(result=await call(prompt))
+                except Exception as e:
+                    return BatchItemResult(error=e)
+
+        start_time = asyncio.get_event_loop().time()
+        results = await asyncio.gather(*(run_one(prompt) for prompt in prompts))
+
+        failed = sum(1 for result in results if not result.ok)
+        response_time = asyncio.get_event_loop().time() - start_time
+        logger.info(
+            f"Batch of {len(prompts)} completions finished in {response_time:.2f} seconds ({failed} failed)"
+        )
+        return list(results)
+
+    async def async_create_completions_batch(
+        self,
+        prompts: List[str],
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = DEFAULT_MODEL_PARAMETERS,
+        max_concurrency: Optional[int] = None,
+    ) -> List[BatchItemResult[str]]:
+        """
+        Run many prompts concurrently under the gateway's rate limits.
+        Results are returned in prompt order; failures are reported per item.
+        """
+        return await self._run_batch(
+            prompts,
+            lambda prompt: self.async_create_completion(prompt, model, images, params),
+            params,
+            max_concurrency,
+        )
+
+    async def async_create_structured_completions_batch(
+        self,
+        prompts: List[str],
+        schema: Type[T],
+        model: Optional[ChatModel] = ChatModel.GPT_4O,
+        images: Optional[List[str]] = None,
+        params: Dict[str, Any] = STRUCTURED_OUTPUT_DEFAULT_MODEL_PARAMETERS,
+        max_concurrency: Optional[int] = None,
+    ) -> List[BatchItemResult[T]]:
+        """
+        Structured variant of `async_create_completions_batch`.
+        """
+        return await self._run_batch(
+            prompts,
+            lambda prompt: self.async_create_structured_completion(
+                prompt, schema, model, images, params
+            ),
+            params,
+            max_concurrency,
+        )
+
+
+_gateways: Dict[str, LLMCompletionsGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(name: str = "default") -> LLMCompletionsGateway:
+    """
+    Return the process-wide gateway registered under `name`, creating the
+    default-configured gateway on first use.
+    """
+    gateway = _gateways.get(name)
+    if gateway is None:
+        with _gateways_lock:
+            gateway = _gateways.get(name)
+            if gateway is None:
+                gateway = _gateways[name] = LLMCompletionsGateway()
+    return gateway
+
+
+def register_gateway(name: str, gateway: LLMCompletionsGateway) -> None:
+    """
+    Register a custom-configured gateway, e.g. with a dedicated cache or rate limits.
+    """
+    with _gateways_lock:
+        _gateways[name] = gateway
@@ -0,0 +1,88 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# One-byte header recording how the rest of the value is stored
+RAW = b"r"
+ZLIB = b"z"
+ZSTD = b"s"
+
+
+def compress_text(value: str, algorithm: str, min_size: int) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) < min_size or algorithm == "none":
+        return RAW + data
+    if algorithm == "zstd":
+        if zstandard is None:
+            raise ImproperlyConfigured("COMPRESSED_FIELD_ALGORITHM is zstd but zstandard is not installed")
+        return ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    if algorithm == "zlib":
+        return ZLIB + zlib.compress(data, 6)
+    raise ImproperlyConfigured(f"Unknown COMPRESSED_FIELD_ALGORITHM: {algorithm}")
+
+
+def decompress_text(value: bytes) -> str:
+    value = bytes(value)
+    header, data = value[:1], value[1:]
+    if header == RAW:
+        return data.decode("utf-8")
+    if header == ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    if header == ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured("zstandard is required to read zstd-compressed values")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown compressed value header: {header!r}")
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text stored compressed in a binary column and decompressed transparently
+    on load. Values shorter than COMPRESSED_FIELD_MIN_SIZE bytes are stored
+    as-is, since compression would only add overhead. Each value records its
+    own algorithm, so changing COMPRESSED_FIELD_ALGORITHM only affects new writes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get("editable") is True:
+            del kwargs["editable"]
+        else:
+            kwargs["editable"] = False
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_text(value)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return value
+        return compress_text(
+            str(value),
+            settings.COMPRESSED_FIELD_ALGORITHM,
+            settings.COMPRESSED_FIELD_MIN_SIZE,
+        )
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.TextField().formfield(**kwargs)
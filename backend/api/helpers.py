@@ -1,114 +1,146 @@
-import tempfile
 import uuid
 import os
 import csv
 from io import StringIO
-from azure.storage.blob import BlobServiceClient, ContentSettings
-from django.conf import settings
-from dotenv import load_dotenv
 
-load_dotenv()
+from django.http import Http404
+from ninja.errors import HttpError
 
+from .storage import get_storage
 
-def upload_csv_to_azure(csv_file, eval_id, original_filename):
+
+async def aget_object_or_404(klass, *args, **kwargs):
+    """
+    Async counterpart of django.shortcuts.get_object_or_404.
+    """
+    queryset = klass._default_manager.all() if hasattr(klass, "_default_manager") else klass
     try:
-        unique_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(original_filename)[1]
-        file_name = f"eval_{eval_id}_{unique_id}{file_extension}"
+        return await queryset.aget(*args, **kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
 
-        account_name = "dunesa"
-        account_key = os.getenv("AZURE_ACCOUNT_KEY")
-        connection_string = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
 
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connection_string
-        )
+def validate_sample_size(sample_size):
+    """
+    Reject sample sizes the sample readers and cache can't serve.
+    """
+    if sample_size is None or sample_size < 1:
+        raise HttpError(400, "sample_size must be a positive integer")
+    return sample_size
 
-        container_client = blob_service_client.get_container_client("geek-evals")
 
-        csv_file.seek(0)
-        container_client.upload_blob(
-            name=file_name,
-            data=csv_file.read(),
-            overwrite=True,
-            content_settings=ContentSettings(content_type="text/csv"),
-        )
+def build_file_name(eval_id, original_filename):
+    unique_id = str(uuid.uuid4())
+    file_extension = os.path.splitext(original_filename)[1]
+    return f"eval_{eval_id}_{unique_id}{file_extension}"
+
 
-        azure_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/geek-evals/{file_name}"
+async def aupload_csv(csv_file, eval_id, original_filename):
+    try:
+        file_name = build_file_name(eval_id, original_filename)
 
-        return azure_url
+        csv_file.seek(0)
+        return await get_storage().asave(file_name, csv_file, content_type="text/csv")
 
     except Exception as e:
-        print(f"Azure upload failed: {str(e)}")
+        print(f"Eval set upload failed: {str(e)}")
         return None
 
 
-def retrieve_csv_from_azure(file_url, sample_size=5):
+SAMPLE_INITIAL_RANGE_BYTES = 8 * 1024
+
+
+def parse_csv_sample(data, sample_size, at_eof):
     """
-    Retrieve CSV data from Azure Blob Storage and return sample rows.
+    Parse sample rows from the leading bytes of a CSV file.
 
     Args:
-        file_url (str): The Azure Blob Storage URL
-        sample_size (int): Number of sample rows to return (default: 5)
+        data (bytes): Leading bytes of the file
+        sample_size (int): Number of sample rows wanted
+        at_eof (bool): Whether `data` is the whole file
 
     Returns:
-        dict: Contains 'sample_rows' (list of dicts) and 'total_rows' (int)
+        list: The sample rows, or None if `data` does not yet hold enough complete rows
     """
+    if not at_eof:
+        # Drop the trailing partial line; b"\n" never occurs inside a multi-byte character
+        data = data[: data.rfind(b"\n") + 1]
+
+    csv_reader = csv.DictReader(StringIO(data.decode("utf-8-sig")))
+    rows = []
     try:
-        account_name = "dunesa"
-        account_key = os.getenv("AZURE_ACCOUNT_KEY")
-        connection_string = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
+        for row in csv_reader:
+            rows.append(dict(row))
+            # One row past the sample proves the sample rows themselves are complete
+            if len(rows) > sample_size:
+                return rows[:sample_size]
+    except csv.Error:
+        if at_eof:
+            raise
+        return None
 
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connection_string
-        )
+    return rows if at_eof else None
 
-        container_client = blob_service_client.get_container_client("geek-evals")
 
-        # Extract blob name from URL
-        blob_name = file_url.split("/")[-1]
+async def aretrieve_csv(file_url, sample_size=5, total_rows=None):
+    """
+    Retrieve CSV data from eval set storage and return sample rows.
 
-        # Download the blob content
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_data = blob_client.download_blob().readall()
+    When `total_rows` is known (EvalSet.row_count) only the leading byte range
+    needed for the sample is downloaded, growing the range until enough
+    complete rows are read. Otherwise the whole blob is downloaded to count rows.
 
-        # Parse CSV content
-        csv_content = blob_data.decode("utf-8")
-        csv_reader = csv.DictReader(StringIO(csv_content))
+    Args:
+        file_url (str): The eval set file URL
+        sample_size (int): Number of sample rows to return (default: 5)
+        total_rows (int): Stored row count of the file, if known
 
-        # Get sample rows
-        sample_rows = []
-        total_rows = 0
+    Returns:
+        dict: Contains 'sample_rows' (list of dicts) and 'total_rows' (int)
+    """
+    try:
+        storage = get_storage()
 
-        for i, row in enumerate(csv_reader):
-            if i < sample_size:
-                sample_rows.append(dict(row))
-            total_rows += 1
+        if total_rows is not None:
+            length = SAMPLE_INITIAL_RANGE_BYTES
+            while True:
+                blob_data = await storage.aread(file_url, offset=0, length=length)
+                at_eof = len(blob_data) < length
+                sample_rows = parse_csv_sample(blob_data, sample_size, at_eof)
+                if sample_rows is not None:
+                    return {"sample_rows": sample_rows, "total_rows": total_rows}
+                length *= 2
 
-        return {"sample_rows": sample_rows, "total_rows": total_rows}
+        # Download the whole file
+        return sample_and_count_csv(await storage.aread(file_url), sample_size)
 
     except Exception as e:
-        print(f"Azure retrieve failed: {str(e)}")
+        print(f"Eval set retrieve failed: {str(e)}")
         return None
 
 
-def delete_csv_from_azure(file_url):
+def sample_and_count_csv(blob_data, sample_size):
+    # Parse CSV content
+    csv_content = blob_data.decode("utf-8")
+    csv_reader = csv.DictReader(StringIO(csv_content))
+
+    # Get sample rows
+    sample_rows = []
+    total_rows = 0
+
+    for i, row in enumerate(csv_reader):
+        if i < sample_size:
+            sample_rows.append(dict(row))
+        total_rows += 1
+
+    return {"sample_rows": sample_rows, "total_rows": total_rows}
+
+
+async def adelete_csv(file_url):
     try:
-        account_name = "dunesa"
-        account_key = os.getenv("AZURE_ACCOUNT_KEY")
-        connection_string = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-        
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connection_string
-        )
-        
-        container_client = blob_service_client.get_container_client("geek-evals")
-        
-        blob_name = file_url.split("/")[-1]
-        container_client.delete_blob(blob_name)
-        
+        await get_storage().adelete(file_url)
         return True
-        
+
     except Exception as e:
-        print(f"Azure delete failed: {str(e)}")
-        return False 
+        print(f"Eval set delete failed: {str(e)}")
+        return False
@@ -0,0 +1,74 @@
+import csv
+import io
+from typing import Dict, Optional
+
+from .models import EvalSetItem
+
+INGEST_BATCH_SIZE = 1000
+
+# Columns treated as ground truth rather than endpoint input
+REFERENCE_OUTPUT_COLUMNS = ("expected_output", "reference_output", "reference", "expected")
+
+
+def split_reference_output(row: Dict[str, str]):
+    """
+    Split a parsed CSV row into its input payload and optional reference output.
+    """
+    payload = dict(row)
+    reference_output: Optional[str] = None
+    for column in REFERENCE_OUTPUT_COLUMNS:
+        if column in payload:
+            reference_output = payload.pop(column)
+            break
+    return payload, reference_output
+
+
+def ingest_csv(eval_set, csv_file, batch_size: int = INGEST_BATCH_SIZE, on_row=None) -> int:
+    """
+    Stream a CSV upload into EvalSetItem rows in a single pass.
+
+    The file is decoded incrementally through a text wrapper, so memory use is
+    bounded by `batch_size` rather than the file size. `on_row` is called with
+    each parsed row so callers can capture samples without re-reading the file.
+
+    Returns:
+        int: Number of data rows ingested
+    """
+    raw_file = getattr(csv_file, "file", csv_file)
+    raw_file.seek(0)
+    text_stream = io.TextIOWrapper(raw_file, encoding="utf-8-sig", newline="")
+
+    try:
+        reader = csv.DictReader(text_stream)
+        reader.fieldnames  # consume the header so line numbers start after it
+        batch = []
+        row_count = 0
+        last_line = reader.line_num
+
+        for row in reader:
+            if on_row:
+                on_row(row)
+            payload, reference_output = split_reference_output(row)
+            batch.append(
+                EvalSetItem(
+                    eval_set=eval_set,
+                    # line the row starts on, which may differ from line_num for multiline fields
+                    row_number=last_line + 1,
+                    input_payload=payload,
+                    reference_output=reference_output,
+                )
+            )
+            last_line = reader.line_num
+            row_count += 1
+
+            if len(batch) >= batch_size:
+                EvalSetItem.objects.bulk_create(batch)
+                batch = []
+
+        if batch:
+            EvalSetItem.objects.bulk_create(batch)
+    finally:
+        # Leave the underlying upload open for the caller
+        text_stream.detach()
+
+    return row_count
@@ -0,0 +1,234 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EvalRun, Job
+from .run_engine import execute_eval_run
+from .schemas import GenerateEvalRunnerSchema
+from .scoring import score_run
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_job(kind: str, payload: Optional[Dict[str, Any]] = None, eval_run=None) -> Job:
+    return Job.objects.create(kind=kind, payload=payload or {}, eval_run=eval_run)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _lease_expiry():
+    return timezone.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+def _expire_abandoned_jobs(now) -> None:
+    # Expired jobs that used up their attempts won't be claimed again
+    abandoned = Job.objects.filter(
+        status="running", lease_expires_at__lt=now, attempts__gte=settings.JOB_MAX_ATTEMPTS
+    )
+    run_ids = list(abandoned.exclude(eval_run=None).values_list("eval_run_id", flat=True))
+    abandoned.update(status="failed", error="Lease expired", completed_at=now)
+    if run_ids:
+        EvalRun.objects.filter(id__in=run_ids, status="running").update(
+            status="failed", completed_at=now
+        )
+
+
+def claim_next_job(worker_id: str) -> Optional[Job]:
+    """
+    Atomically claim the oldest pending job, or a running one whose worker
+    stopped renewing its lease. Rows locked by other workers are skipped, so
+    any number of workers can poll the same table.
+    """
+    now = timezone.now()
+    _expire_abandoned_jobs(now)
+
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status="pending") | Q(status="running", lease_expires_at__lt=now),
+                attempts__lt=settings.JOB_MAX_ATTEMPTS,
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.worker = worker_id
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+        job.lease_expires_at = _lease_expiry()
+        job.save(
+            update_fields=[
+                "status", "worker", "attempts", "started_at", "heartbeat_at", "lease_expires_at",
+            ]
+        )
+    return job
+
+
+def _held(job: Job):
+    # The lease is still ours only if nobody claimed the job since
+    return Job.objects.filter(
+        id=job.id, status="running", worker=job.worker, attempts=job.attempts
+    )
+
+
+def renew_job_lease(job: Job) -> bool:
+    return _held(job).update(lease_expires_at=_lease_expiry(), heartbeat_at=timezone.now()) == 1
+
+
+@contextmanager
+def _heartbeat(job: Job):
+    """
+    Renew the job's lease from a background thread while the handler runs.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                if not renew_job_lease(job):
+                    logger.warning(f"Lost the lease on job {job.id}")
+                    return
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_generate_eval_runner(job: Job) -> Dict[str, Any]:
+    from .api_endpoint_integrations import create_eval_runner
+
+    data = GenerateEvalRunnerSchema(**job.payload)
+    response = async_to_sync(create_eval_runner)(data)
+    return response.model_dump(mode="json")
+
+
+def run_eval_run(job: Job) -> Dict[str, Any]:
+    run = EvalRun.objects.get(id=job.eval_run_id)
+    last_saved = 0.0
+
+    async def on_progress(succeeded: int, failed: int):
+        # Throttled so large runs don't write the job row once per item
+        nonlocal last_saved
+        now = time.monotonic()
+        if now - last_saved < settings.JOB_PROGRESS_INTERVAL:
+            return
+        last_saved = now
+        await Job.objects.filter(id=job.id).aupdate(
+            progress={"succeeded": succeeded, "failed": failed}
+        )
+
+    stats = execute_eval_run(
+        run, on_progress=on_progress, retry_failed=job.payload.get("retry_failed", False)
+    )
+    job.progress = {"succeeded": stats["succeeded"], "failed": stats["failed"]}
+    try:
+        scored = score_run(run)
+    except Exception:
+        # The engine already marked the run completed; its summaries are partial
+        EvalRun.objects.filter(id=run.id).update(status="failed", completed_at=timezone.now())
+        raise
+    return {**stats, **scored}
+
+
+JOB_HANDLERS: Dict[str, Callable[[Job], Dict[str, Any]]] = {
+    "generate_eval_runner": run_generate_eval_runner,
+    "eval_run": run_eval_run,
+}
+
+
+def run_job(job: Job) -> Job:
+    """
+    Execute a claimed job and record its outcome. Handler errors mark the job
+    failed rather than propagating, so one bad job doesn't stop the worker.
+    If the lease was lost meanwhile, the outcome is left to the new owner.
+    """
+    update_fields = ["status", "result", "error", "completed_at", "lease_expires_at"]
+    try:
+        with _heartbeat(job):
+            job.result = JOB_HANDLERS[job.kind](job)
+        job.status = "completed"
+        update_fields.append("progress")
+    except Exception as e:
+        # Progress already written by the handler is left as it was
+        logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+        job.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        job.status = "failed"
+
+    job.completed_at = timezone.now()
+    job.lease_expires_at = None
+    if not _held(job).update(**{field: getattr(job, field) for field in update_fields}):
+        logger.warning(f"Job {job.id} was claimed by another worker; its outcome is discarded")
+    return job
+
+
+def poll(
+    claim: Callable[[], Optional[Any]],
+    handle: Callable[[Any], Any],
+    poll_interval: Optional[float] = None,
+    max_items: Optional[int] = None,
+    burst: bool = False,
+) -> int:
+    """
+    Claim and handle work items until `max_items` have been processed, or, in
+    burst mode, until `claim` finds nothing. Sleeps `poll_interval` between
+    empty claims. Returns the number of items processed.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    processed = 0
+
+    while max_items is None or processed < max_items:
+        item = claim()
+        if item is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        handle(item)
+        processed += 1
+
+    return processed
+
+
+def run_worker(
+    worker_id: Optional[str] = None,
+    poll_interval: Optional[float] = None,
+    max_jobs: Optional[int] = None,
+    burst: bool = False,
+) -> int:
+    """
+    Claim and run jobs until `max_jobs` have been processed, or, in burst
+    mode, until the queue is empty. Returns the number of jobs processed.
+    """
+    worker_id = worker_id or default_worker_id()
+
+    def handle(job: Job) -> None:
+        logger.info(f"Worker {worker_id} running job {job.id} ({job.kind})")
+        run_job(job)
+
+    return poll(lambda: claim_next_job(worker_id), handle, poll_interval, max_jobs, burst)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import EvalRun
+from api.run_engine import execute_eval_run
+
+
+class Command(BaseCommand):
+    help = "Execute an eval run against its endpoint integration"
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_id", help="ID of the EvalRun to execute")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Maximum number of in-flight endpoint requests",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run = EvalRun.objects.get(id=options["run_id"])
+        except EvalRun.DoesNotExist:
+            raise CommandError(f"Eval run {options['run_id']} does not exist")
+
+        stats = execute_eval_run(run, concurrency=options["concurrency"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Run {run.id} completed: {stats['succeeded']} succeeded, "
+                f"{stats['failed']} failed"
+            )
+        )
@@ -0,0 +1,171 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import (
+    CodeVersion,
+    EndpointIntegration,
+    Eval,
+    EvalRun,
+    EvalSet,
+    EvalSetItem,
+    Job,
+    Project,
+    RunResult,
+    hash_code,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Seed a dataset and print EXPLAIN plans and timings for the main API queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--evals", type=int, default=50, help="Evals to seed, each with its own children"
+        )
+        parser.add_argument(
+            "--results", type=int, default=20000, help="RunResult rows to seed for one run"
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Use EXPLAIN ANALYZE where the database supports it",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded rows instead of rolling back"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                target = self.seed(options["evals"], options["results"])
+                self.explain_all(target, options["analyze"])
+                if not options["keep"]:
+                    raise Rollback()
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back")
+
+    def seed(self, eval_count, result_count):
+        user, _ = User.objects.get_or_create(username="explain-queries")
+        project = Project.objects.create(name="Explain", owner=user)
+
+        evals = Eval.objects.bulk_create(
+            [Eval(project=project, name=f"Eval {i}") for i in range(eval_count)]
+        )
+        integrations = EndpointIntegration.objects.bulk_create(
+            [
+                EndpointIntegration(
+                    eval=eval_obj,
+                    name=f"Integration {i}",
+                    endpoint_url="https://example.com/endpoint",
+                    param_schema={"prompt": "string"},
+                )
+                for i, eval_obj in enumerate(evals)
+                for _ in range(5)
+            ]
+        )
+        eval_sets = EvalSet.objects.bulk_create(
+            [
+                EvalSet(
+                    eval_id=integration.eval_id,
+                    endpoint_integration=integration,
+                    name=f"Set {i}",
+                    file_url="https://example.com/set.csv",
+                    uploaded_by=user,
+                )
+                for i, integration in enumerate(integrations)
+            ]
+        )
+        # bulk_create skips save(), which is what normally fills in the hash
+        code = "print('hi')"
+        code_versions = CodeVersion.objects.bulk_create(
+            [
+                CodeVersion(
+                    eval=eval_obj,
+                    version=version,
+                    code=code,
+                    code_sha256=hash_code(code),
+                    created_by=user,
+                    is_active=version == 20,
+                )
+                for eval_obj in evals
+                for version in range(1, 21)
+            ]
+        )
+        runs = EvalRun.objects.bulk_create(
+            [EvalRun(eval_id=cv.eval_id, code_version=cv) for cv in code_versions]
+        )
+
+        target_set = eval_sets[0]
+        items = EvalSetItem.objects.bulk_create(
+            [
+                EvalSetItem(eval_set=target_set, row_number=i + 2, input_payload={"prompt": str(i)})
+                for i in range(result_count)
+            ],
+            batch_size=1000,
+        )
+        RunResult.objects.bulk_create(
+            [
+                RunResult(run=runs[0], eval_set_item=item, raw_output="ok", metrics={})
+                for item in items
+            ],
+            batch_size=1000,
+        )
+        Job.objects.bulk_create(
+            [Job(kind="eval_run", eval_run=run, status="completed") for run in runs]
+        )
+
+        # Refresh planner statistics so plans reflect the seeded data
+        if connection.vendor in ("postgresql", "sqlite"):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        return {
+            "project": project,
+            "eval": evals[0],
+            "integration": integrations[0],
+            "run": runs[0],
+        }
+
+    def queries(self, target):
+        eval_obj = target["eval"]
+        return {
+            "list projects": Project.objects.order_by("-created_at", "-id"),
+            "evals by project": Eval.objects.filter(project=target["project"]).order_by(
+                "-created_at", "-id"
+            ),
+            "integrations by eval": EndpointIntegration.objects.filter(eval=eval_obj).order_by(
+                "-created_at", "-id"
+            ),
+            "eval sets by eval": EvalSet.objects.filter(eval=eval_obj).order_by(
+                "-uploaded_at", "-id"
+            ),
+            "eval sets by integration": EvalSet.objects.filter(
+                endpoint_integration=target["integration"]
+            ).order_by("-uploaded_at", "-id"),
+            "code versions by eval": CodeVersion.objects.filter(eval=eval_obj).order_by(
+                "-version"
+            ),
+            "active code version": CodeVersion.objects.filter(eval=eval_obj, is_active=True),
+            "runs by eval": EvalRun.objects.filter(eval=eval_obj).order_by("-started_at", "-id"),
+            "results by run": RunResult.objects.filter(run=target["run"]).order_by("created_at"),
+            "next pending job": Job.objects.filter(status="pending").order_by("created_at"),
+        }
+
+    def explain_all(self, target, analyze):
+        explain_options = {"analyze": True} if analyze and connection.vendor == "postgresql" else {}
+        for label, queryset in self.queries(target).items():
+            page = queryset[:100]
+            start = time.perf_counter()
+            list(page)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label} ({elapsed_ms:.2f} ms)"))
+            self.stdout.write(page.explain(**explain_options))
+            self.stdout.write("")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.models import EvalRun
+from api.run_summary import rebuild_run_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute run metric summaries from RunResults, e.g. for runs written before summaries existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_ids", nargs="*", help="Runs to rebuild (default: all runs)")
+
+    def handle(self, *args, **options):
+        runs = EvalRun.objects.order_by()
+        if options["run_ids"]:
+            runs = runs.filter(id__in=options["run_ids"])
+
+        count = 0
+        for run_id in runs.values_list("id", flat=True).iterator():
+            rebuild_run_summary(run_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt summaries for {count} runs"))
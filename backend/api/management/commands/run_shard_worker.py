@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import default_worker_id
+from api.sharding import run_shard_worker
+
+
+class Command(BaseCommand):
+    help = "Lease and execute shards of sharded eval runs; run any number of these on any number of nodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--worker-id",
+            default=None,
+            help="Name recorded on leased shards; defaults to host:pid",
+        )
+        parser.add_argument(
+            "--run",
+            dest="run_id",
+            default=None,
+            help="Only lease shards of this eval run",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds to wait between polls when no shard is available",
+        )
+        parser.add_argument(
+            "--max-shards",
+            type=int,
+            default=None,
+            help="Exit after processing this many shards",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no shard is available instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or default_worker_id()
+        self.stdout.write(f"Shard worker {worker_id} started")
+
+        processed = run_shard_worker(
+            worker_id=worker_id,
+            poll_interval=options["poll_interval"],
+            max_shards=options["max_shards"],
+            burst=options["burst"],
+            run_id=options["run_id"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Shard worker {worker_id} processed {processed} shards")
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import default_worker_id, run_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (code generation and eval runs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--worker-id",
+            default=None,
+            help="Name recorded on claimed jobs; defaults to host:pid",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Exit after processing this many jobs",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or default_worker_id()
+        self.stdout.write(f"Worker {worker_id} started")
+
+        processed = run_worker(
+            worker_id=worker_id,
+            poll_interval=options["poll_interval"],
+            max_jobs=options["max_jobs"],
+            burst=options["burst"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} processed {processed} jobs"))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.metrics import DEFAULT_METRICS
+from api.models import EvalRun
+from api.scoring import score_run
+
+
+class Command(BaseCommand):
+    help = "Compute reference-based metrics for an eval run's results"
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_id", help="ID of the EvalRun to score")
+        parser.add_argument(
+            "--metrics",
+            default=",".join(DEFAULT_METRICS),
+            help=f"Comma-separated metrics to compute (default: {','.join(DEFAULT_METRICS)})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Results scored and written per batch",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run = EvalRun.objects.get(id=options["run_id"])
+        except EvalRun.DoesNotExist:
+            raise CommandError(f"Eval run {options['run_id']} does not exist")
+
+        metrics = [metric.strip() for metric in options["metrics"].split(",") if metric.strip()]
+        unknown = set(metrics) - set(DEFAULT_METRICS)
+        if unknown:
+            raise CommandError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+
+        stats = score_run(run, metrics=metrics, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Run {run.id} scored: {stats['scored']} results, {stats['skipped']} skipped"
+            )
+        )
@@ -0,0 +1,272 @@
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+NUMBER_PATTERN = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+DEFAULT_METRICS = ("exact_match", "token_f1", "bleu", "rouge_l", "length", "numeric")
+BLEU_MAX_ORDER = 4
+
+
+def normalize(text: str) -> str:
+    return " ".join(TOKEN_PATTERN.findall(text.lower()))
+
+
+class TokenizedBatch:
+    """
+    Token ids for a batch of texts, concatenated into one flat array with
+    per-text offsets. Every text in the batch shares one vocabulary, so token
+    and n-gram comparisons become integer array operations.
+    """
+
+    def __init__(self, texts: Sequence[str], vocabulary: Dict[str, int]):
+        ids = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            lengths[i] = len(tokens)
+            ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lengths = lengths
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        # Row and end offset of the text each token belongs to
+        self.rows = np.repeat(np.arange(len(texts)), lengths)
+        self.ends = np.repeat(self.offsets[1:], lengths)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def padded(self, rows: np.ndarray, fill: int) -> np.ndarray:
+        """
+        Tokens of `rows` as a (len(rows), longest) matrix padded with `fill`.
+        """
+        lengths = self.lengths[rows]
+        matrix = np.full((len(rows), int(lengths.max(initial=0))), fill, dtype=np.int64)
+        columns = np.arange(matrix.shape[1])
+        mask = columns < lengths[:, None]
+        matrix[mask] = self.ids[(self.offsets[rows][:, None] + columns)[mask]]
+        return matrix
+
+
+class NgramCounter:
+    """
+    Gives every n-gram in a prediction/reference batch an integer id, one
+    order at a time: an n-gram's id is derived from its (n-1)-gram prefix id
+    and its last token, so ids stay small however large the vocabulary.
+    """
+
+    def __init__(self, predictions: TokenizedBatch, references: TokenizedBatch):
+        self.rows = len(predictions)
+        self.sides = [predictions, references]
+        # Start position of every window still long enough for the next order
+        self.starts = [np.arange(len(side.ids)) for side in self.sides]
+        self.codes = [side.ids.copy() for side in self.sides]
+        self.order = 1
+        # Token ids are below this on both sides, so prefix * base + token is unique
+        self.base = int(max(side.ids.max(initial=-1) for side in self.sides)) + 1
+
+    def next_order(self) -> None:
+        self.order += 1
+        keys = []
+        for i, side in enumerate(self.sides):
+            keep = self.starts[i] + self.order <= side.ends[self.starts[i]]
+            self.starts[i] = self.starts[i][keep]
+            last_tokens = side.ids[self.starts[i] + self.order - 1]
+            keys.append(self.codes[i][keep] * self.base + last_tokens)
+
+        combined = np.concatenate(keys)
+        _, ids = np.unique(combined, return_inverse=True)
+        ids = ids.reshape(-1)
+        self.codes = [ids[: len(keys[0])], ids[len(keys[0]) :]]
+
+    def clipped_matches(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per row, for the current order: n-grams in the prediction, n-grams in
+        the reference, and prediction n-grams found in the reference with
+        counts clipped to the reference count.
+        """
+        pred_rows = self.sides[0].rows[self.starts[0]]
+        ref_rows = self.sides[1].rows[self.starts[1]]
+        pred_totals = np.bincount(pred_rows, minlength=self.rows)
+        ref_totals = np.bincount(ref_rows, minlength=self.rows)
+        if not len(pred_rows) or not len(ref_rows):
+            return pred_totals, ref_totals, np.zeros(self.rows, dtype=np.int64)
+
+        distinct = int(max(self.codes[0].max(), self.codes[1].max())) + 1
+        pred_unique, pred_counts = np.unique(pred_rows * distinct + self.codes[0], return_counts=True)
+        ref_unique, ref_counts = np.unique(ref_rows * distinct + self.codes[1], return_counts=True)
+        shared, pred_index, ref_index = np.intersect1d(
+            pred_unique, ref_unique, assume_unique=True, return_indices=True
+        )
+        clipped = np.minimum(pred_counts[pred_index], ref_counts[ref_index])
+        matches = np.bincount(shared // distinct, weights=clipped, minlength=self.rows)
+        return pred_totals, ref_totals, matches.astype(np.int64)
+
+
+def exact_match(predictions: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    return np.array(
+        [normalize(p) == normalize(r) for p, r in zip(predictions, references)], dtype=np.float64
+    )
+
+
+def token_f1(predictions: TokenizedBatch, references: TokenizedBatch) -> np.ndarray:
+    pred_totals, ref_totals, overlap = NgramCounter(predictions, references).clipped_matches()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(pred_totals > 0, overlap / pred_totals, 0.0)
+        recall = np.where(ref_totals > 0, overlap / ref_totals, 0.0)
+        f1 = np.where(
+            precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0
+        )
+    # Two empty texts agree perfectly
+    return np.where((pred_totals == 0) & (ref_totals == 0), 1.0, f1)
+
+
+def bleu(
+    predictions: TokenizedBatch, references: TokenizedBatch, max_order: int = BLEU_MAX_ORDER
+) -> np.ndarray:
+    """
+    Sentence-level BLEU with add-one smoothing of the n>1 precisions
+    (Lin & Och, 2004), so short outputs don't collapse to zero.
+    """
+    log_precisions = np.zeros(len(predictions))
+    counter = NgramCounter(predictions, references)
+    for n in range(1, max_order + 1):
+        if n > 1:
+            counter.next_order()
+        pred_totals, _, matches = counter.clipped_matches()
+        if n == 1:
+            numerator, denominator = matches.astype(np.float64), pred_totals.astype(np.float64)
+        else:
+            numerator, denominator = matches + 1.0, pred_totals + 1.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_precisions += np.log(np.where(denominator > 0, numerator / denominator, 0.0))
+
+    pred_lengths = predictions.lengths.astype(np.float64)
+    ref_lengths = references.lengths.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        brevity_penalty = np.where(
+            pred_lengths < ref_lengths,
+            np.exp(1 - ref_lengths / np.maximum(pred_lengths, 1)),
+            1.0,
+        )
+    scores = brevity_penalty * np.exp(log_precisions / max_order)
+    return np.nan_to_num(np.where(pred_lengths > 0, scores, 0.0))
+
+
+def lcs_lengths(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Longest common subsequence lengths for row pairs of two padded token
+    matrices (padding must never match: use different fill values).
+
+    The DP runs one token of `a` at a time for all rows together. Within a DP
+    row, cell j is max(cell j-1, diagonal + 1 on a match, cell above), and
+    since the diagonal + 1 is never less than the cell above, that is a
+    running maximum over "diagonal + 1 if match else above", i.e. a single
+    np.maximum.accumulate. Padding in `a` matches nothing and leaves the row
+    unchanged, so rows of different lengths can share a matrix.
+    """
+    row = np.zeros((a.shape[0], b.shape[1] + 1), dtype=np.int64)
+    for i in range(a.shape[1]):
+        candidates = np.where(b == a[:, i : i + 1], row[:, :-1] + 1, row[:, 1:])
+        row[:, 1:] = np.maximum.accumulate(candidates, axis=1)
+    return row[:, -1]
+
+
+def rouge_l(
+    predictions: TokenizedBatch, references: TokenizedBatch, chunk_size: int = 512
+) -> np.ndarray:
+    # Rows of similar length share a chunk, which keeps padding small
+    order = np.argsort(predictions.lengths + references.lengths, kind="stable")
+    lcs = np.zeros(len(predictions), dtype=np.float64)
+    for start in range(0, len(order), chunk_size):
+        rows = order[start : start + chunk_size]
+        lcs[rows] = lcs_lengths(predictions.padded(rows, -1), references.padded(rows, -2))
+
+    pred_lengths = predictions.lengths
+    ref_lengths = references.lengths
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(pred_lengths > 0, lcs / pred_lengths, 0.0)
+        recall = np.where(ref_lengths > 0, lcs / ref_lengths, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return np.where((pred_lengths == 0) & (ref_lengths == 0), 1.0, f1)
+
+
+def parse_number(text: str) -> float:
+    match = NUMBER_PATTERN.search(text.replace(",", ""))
+    return float(match.group()) if match else math.nan
+
+
+def numeric_accuracy(
+    predictions: Sequence[str],
+    references: Sequence[str],
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+) -> np.ndarray:
+    """
+    1.0 when the first number in the prediction is within tolerance of the
+    reference's, 0.0 when it isn't, NaN when the reference has no number.
+    """
+    predicted = np.array([parse_number(p) for p in predictions], dtype=np.float64)
+    expected = np.array([parse_number(r) for r in references], dtype=np.float64)
+    close = np.isclose(predicted, expected, rtol=rtol, atol=atol)
+    return np.where(np.isnan(expected), np.nan, close.astype(np.float64))
+
+
+def compute_metrics(
+    predictions: Sequence[str],
+    references: Sequence[str],
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+) -> List[Dict[str, Any]]:
+    """
+    Score a batch of predictions against references and return one metrics
+    dict per row. Every metric is computed for the whole batch at once.
+    """
+    vocabulary: Dict[str, int] = {}
+    pred_tokens = TokenizedBatch(predictions, vocabulary)
+    ref_tokens = TokenizedBatch(references, vocabulary)
+
+    columns: Dict[str, np.ndarray] = {}
+    if "exact_match" in metrics:
+        columns["exact_match"] = exact_match(predictions, references)
+    if "token_f1" in metrics:
+        columns["token_f1"] = token_f1(pred_tokens, ref_tokens)
+    if "bleu" in metrics:
+        columns["bleu"] = bleu(pred_tokens, ref_tokens)
+    if "rouge_l" in metrics:
+        columns["rouge_l"] = rouge_l(pred_tokens, ref_tokens)
+    if "length" in metrics:
+        columns["output_tokens"] = pred_tokens.lengths.astype(np.float64)
+        columns["reference_tokens"] = ref_tokens.lengths.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            columns["length_ratio"] = np.where(
+                ref_tokens.lengths > 0, pred_tokens.lengths / ref_tokens.lengths, np.nan
+            )
+    if "numeric" in metrics:
+        columns["numeric_accuracy"] = numeric_accuracy(predictions, references, rtol, atol)
+
+    # NaN isn't valid JSON; a metric that doesn't apply to a row is left out
+    names = list(columns)
+    values = np.column_stack([columns[name] for name in names]) if names else None
+    return [
+        {
+            name: (int(value) if name.endswith("_tokens") else round(float(value), 6))
+            for name, value in zip(names, row)
+            if not math.isnan(value)
+        }
+        for row in (values if values is not None else [[]] * len(predictions))
+    ]
+
+
+def reference_text(reference_output: Any) -> Optional[str]:
+    if reference_output is None:
+        return None
+    if isinstance(reference_output, str):
+        return reference_output
+    return json.dumps(reference_output, sort_keys=True)
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='codeversion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['eval'], name='codeversion_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endpointintegration',
+            index=models.Index(fields=['-created_at', '-id'], name='integration_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endpointintegration',
+            index=models.Index(fields=['eval', '-created_at', '-id'], name='integration_eval_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eval',
+            index=models.Index(fields=['-created_at', '-id'], name='eval_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eval',
+            index=models.Index(fields=['project', '-created_at', '-id'], name='eval_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evalrun',
+            index=models.Index(fields=['eval', '-started_at', '-id'], name='evalrun_eval_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evalset',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='evalset_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evalset',
+            index=models.Index(fields=['eval', '-uploaded_at', '-id'], name='evalset_eval_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evalset',
+            index=models.Index(fields=['endpoint_integration', '-uploaded_at', '-id'], name='evalset_integration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_at', '-id'], name='project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='runresult',
+            index=models.Index(fields=['run', 'created_at'], name='runresult_run_created_idx'),
+        ),
+    ]
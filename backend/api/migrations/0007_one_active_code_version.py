@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def keep_latest_active_version(apps, schema_editor):
+    # Concurrent saves could leave several active versions; keep the newest
+    CodeVersion = apps.get_model('api', 'CodeVersion')
+    active = CodeVersion.objects.filter(is_active=True).order_by('eval_id', '-version')
+    seen = set()
+    stale = []
+    for code_version_id, eval_id in active.values_list('id', 'eval_id'):
+        if eval_id in seen:
+            stale.append(code_version_id)
+        seen.add(eval_id)
+    CodeVersion.objects.filter(id__in=stale).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_active_version, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='codeversion',
+            name='codeversion_active_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='codeversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('eval',), name='codeversion_one_active_per_eval'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def drop_duplicate_results(apps, schema_editor):
+    # Keep the earliest result for each (run, item) pair
+    RunResult = apps.get_model('api', 'RunResult')
+    results = RunResult.objects.filter(eval_set_item__isnull=False).order_by(
+        'run_id', 'eval_set_item_id', 'created_at'
+    )
+    seen = set()
+    duplicates = []
+    for result_id, run_id, item_id in results.values_list('id', 'run_id', 'eval_set_item_id'):
+        if (run_id, item_id) in seen:
+            duplicates.append(result_id)
+        seen.add((run_id, item_id))
+    RunResult.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_one_active_code_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='runresult',
+            constraint=models.UniqueConstraint(fields=('run', 'eval_set_item'), name='runresult_one_per_item'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+import api.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+COMPRESSED_COLUMNS = [
+    ('CodeVersion', 'code'),
+    ('RunResult', 'raw_output'),
+]
+
+
+def copy_columns(apps, source_suffix, target_suffix):
+    for model_name, field_name in COMPRESSED_COLUMNS:
+        model = apps.get_model('api', model_name)
+        source = field_name + source_suffix
+        target = field_name + target_suffix
+        batch = []
+        for obj in model.objects.only('id', source).iterator(chunk_size=BATCH_SIZE):
+            setattr(obj, target, getattr(obj, source))
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, [target])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [target])
+
+
+def compress_existing_rows(apps, schema_editor):
+    copy_columns(apps, '', '_compressed')
+
+
+def decompress_existing_rows(apps, schema_editor):
+    copy_columns(apps, '_compressed', '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_one_result_per_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codeversion',
+            name='code_compressed',
+            field=api.fields.CompressedTextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='runresult',
+            name='raw_output_compressed',
+            field=api.fields.CompressedTextField(null=True),
+        ),
+        # Nullable while both columns exist, so the migration can be reversed
+        migrations.AlterField(
+            model_name='codeversion',
+            name='code',
+            field=models.TextField(help_text='Full Python script, runnable out-of-the-box', null=True),
+        ),
+        migrations.AlterField(
+            model_name='runresult',
+            name='raw_output',
+            field=models.TextField(help_text='Raw response from the endpoint', null=True),
+        ),
+        migrations.RunPython(compress_existing_rows, decompress_existing_rows),
+        migrations.RemoveField(
+            model_name='codeversion',
+            name='code',
+        ),
+        migrations.RemoveField(
+            model_name='runresult',
+            name='raw_output',
+        ),
+        migrations.RenameField(
+            model_name='codeversion',
+            old_name='code_compressed',
+            new_name='code',
+        ),
+        migrations.RenameField(
+            model_name='runresult',
+            old_name='raw_output_compressed',
+            new_name='raw_output',
+        ),
+        migrations.AlterField(
+            model_name='codeversion',
+            name='code',
+            field=api.fields.CompressedTextField(help_text='Full Python script, runnable out-of-the-box'),
+        ),
+        migrations.AlterField(
+            model_name='runresult',
+            name='raw_output',
+            field=api.fields.CompressedTextField(help_text='Raw response from the endpoint'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def hash_existing_code(apps, schema_editor):
+    CodeVersion = apps.get_model('api', 'CodeVersion')
+    batch = []
+    for code_version in CodeVersion.objects.only('id', 'code').iterator(chunk_size=BATCH_SIZE):
+        code_version.code_sha256 = hashlib.sha256(code_version.code.encode('utf-8')).hexdigest()
+        batch.append(code_version)
+        if len(batch) >= BATCH_SIZE:
+            CodeVersion.objects.bulk_update(batch, ['code_sha256'])
+            batch = []
+    if batch:
+        CodeVersion.objects.bulk_update(batch, ['code_sha256'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_compress_code_and_raw_output'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codeversion',
+            name='code_sha256',
+            field=models.CharField(default='', help_text='SHA-256 of the code, for deduplication', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_existing_code, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='codeversion',
+            index=models.Index(fields=['eval', 'code_sha256'], name='codeversion_eval_sha_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_codeversion_code_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunMetricSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source', models.CharField(choices=[('run', 'Run'), ('metrics', 'Metrics'), ('scores', 'Scores')], max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.FloatField(default=0.0)),
+                ('sum_squares', models.FloatField(default=0.0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('sketch', models.JSONField(default=dict, help_text='Mergeable quantile sketch buckets')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_summaries', to='api.evalrun')),
+            ],
+            options={
+                'ordering': ['source', 'name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='runmetricsummary',
+            constraint=models.UniqueConstraint(fields=('run', 'source', 'name'), name='runmetricsummary_one_per_metric'),
+        ),
+    ]
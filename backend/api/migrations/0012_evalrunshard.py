@@ -0,0 +1,46 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_runmetricsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvalRunShard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('index', models.IntegerField()),
+                ('first_row', models.IntegerField(help_text='First EvalSetItem.row_number, inclusive')),
+                ('last_row', models.IntegerField(help_text='Last EvalSetItem.row_number, inclusive')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('worker', models.CharField(blank=True, help_text='Worker holding the lease', max_length=255)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('stats', models.JSONField(default=dict, help_text='Engine and scoring counters')),
+                ('metric_aggregates', models.JSONField(default=dict, help_text='Aggregates of the metrics scored for this shard')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='api.evalrun')),
+            ],
+            options={
+                'ordering': ['run', 'index'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='evalrunshard',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='evalrunshard_lease_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='evalrunshard',
+            constraint=models.UniqueConstraint(fields=('run', 'index'), name='evalrunshard_one_per_index'),
+        ),
+    ]
@@ -1,8 +1,11 @@
+import hashlib
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
+from .fields import CompressedTextField
+
 
 class Project(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -14,6 +17,7 @@ class Project(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at', '-id'], name='project_created_idx')]
         
     def __str__(self):
         return self.name
@@ -29,6 +33,10 @@ class Eval(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='eval_created_idx'),
+            models.Index(fields=['project', '-created_at', '-id'], name='eval_project_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.project.name} - {self.name}"
@@ -63,6 +71,10 @@ class EndpointIntegration(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='integration_created_idx'),
+            models.Index(fields=['eval', '-created_at', '-id'], name='integration_eval_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.eval.name} - {self.name}"
@@ -87,6 +99,14 @@ class EvalSet(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['-uploaded_at', '-id'], name='evalset_uploaded_idx'),
+            models.Index(fields=['eval', '-uploaded_at', '-id'], name='evalset_eval_uploaded_idx'),
+            models.Index(
+                fields=['endpoint_integration', '-uploaded_at', '-id'],
+                name='evalset_integration_idx',
+            ),
+        ]
 
     def clean(self):
         if self.eval and self.endpoint_integration:
@@ -124,6 +144,10 @@ class EvalSetItem(models.Model):
         return f"{self.eval_set.name} - Row {self.row_number}"
 
 
+def hash_code(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
 class CodeVersion(models.Model):
     """
     Every time AI writes new integration code (or user edits it), snapshot it here
@@ -145,26 +169,54 @@ class CodeVersion(models.Model):
         blank=True,
     )
     version = models.IntegerField(help_text="Incrementing; start at 1")
-    code = models.TextField(help_text="Full Python script, runnable out-of-the-box")
+    code = CompressedTextField(help_text="Full Python script, runnable out-of-the-box")
+    code_sha256 = models.CharField(max_length=64, help_text="SHA-256 of the code, for deduplication")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_code_versions')
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=False, help_text="Only one version per eval is active")
 
     class Meta:
         ordering = ['-version']
+        # unique_together already indexes (eval, version) for per-eval listing
         unique_together = ['eval', 'version']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['eval'],
+                condition=models.Q(is_active=True),
+                name='codeversion_one_active_per_eval',
+            ),
+        ]
+        indexes = [models.Index(fields=['eval', 'code_sha256'], name='codeversion_eval_sha_idx')]
+
+    @staticmethod
+    def lock_eval(eval_id):
+        """
+        Lock the parent eval row so concurrent writers for the same eval allocate
+        versions and switch the active version one at a time. Call inside a transaction.
+        """
+        list(Eval.objects.select_for_update().filter(id=eval_id).order_by().values_list('id'))
 
     def save(self, *args, **kwargs):
-        # Auto-increment version for new code versions
-        if not self.version:
-            last_version = CodeVersion.objects.filter(eval=self.eval).order_by('-version').first()
-            self.version = (last_version.version + 1) if last_version else 1
+        if 'code' not in self.get_deferred_fields():
+            self.code_sha256 = hash_code(self.code)
 
-        # Ensure only one active version per eval
-        if self.is_active:
-            CodeVersion.objects.filter(eval=self.eval, is_active=True).update(is_active=False)
+        with transaction.atomic():
+            CodeVersion.lock_eval(self.eval_id)
 
-        super().save(*args, **kwargs)
+            # Auto-increment version for new code versions
+            if not self.version:
+                last_version = CodeVersion.objects.filter(eval_id=self.eval_id).aggregate(
+                    last=models.Max('version')
+                )['last']
+                self.version = (last_version or 0) + 1
+
+            # Ensure only one active version per eval
+            if self.is_active:
+                CodeVersion.objects.filter(eval_id=self.eval_id, is_active=True).exclude(
+                    pk=self.pk
+                ).update(is_active=False)
+
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.eval.name} - v{self.version}"
@@ -194,6 +246,9 @@ class EvalRun(models.Model):
     
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['eval', '-started_at', '-id'], name='evalrun_eval_started_idx'),
+        ]
         
     def __str__(self):
         return f"{self.eval.name} - Run {self.started_at.strftime('%Y-%m-%d %H:%M')}"
@@ -210,7 +265,7 @@ class RunResult(models.Model):
         related_name='results',
         help_text="NULL if you skip items table"
     )
-    raw_output = models.TextField(help_text="Raw response from the endpoint")
+    raw_output = CompressedTextField(help_text="Raw response from the endpoint")
     metrics = models.JSONField(
         default=dict,
         help_text="BLEU/ROUGE/etc. computed metrics"
@@ -223,6 +278,136 @@ class RunResult(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['run', 'created_at'], name='runresult_run_created_idx')]
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'eval_set_item'], name='runresult_one_per_item'),
+        ]
         
     def __str__(self):
         return f"{self.run.eval.name} - Result {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class EvalRunShard(models.Model):
+    """
+    A row_number range of a run's eval set, leased by one shard worker at a
+    time. A lease that isn't renewed by heartbeats expires and the shard can
+    be leased again by any worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run = models.ForeignKey(EvalRun, on_delete=models.CASCADE, related_name='shards')
+    index = models.IntegerField()
+    first_row = models.IntegerField(help_text="First EvalSetItem.row_number, inclusive")
+    last_row = models.IntegerField(help_text="Last EvalSetItem.row_number, inclusive")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    worker = models.CharField(max_length=255, blank=True, help_text="Worker holding the lease")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    stats = models.JSONField(default=dict, help_text="Engine and scoring counters")
+    metric_aggregates = models.JSONField(
+        default=dict, help_text="Aggregates of the metrics scored for this shard"
+    )
+    error = models.TextField(blank=True, null=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run', 'index']
+        indexes = [
+            models.Index(fields=['status', 'lease_expires_at'], name='evalrunshard_lease_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'index'], name='evalrunshard_one_per_index'),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} - Shard {self.index} (rows {self.first_row}-{self.last_row})"
+
+
+class RunMetricSummary(models.Model):
+    """
+    Running aggregate of one metric over a run's results, updated as results
+    are written so summaries never have to scan RunResult
+    """
+    SOURCE_CHOICES = [
+        ('run', 'Run'),
+        ('metrics', 'Metrics'),
+        ('scores', 'Scores'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run = models.ForeignKey(EvalRun, on_delete=models.CASCADE, related_name='metric_summaries')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    name = models.CharField(max_length=255)
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    sum_squares = models.FloatField(default=0.0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, help_text="Mergeable quantile sketch buckets")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['source', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'source', 'name'], name='runmetricsummary_one_per_metric'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} - {self.source}.{self.name}"
+
+
+class Job(models.Model):
+    """
+    Background work queued for the `run_worker` command, e.g. code generation
+    or executing an eval run. A running job is leased to its worker; if the
+    worker stops renewing the lease, the job can be claimed again.
+    """
+    KIND_CHOICES = [
+        ('generate_eval_runner', 'Generate eval runner'),
+        ('eval_run', 'Eval run'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    payload = models.JSONField(default=dict, help_text="Arguments for the job handler")
+    eval_run = models.ForeignKey(
+        EvalRun,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True,
+    )
+    progress = models.JSONField(default=dict, help_text="Handler-reported progress counters")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True, help_text="Worker that claimed the job")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} - {self.status}"
@@ -0,0 +1,125 @@
+import base64
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Type
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from ninja import Schema
+from ninja.errors import HttpError
+from ninja.responses import NinjaJSONEncoder
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_keyset_cursor(*values) -> str:
+    payload = json.dumps(list(values))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_keyset_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HttpError(400, "Invalid cursor")
+    return values
+
+
+def encode_cursor(ordering_value, pk) -> str:
+    return encode_keyset_cursor(ordering_value.isoformat(), str(pk))
+
+
+def decode_cursor_id(value) -> uuid.UUID:
+    """
+    Parse the primary key stored in a cursor, rejecting anything that isn't a UUID.
+    """
+    try:
+        return uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        raise HttpError(400, "Invalid cursor")
+
+
+def decode_cursor(cursor: str):
+    ordering_value, pk = decode_keyset_cursor(cursor, 2)
+    try:
+        parsed = parse_datetime(ordering_value)
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is None:
+        raise HttpError(400, "Invalid cursor")
+    return parsed, decode_cursor_id(pk)
+
+
+def resolve_fields(schema: Type[Schema], fields: Optional[str]) -> List[str]:
+    """
+    Validate a comma-separated `fields=` projection against the list schema.
+    No projection means every field in the schema.
+    """
+    available = list(schema.model_fields)
+    if not fields:
+        return available
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in available]
+    if unknown:
+        raise HttpError(400, f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def page_limit(limit: Optional[int]) -> int:
+    limit = limit or settings.API_PAGE_SIZE
+    if limit < 1:
+        raise HttpError(400, "limit must be positive")
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def paginate(
+    queryset,
+    schema: Type[Schema],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    ordering_field: str = "created_at",
+) -> JsonResponse:
+    """
+    Keyset pagination, newest first, on (`ordering_field`, id). Only the
+    projected columns are selected and serialized, straight from `values()`
+    rows. The cursor for the next page, if any, is returned in the
+    X-Next-Cursor header so the body stays a plain list. Requests with
+    neither `limit` nor `cursor` get every row, as before pagination.
+    """
+    if limit is not None or cursor:
+        limit = page_limit(limit)
+    projected = resolve_fields(schema, fields)
+    columns = list(dict.fromkeys(projected + ["id", ordering_field]))
+
+    queryset = queryset.order_by(f"-{ordering_field}", "-id")
+    if cursor:
+        ordering_value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{ordering_field}__lt": ordering_value})
+            | Q(**{ordering_field: ordering_value, "id__lt": pk})
+        )
+
+    if limit is None:
+        rows: List[Dict[str, Any]] = list(queryset.values(*columns))
+    else:
+        # One extra row tells us whether there is a next page
+        rows = list(queryset.values(*columns)[: limit + 1])
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][ordering_field], rows[-1]["id"])
+
+    response = JsonResponse(
+        [{field: row[field] for field in projected} for row in rows],
+        encoder=NinjaJSONEncoder,
+        safe=False,
+    )
+    if next_cursor:
+        response[NEXT_CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Rough characters-per-token ratio for English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt: str, params: Dict[str, Any]) -> int:
+    """
+    Estimate the tokens a request counts against a tokens-per-minute budget:
+    the prompt plus the completion budget it reserves.
+    """
+    return len(prompt or "") // CHARS_PER_TOKEN + int(params.get("max_tokens", 0))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `capacity` tokens per `period` seconds.
+    Safe to share between event loops running in different threads.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate
+        )
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                deficit = amount - self.tokens
+            await asyncio.sleep(deficit / self.refill_rate)
+
+
+class RateLimiter:
+    """
+    Schedules requests against requests-per-minute and tokens-per-minute budgets.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            await self.token_bucket.acquire(tokens)
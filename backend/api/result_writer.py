@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import RunResult
+from .run_summary import aggregate_results, apply_run_summary
+
+logger = logging.getLogger(__name__)
+
+
+class RunResultWriter:
+    """
+    Buffers RunResult rows and inserts them with bulk_create once `batch_size`
+    rows are waiting or `flush_interval` seconds have passed. Items that
+    already have a result for the run are dropped and inserts ignore
+    conflicts on (run, eval_set_item), so re-running items of a resumed run
+    never duplicates results. Each flush folds the inserted rows into the
+    run's summaries in the same transaction, unless `summarize` is off, e.g.
+    for shards, whose summaries are built once when the run is finalized.
+
+    Use as an async context manager: the periodic flusher runs while the
+    block is open and whatever is left is flushed on exit, including when the
+    block exits with an error or is cancelled.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        summarize: bool = True,
+    ):
+        self.batch_size = batch_size or settings.RUN_RESULT_BATCH_SIZE
+        self.summarize = summarize
+        self.flush_interval = (
+            settings.RUN_RESULT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.buffer: List[RunResult] = []
+        self.stats = {
+            "flushes": 0,
+            "rows": 0,
+            "total_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "last_flush_ms": 0.0,
+        }
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        if self.flush_interval:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def add(self, result: RunResult) -> None:
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.buffer:
+                return
+            batch, self.buffer = self.buffer, []
+
+            start = time.perf_counter()
+            try:
+                await sync_to_async(self._write)(batch)
+            except Exception:
+                # Keep the rows so the next flush retries them
+                self.buffer = batch + self.buffer
+                raise
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(batch)
+            self.stats["total_flush_ms"] += elapsed_ms
+            self.stats["last_flush_ms"] = elapsed_ms
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+
+    def _write(self, batch: List[RunResult]) -> None:
+        by_run = defaultdict(list)
+        for result in batch:
+            by_run[result.run_id].append(result)
+
+        with transaction.atomic():
+            for run_id, results in by_run.items():
+                RunResult.objects.bulk_create(
+                    results, batch_size=self.batch_size, ignore_conflicts=True
+                )
+                if not self.summarize:
+                    continue
+                # Ids are assigned client-side, so the ones that exist now are exactly the
+                # rows this insert wrote; rows skipped as conflicts, including ones a
+                # concurrent writer inserted first, never reach the summary
+                inserted = set(
+                    RunResult.objects.filter(
+                        id__in=[result.id for result in results]
+                    ).values_list("id", flat=True)
+                )
+                apply_run_summary(
+                    run_id, aggregate_results(r for r in results if r.id in inserted)
+                )
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Periodic RunResult flush failed: {str(e)}")
+
+    def flush_stats(self) -> Dict[str, float]:
+        flushes = self.stats["flushes"]
+        return {
+            **self.stats,
+            "avg_flush_ms": self.stats["total_flush_ms"] / flushes if flushes else 0.0,
+        }
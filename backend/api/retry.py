@@ -0,0 +1,105 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+R = TypeVar("R")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the server-requested delay from a Retry-After (or retry-after-ms) header.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient API failures
+    (throttling, timeouts, connection errors and 5xx responses). A server
+    Retry-After header takes precedence over the computed backoff.
+    """
+
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def is_retryable(self, error: Exception) -> bool:
+        from openai import APIConnectionError, APIStatusError
+
+        if isinstance(error, APIConnectionError):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        return attempt < self.max_attempts and self.is_retryable(error)
+
+    def call(
+        self,
+        func: Callable[[], R],
+        on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+    ) -> R:
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self.delay(attempt, e)
+                if on_retry:
+                    on_retry(attempt, e, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(
+        self,
+        func: Callable[[], Awaitable[R]],
+        on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+    ) -> R:
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self.delay(attempt, e)
+                if on_retry:
+                    on_retry(attempt, e, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,242 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import EvalRun, EvalSetItem, RunResult
+from .result_writer import RunResultWriter
+from .run_summary import rebuild_run_summary
+
+logger = logging.getLogger(__name__)
+
+ITEM_FETCH_CHUNK_SIZE = 500
+
+
+def build_request_params(integration, item) -> Dict[str, Any]:
+    """
+    Merge the integration defaults with the item's input payload. When the
+    integration declares a param schema, only the declared params are sent.
+    """
+    params = dict(integration.param_defaults or {})
+    payload = item.input_payload or {}
+    if integration.param_schema:
+        payload = {k: v for k, v in payload.items() if k in integration.param_schema}
+    params.update(payload)
+    return params
+
+
+def clear_failed_results(run_id) -> int:
+    """
+    Delete a run's errored results so their items are dispatched again, and
+    rebuild the run's summaries without them. Returns the number deleted.
+    """
+    with transaction.atomic():
+        deleted, _ = RunResult.objects.filter(run_id=run_id, metrics__has_key="error").delete()
+        if deleted:
+            rebuild_run_summary(run_id)
+    return deleted
+
+
+class EvalRunEngine:
+    """
+    Executes an EvalRun server-side: streams the eval set items, calls the
+    endpoint integration for each one with bounded concurrency and hands a
+    RunResult per item to a buffered writer that bulk inserts them.
+
+    Items that already have a result for the run are skipped, so running an
+    interrupted run again resumes it. With `retry_failed`, errored results
+    are deleted first so those items are retried too. `row_range` limits the
+    engine to items with row_number in [first, last], e.g. one shard of a run.
+    """
+
+    def __init__(
+        self,
+        run: EvalRun,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        writer: Optional[RunResultWriter] = None,
+        retry_failed: bool = False,
+        row_range: Optional[Tuple[int, int]] = None,
+    ):
+        self.run_id = run.id
+        self.concurrency = (
+            concurrency
+            or run.run_params.get("concurrency")
+            or settings.EVAL_RUN_CONCURRENCY
+        )
+        self.timeout = timeout or settings.EVAL_RUN_REQUEST_TIMEOUT
+        self.transport = transport
+        self.on_progress = on_progress
+        self.writer = writer or RunResultWriter()
+        self.retry_failed = retry_failed
+        self.row_range = row_range
+        self.stats = {"total": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+    async def run(self) -> Dict[str, int]:
+        """
+        Execute the run and record its status: running, then completed or failed.
+        """
+        await EvalRun.objects.filter(id=self.run_id).aupdate(status="running")
+        try:
+            await self.execute()
+        except Exception as e:
+            logger.error(f"Eval run {self.run_id} failed: {str(e)}")
+            await EvalRun.objects.filter(id=self.run_id).aupdate(
+                status="failed", completed_at=timezone.now()
+            )
+            raise
+
+        await EvalRun.objects.filter(id=self.run_id).aupdate(
+            status="completed", completed_at=timezone.now()
+        )
+        return self.stats
+
+    async def execute(self) -> Dict[str, int]:
+        """
+        Dispatch every remaining item without touching the run's status.
+        """
+        run = await EvalRun.objects.select_related(
+            "code_version__eval_set__endpoint_integration",
+            "code_version__endpoint_integration",
+        ).aget(id=self.run_id)
+
+        eval_set, integration = self._resolve_targets(run)
+        if self.retry_failed:
+            retried = await sync_to_async(clear_failed_results)(run.id)
+            logger.info(f"Eval run {run.id}: retrying {retried} failed items")
+        self.stats["skipped"] = await self._in_range(
+            RunResult.objects.filter(run_id=run.id), "eval_set_item__row_number"
+        ).acount()
+        await self._execute(run, eval_set, integration)
+
+        logger.info(
+            f"Eval run {run.id} finished: {self.stats}, writer: {self.writer.flush_stats()}"
+        )
+        return self.stats
+
+    def _in_range(self, queryset, row_number_field: str = "row_number"):
+        if self.row_range is None:
+            return queryset
+        return queryset.filter(**{f"{row_number_field}__range": self.row_range})
+
+    def _resolve_targets(self, run: EvalRun):
+        eval_set = run.code_version.eval_set
+        if not eval_set:
+            raise ValueError("Code version has no eval set to run against")
+
+        integration = run.code_version.endpoint_integration or eval_set.endpoint_integration
+        if not integration:
+            raise ValueError("No endpoint integration configured for this run")
+
+        return eval_set, integration
+
+    async def _execute(self, run: EvalRun, eval_set, integration):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        errors = []
+
+        def finished(task):
+            # Finished tasks are dropped so a long run doesn't hold one per item,
+            # but their errors are kept to fail the run
+            pending.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                errors.append(task.exception())
+
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+
+        async with self.writer, httpx.AsyncClient(
+            limits=limits, timeout=self.timeout, transport=self.transport
+        ) as client:
+            # Items with a result from an earlier attempt are already done
+            done = RunResult.objects.filter(run_id=run.id, eval_set_item_id=OuterRef("pk"))
+            items = (
+                self._in_range(EvalSetItem.objects.filter(eval_set=eval_set))
+                .filter(~Exists(done))
+                .order_by("row_number")
+            )
+            try:
+                async for item in items.aiterator(chunk_size=ITEM_FETCH_CHUNK_SIZE):
+                    if errors:
+                        break
+                    # Acquire before scheduling so only `concurrency` items are held in memory
+                    await semaphore.acquire()
+                    task = asyncio.create_task(
+                        self._process_item(client, run, integration, item, semaphore)
+                    )
+                    pending.add(task)
+                    task.add_done_callback(finished)
+
+                await asyncio.gather(*pending)
+            finally:
+                # Dispatch failed or was cancelled: don't leave items running behind us
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            if errors:
+                raise errors[0]
+
+    async def _process_item(self, client, run, integration, item, semaphore):
+        try:
+            raw_output, metrics = await self._call_endpoint(client, integration, item)
+            await self.writer.add(
+                RunResult(
+                    run=run,
+                    eval_set_item=item,
+                    raw_output=raw_output,
+                    metrics=metrics,
+                )
+            )
+            self.stats["total"] += 1
+            self.stats["failed" if "error" in metrics else "succeeded"] += 1
+            if self.on_progress:
+                # Callbacks may be coroutines, e.g. to persist progress with the async ORM
+                progress = self.on_progress(self.stats["succeeded"], self.stats["failed"])
+                if inspect.isawaitable(progress):
+                    await progress
+        finally:
+            semaphore.release()
+
+    async def _call_endpoint(self, client, integration, item):
+        params = build_request_params(integration, item)
+        start_time = time.perf_counter()
+        try:
+            if integration.http_method == "GET":
+                response = await client.get(integration.endpoint_url, params=params)
+            else:
+                response = await client.request(
+                    integration.http_method, integration.endpoint_url, json=params
+                )
+        except httpx.HTTPError as e:
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            logger.warning(f"Request for row {item.row_number} failed: {str(e)}")
+            return "", {"error": str(e) or type(e).__name__, "latency_ms": latency_ms}
+
+        metrics = {
+            "status_code": response.status_code,
+            "latency_ms": (time.perf_counter() - start_time) * 1000,
+        }
+        if response.is_error:
+            metrics["error"] = f"HTTP {response.status_code}"
+        return response.text, metrics
+
+
+def execute_eval_run(run: EvalRun, **kwargs) -> Dict[str, int]:
+    """
+    Synchronous entry point for running an EvalRun to completion.
+    """
+    engine = EvalRunEngine(run, **kwargs)
+    return async_to_sync(engine.run)()
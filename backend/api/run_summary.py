@@ -0,0 +1,282 @@
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RunMetricSummary, RunResult
+
+# Quantile estimates are within this relative error of the true value
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+# Magnitudes below this are counted as zero
+SKETCH_MIN_VALUE = 1e-9
+
+SUMMARY_QUANTILES = (0.5, 0.95)
+
+MetricKey = Tuple[str, str]
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch). A value x > 0 is counted in
+    bucket ceil(log_gamma(x)), so every value in a bucket is within
+    SKETCH_RELATIVE_ACCURACY of the bucket's midpoint. Sketches merge by
+    adding bucket counts, which is what lets summaries be updated one batch
+    of results at a time. Stored as {"p": {key: n}, "n": {key: n}, "z": n}
+    for positive, negative and zero values.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.positive = {int(k): v for k, v in data.get("p", {}).items()}
+        self.negative = {int(k): v for k, v in data.get("n", {}).items()}
+        self.zero = data.get("z", 0)
+
+    def add(self, value: float) -> None:
+        if abs(value) < SKETCH_MIN_VALUE:
+            self.zero += 1
+            return
+        buckets = self.positive if value > 0 else self.negative
+        key = math.ceil(math.log(abs(value)) / SKETCH_LOG_GAMMA)
+        buckets[key] = buckets.get(key, 0) + 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zero += other.zero
+
+    @property
+    def count(self) -> int:
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zero
+
+    def quantile(self, q: float) -> Optional[float]:
+        count = self.count
+        if not count:
+            return None
+
+        rank = q * (count - 1)
+        seen = 0
+        # Most negative values first, i.e. negative buckets by descending magnitude
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive)) if self.positive else 0.0
+
+    @staticmethod
+    def _bucket_value(key: int) -> float:
+        return 2 * SKETCH_GAMMA**key / (SKETCH_GAMMA + 1)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "p": {str(k): v for k, v in self.positive.items()},
+            "n": {str(k): v for k, v in self.negative.items()},
+            "z": self.zero,
+        }
+
+
+class MetricAggregate:
+    """
+    Count, sum, sum of squares, min/max and a quantile sketch for one metric.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.sum_squares = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.sketch = QuantileSketch()
+
+    @classmethod
+    def from_summary(cls, summary: RunMetricSummary) -> "MetricAggregate":
+        aggregate = cls()
+        aggregate.count = summary.count
+        aggregate.total = summary.total
+        aggregate.sum_squares = summary.sum_squares
+        aggregate.minimum = summary.minimum
+        aggregate.maximum = summary.maximum
+        aggregate.sketch = QuantileSketch(summary.sketch)
+        return aggregate
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.sum_squares += value * value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.sketch.add(value)
+
+    def merge(self, other: "MetricAggregate") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.sum_squares += other.sum_squares
+        if other.count:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "sum_squares": self.sum_squares,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "sketch": self.sketch.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "MetricAggregate":
+        aggregate = cls()
+        aggregate.count = data["count"]
+        aggregate.total = data["total"]
+        aggregate.sum_squares = data["sum_squares"]
+        aggregate.minimum = data["minimum"]
+        aggregate.maximum = data["maximum"]
+        aggregate.sketch = QuantileSketch(data["sketch"])
+        return aggregate
+
+    def apply_to(self, summary: RunMetricSummary) -> None:
+        summary.count = self.count
+        summary.total = self.total
+        summary.sum_squares = self.sum_squares
+        summary.minimum = self.minimum
+        summary.maximum = self.maximum
+        summary.sketch = self.sketch.to_json()
+
+
+def aggregates_to_json(aggregates: Dict[MetricKey, MetricAggregate]) -> Dict[str, Any]:
+    return {f"{source}:{name}": aggregate.to_json() for (source, name), aggregate in aggregates.items()}
+
+
+def aggregates_from_json(data: Dict[str, Any]) -> Dict[MetricKey, MetricAggregate]:
+    return {
+        tuple(key.split(":", 1)): MetricAggregate.from_json(value) for key, value in data.items()
+    }
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return float(value)
+    return None
+
+
+def aggregate_results(
+    results: Iterable[RunResult], sources: Tuple[str, ...] = ("run", "metrics", "scores")
+) -> Dict[MetricKey, MetricAggregate]:
+    """
+    Aggregate the numeric values of a batch of results' metrics and scores,
+    plus a ("run", "failed") metric whose count is the number of results and
+    whose sum is the number that errored.
+    """
+    aggregates: Dict[MetricKey, MetricAggregate] = defaultdict(MetricAggregate)
+    for result in results:
+        if "run" in sources:
+            aggregates[("run", "failed")].add(1.0 if "error" in result.metrics else 0.0)
+        for source in ("metrics", "scores"):
+            if source not in sources:
+                continue
+            for name, value in (getattr(result, source) or {}).items():
+                value = _numeric(value)
+                if value is not None:
+                    aggregates[(source, name)].add(value)
+    return aggregates
+
+
+def apply_run_summary(
+    run_id, aggregates: Dict[MetricKey, MetricAggregate], replace: bool = False
+) -> None:
+    """
+    Merge `aggregates` into the run's summary rows, or overwrite them when
+    `replace` is set. Rows are created first (ignoring ones that exist) and
+    then locked, so concurrent writers for the same run never lose updates.
+    """
+    if not aggregates:
+        return
+
+    # Rows are inserted and locked in one fixed (source, name) order so
+    # concurrent writers can't deadlock on the unique index or the row locks
+    keys = sorted(aggregates)
+    with transaction.atomic():
+        RunMetricSummary.objects.bulk_create(
+            [RunMetricSummary(run_id=run_id, source=source, name=name) for source, name in keys],
+            ignore_conflicts=True,
+        )
+        pairs = Q()
+        for source, name in keys:
+            pairs |= Q(source=source, name=name)
+        summaries = (
+            RunMetricSummary.objects.select_for_update()
+            .filter(pairs, run_id=run_id)
+            .order_by("source", "name")
+        )
+
+        now = timezone.now()
+        updated = []
+        for summary in summaries:
+            aggregate = aggregates.get((summary.source, summary.name))
+            if aggregate is None:
+                continue
+            if not replace:
+                merged = MetricAggregate.from_summary(summary)
+                merged.merge(aggregate)
+                aggregate = merged
+            aggregate.apply_to(summary)
+            summary.updated_at = now
+            updated.append(summary)
+
+        RunMetricSummary.objects.bulk_update(
+            updated,
+            ["count", "total", "sum_squares", "minimum", "maximum", "sketch", "updated_at"],
+        )
+
+
+def rebuild_run_summary(run_id, batch_size: int = 2000) -> None:
+    """
+    Recompute a run's summary from all of its results, e.g. after results
+    were deleted or edited outside the writer.
+    """
+    results = RunResult.objects.filter(run_id=run_id).only("id", "metrics", "scores").order_by()
+    aggregates = aggregate_results(results.iterator(chunk_size=batch_size))
+
+    with transaction.atomic():
+        RunMetricSummary.objects.filter(run_id=run_id).delete()
+        apply_run_summary(run_id, aggregates)
+
+
+def summary_response(summary: RunMetricSummary) -> Dict[str, Any]:
+    count = summary.count
+    mean = summary.total / count if count else None
+    stddev = None
+    if count > 1:
+        variance = (summary.sum_squares - count * mean * mean) / (count - 1)
+        stddev = math.sqrt(max(variance, 0.0))
+
+    sketch = QuantileSketch(summary.sketch)
+    response = {
+        "source": summary.source,
+        "name": summary.name,
+        "count": count,
+        "mean": mean,
+        "stddev": stddev,
+        "min": summary.minimum,
+        "max": summary.maximum,
+    }
+    for q in SUMMARY_QUANTILES:
+        response[f"p{int(q * 100)}"] = sketch.quantile(q)
+    return response
@@ -0,0 +1,74 @@
+from typing import Optional
+
+from django.core.cache import caches
+
+from .helpers import aretrieve_csv
+
+SAMPLE_CACHE_ALIAS = "eval_set_samples"
+
+# Sample size warmed at upload time; matches the default used by the views
+PREFILL_SAMPLE_SIZE = 5
+
+# Larger samples bypass the cache, which keeps invalidation to a bounded key set
+MAX_CACHED_SAMPLE_SIZE = 50
+
+
+def _cacheable(sample_size: int) -> bool:
+    # Must match the sizes _all_sample_keys() invalidates
+    return 1 <= sample_size <= MAX_CACHED_SAMPLE_SIZE
+
+
+def _sample_key(eval_set_id, sample_size: int) -> str:
+    return f"eval_set_sample:{eval_set_id}:{sample_size}"
+
+
+def get_cached_sample(eval_set_id, sample_size: int) -> Optional[dict]:
+    if not _cacheable(sample_size):
+        return None
+    return caches[SAMPLE_CACHE_ALIAS].get(_sample_key(eval_set_id, sample_size))
+
+
+async def aget_cached_sample(eval_set_id, sample_size: int) -> Optional[dict]:
+    if not _cacheable(sample_size):
+        return None
+    return await caches[SAMPLE_CACHE_ALIAS].aget(_sample_key(eval_set_id, sample_size))
+
+
+async def acache_sample(eval_set_id, sample_size: int, csv_data: dict) -> None:
+    if not _cacheable(sample_size):
+        return
+    await caches[SAMPLE_CACHE_ALIAS].aset(_sample_key(eval_set_id, sample_size), csv_data)
+
+
+def _all_sample_keys(eval_set_id):
+    return [_sample_key(eval_set_id, size) for size in range(1, MAX_CACHED_SAMPLE_SIZE + 1)]
+
+
+def invalidate_eval_set_samples(eval_set_id) -> None:
+    caches[SAMPLE_CACHE_ALIAS].delete_many(_all_sample_keys(eval_set_id))
+
+
+async def ainvalidate_eval_set_samples(eval_set_id) -> None:
+    await caches[SAMPLE_CACHE_ALIAS].adelete_many(_all_sample_keys(eval_set_id))
+
+
+async def aget_eval_set_sample(eval_set, sample_size: int = PREFILL_SAMPLE_SIZE) -> Optional[dict]:
+    """
+    Return sample rows for an eval set, reading through the sample cache.
+    Eval set files are immutable once uploaded, so entries only go stale
+    when the eval set itself changes or is deleted.
+
+    Returns:
+        dict: Contains 'sample_rows' (list of dicts) and 'total_rows' (int),
+        or None if the file could not be read
+    """
+    csv_data = await aget_cached_sample(eval_set.id, sample_size)
+    if csv_data is not None:
+        return csv_data
+
+    csv_data = await aretrieve_csv(
+        eval_set.file_url, sample_size, total_rows=eval_set.row_count
+    )
+    if csv_data:
+        await acache_sample(eval_set.id, sample_size, csv_data)
+    return csv_data
@@ -164,7 +164,7 @@ class GenerateEvalRunnerSchema(Schema):
     endpoint_integration_id: UUID
     eval_set_id: UUID
     instructions: Optional[str] = None
-    sample_size: Optional[int] = 5
+    sample_size: int = 5
 
 
 class GenerateEvalRunnerResponseSchema(Schema):
@@ -183,6 +183,7 @@ class CodeVersionResponseSchema(Schema):
     eval_id: UUID
     version: int
     code: str
+    code_sha256: str
     created_at: datetime
     is_active: bool
     code_version_id: UUID
@@ -199,6 +200,7 @@ class CodeVersionListSchema(Schema):
     id: UUID
     eval_id: UUID
     version: int
+    code_sha256: str
     created_at: datetime
     is_active: bool
     eval_set_id: Optional[UUID] = None
@@ -208,3 +210,132 @@ class CodeVersionListSchema(Schema):
 
     class Config:
         from_attributes = True
+
+
+class JobResponseSchema(Schema):
+    id: UUID
+    kind: str
+    status: str
+    payload: Dict[str, Any]
+    eval_run_id: Optional[UUID] = None
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EvalRunCreateSchema(Schema):
+    code_version_id: UUID
+    run_params: Optional[Dict[str, Any]] = None
+    # Split the run into shards of this many rows for `run_shard_worker`s
+    shard_size: Optional[int] = None
+
+
+class EvalRunResumeSchema(Schema):
+    retry_failed: bool = False
+    force: bool = False
+
+
+class EvalRunResponseSchema(Schema):
+    id: UUID
+    eval_id: UUID
+    code_version_id: UUID
+    run_params: Dict[str, Any]
+    status: str
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    job_id: Optional[UUID] = None
+    shard_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class EvalRunListSchema(Schema):
+    id: UUID
+    eval_id: UUID
+    code_version_id: UUID
+    status: str
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EvalRunShardSchema(Schema):
+    id: UUID
+    index: int
+    first_row: int
+    last_row: int
+    status: str
+    worker: str
+    attempts: int
+    lease_expires_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    stats: Dict[str, Any]
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RunMetricSummarySchema(Schema):
+    source: str
+    name: str
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+
+
+class EvalRunSummarySchema(Schema):
+    run_id: UUID
+    status: str
+    result_count: int
+    failed_count: int
+    metrics: List[RunMetricSummarySchema]
+
+
+class RunComparisonMetricSchema(Schema):
+    name: str
+    higher_is_better: bool
+    paired: int
+    base_mean: Optional[float] = None
+    other_mean: Optional[float] = None
+    mean_delta: Optional[float] = None
+    stddev_delta: Optional[float] = None
+    wins: int
+    losses: int
+    ties: int
+    t_statistic: Optional[float] = None
+    p_value: Optional[float] = None
+    sign_test_p_value: float
+
+
+class RunComparisonItemSchema(Schema):
+    eval_set_item_id: UUID
+    row_number: int
+    base_value: float
+    other_value: float
+    delta: float
+
+
+class RunComparisonSchema(Schema):
+    base_run_id: UUID
+    other_run_id: UUID
+    source: str
+    metrics: List[RunComparisonMetricSchema]
+    regressions: List[RunComparisonItemSchema]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,91 @@
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .metrics import DEFAULT_METRICS, compute_metrics, reference_text
+from .models import EvalRun, RunResult
+from .run_summary import MetricAggregate, MetricKey, apply_run_summary
+
+logger = logging.getLogger(__name__)
+
+
+def score_results(
+    results,
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[], None]] = None,
+) -> Tuple[Dict[str, int], Dict[MetricKey, MetricAggregate]]:
+    """
+    Compute reference-based metrics for every result in the `results`
+    queryset that has a reference output and didn't error, merging them into
+    RunResult.metrics. Results are scored and written back with bulk_update
+    one batch at a time; `on_batch` is called after each one. Returns the
+    counts and an aggregate per computed metric.
+    """
+    batch_size = batch_size or settings.METRICS_BATCH_SIZE
+    stats = {"scored": 0, "skipped": 0}
+    aggregates: Dict[MetricKey, MetricAggregate] = defaultdict(MetricAggregate)
+
+    results = (
+        results.select_related("eval_set_item")
+        .only("id", "raw_output", "metrics", "eval_set_item__reference_output")
+        .order_by("id")
+    )
+
+    batch = []
+    for result in results.iterator(chunk_size=batch_size):
+        reference = (
+            reference_text(result.eval_set_item.reference_output)
+            if result.eval_set_item
+            else None
+        )
+        if reference is None or "error" in result.metrics:
+            stats["skipped"] += 1
+            continue
+
+        batch.append((result, reference))
+        if len(batch) >= batch_size:
+            stats["scored"] += _score_batch(batch, metrics, aggregates)
+            batch = []
+            if on_batch:
+                on_batch()
+
+    if batch:
+        stats["scored"] += _score_batch(batch, metrics, aggregates)
+
+    return stats, aggregates
+
+
+def score_run(
+    run: EvalRun,
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    batch_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Score every result of a run and replace the run's summaries for the
+    computed metrics.
+    """
+    stats, aggregates = score_results(RunResult.objects.filter(run=run), metrics, batch_size)
+    apply_run_summary(run.id, aggregates, replace=True)
+
+    logger.info(f"Scored run {run.id}: {stats}")
+    return stats
+
+
+def _score_batch(batch, metrics, aggregates) -> int:
+    scores = compute_metrics(
+        [result.raw_output for result, _ in batch],
+        [reference for _, reference in batch],
+        metrics,
+    )
+    results = []
+    for (result, _), row_scores in zip(batch, scores):
+        result.metrics = {**result.metrics, **row_scores}
+        results.append(result)
+        for name, value in row_scores.items():
+            aggregates[("metrics", name)].add(value)
+
+    RunResult.objects.bulk_update(results, ["metrics"], batch_size=len(results))
+    return len(results)
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .jobs import default_worker_id, poll
+from .models import EvalRun, EvalRunShard, EvalSetItem, RunMetricSummary, RunResult
+from .result_writer import RunResultWriter
+from .run_engine import EvalRunEngine, clear_failed_results
+from .run_summary import (
+    MetricAggregate,
+    aggregate_results,
+    aggregates_from_json,
+    aggregates_to_json,
+    apply_run_summary,
+    rebuild_run_summary,
+)
+from .scoring import score_results
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """
+    The shard's lease expired and was taken over by another worker.
+    """
+
+
+def create_shards(run: EvalRun, shard_size: Optional[int] = None) -> List[EvalRunShard]:
+    """
+    Split the run's eval set into shards of `shard_size` consecutive row
+    numbers. Only the first and last row numbers are read, so this is cheap
+    however large the eval set is.
+    """
+    shard_size = shard_size or settings.EVAL_RUN_SHARD_SIZE
+    eval_set_id = run.code_version.eval_set_id
+    if not eval_set_id:
+        raise ValueError("Code version has no eval set to run against")
+
+    rows = EvalSetItem.objects.filter(eval_set_id=eval_set_id).aggregate(
+        first=Min("row_number"), last=Max("row_number")
+    )
+    if rows["first"] is None:
+        return []
+
+    return EvalRunShard.objects.bulk_create(
+        [
+            EvalRunShard(
+                run=run,
+                index=index,
+                first_row=first_row,
+                last_row=min(first_row + shard_size - 1, rows["last"]),
+            )
+            for index, first_row in enumerate(range(rows["first"], rows["last"] + 1, shard_size))
+        ]
+    )
+
+
+def shard_eval_run(run: EvalRun, shard_size: Optional[int] = None) -> List[EvalRunShard]:
+    """
+    Create the shards of a new run for shard workers to pick up. A run with
+    nothing to execute is completed straight away.
+    """
+    with transaction.atomic():
+        shards = create_shards(run, shard_size)
+    if not shards:
+        finalize_run_if_done(run.id)
+    return shards
+
+
+def resume_sharded_run(run: EvalRun, retry_failed: bool = False) -> int:
+    """
+    Put the failed shards of a run back in the queue; with `retry_failed`,
+    also delete errored results and requeue completed shards so those items
+    are dispatched again. Running shards are left to their workers: if a
+    worker died, its lease expires and the shard is leased again anyway.
+    Returns the number of shards requeued.
+    """
+    with transaction.atomic():
+        if retry_failed:
+            clear_failed_results(run.id)
+
+        statuses = ["failed", "completed"] if retry_failed else ["failed"]
+        requeued = run.shards.filter(status__in=statuses).update(
+            status="pending",
+            attempts=0,
+            worker="",
+            lease_expires_at=None,
+            error=None,
+            completed_at=None,
+        )
+        EvalRun.objects.filter(id=run.id).update(status="pending", completed_at=None)
+    finalize_run_if_done(run.id)
+    return requeued
+
+
+def _expire_abandoned_shards(now) -> None:
+    # Expired shards that used up their attempts won't be leased again
+    abandoned = EvalRunShard.objects.filter(
+        status="running",
+        lease_expires_at__lt=now,
+        attempts__gte=settings.EVAL_RUN_SHARD_MAX_ATTEMPTS,
+    )
+    run_ids = set(abandoned.values_list("run_id", flat=True))
+    if not run_ids:
+        return
+
+    abandoned.update(status="failed", error="Lease expired", completed_at=now)
+    for run_id in run_ids:
+        finalize_run_if_done(run_id)
+
+
+def lease_shard(worker_id: str, run_id=None) -> Optional[EvalRunShard]:
+    """
+    Lease a pending shard, or a running one whose lease has expired, the same
+    way `claim_next_job` claims jobs.
+    """
+    now = timezone.now()
+    _expire_abandoned_shards(now)
+
+    with transaction.atomic():
+        shards = EvalRunShard.objects.select_for_update(skip_locked=True).filter(
+            Q(status="pending") | Q(status="running", lease_expires_at__lt=now),
+            attempts__lt=settings.EVAL_RUN_SHARD_MAX_ATTEMPTS,
+        )
+        if run_id:
+            shards = shards.filter(run_id=run_id)
+        # Lowest index first, so concurrent runs share workers evenly
+        shard = shards.order_by("index", "id").first()
+        if shard is None:
+            return None
+
+        shard.status = "running"
+        shard.worker = worker_id
+        shard.attempts += 1
+        shard.lease_expires_at = now + timedelta(seconds=settings.EVAL_RUN_SHARD_LEASE_SECONDS)
+        shard.heartbeat_at = now
+        shard.started_at = now
+        shard.error = None
+        shard.save(
+            update_fields=[
+                "status", "worker", "attempts", "lease_expires_at", "heartbeat_at",
+                "started_at", "error",
+            ]
+        )
+        EvalRun.objects.filter(id=shard.run_id, status="pending").update(status="running")
+    return shard
+
+
+def _held(shard: EvalRunShard):
+    # The lease is still ours only if nobody re-leased the shard since
+    return EvalRunShard.objects.filter(
+        id=shard.id, status="running", worker=shard.worker, attempts=shard.attempts
+    )
+
+
+def _lease_renewal() -> Dict[str, Any]:
+    now = timezone.now()
+    return {
+        "lease_expires_at": now + timedelta(seconds=settings.EVAL_RUN_SHARD_LEASE_SECONDS),
+        "heartbeat_at": now,
+    }
+
+
+def renew_lease(shard: EvalRunShard) -> bool:
+    return _held(shard).update(**_lease_renewal()) == 1
+
+
+async def arenew_lease(shard: EvalRunShard) -> bool:
+    return await _held(shard).aupdate(**_lease_renewal()) == 1
+
+
+def complete_shard(shard: EvalRunShard, stats: Dict[str, Any], aggregates) -> None:
+    updated = _held(shard).update(
+        status="completed",
+        stats=stats,
+        metric_aggregates=aggregates_to_json(aggregates),
+        lease_expires_at=None,
+        completed_at=timezone.now(),
+    )
+    if not updated:
+        raise LeaseLost(f"Lost the lease on shard {shard.id}")
+    finalize_run_if_done(shard.run_id)
+
+
+def fail_shard(shard: EvalRunShard, error: str) -> None:
+    """
+    Release a shard after an error: it goes back to pending until it has
+    used up EVAL_RUN_SHARD_MAX_ATTEMPTS, then it fails.
+    """
+    exhausted = shard.attempts >= settings.EVAL_RUN_SHARD_MAX_ATTEMPTS
+    _held(shard).update(
+        status="failed" if exhausted else "pending",
+        worker="",
+        lease_expires_at=None,
+        error=error,
+        completed_at=timezone.now() if exhausted else None,
+    )
+    finalize_run_if_done(shard.run_id)
+
+
+def finalize_run_if_done(run_id) -> bool:
+    """
+    Once no shard of a run is pending or running, build the run's summaries
+    from the shards' metric aggregates and mark the run completed, or failed
+    if any shard failed. Serialized on the run row, so shards finishing
+    together finalize once each without clobbering each other.
+    """
+    with transaction.atomic():
+        run = EvalRun.objects.select_for_update().get(id=run_id)
+        shards = EvalRunShard.objects.filter(run_id=run_id)
+        if shards.filter(status__in=["pending", "running"]).exists():
+            return False
+
+        failed = shards.filter(status="failed").exists()
+        if failed:
+            # Failed shards have no aggregates for the results they did write
+            rebuild_run_summary(run_id)
+        else:
+            merged = defaultdict(MetricAggregate)
+            for data in shards.values_list("metric_aggregates", flat=True):
+                for key, aggregate in aggregates_from_json(data).items():
+                    merged[key].merge(aggregate)
+            RunMetricSummary.objects.filter(run_id=run_id).delete()
+            apply_run_summary(run_id, merged)
+
+        run.status = "failed" if failed else "completed"
+        run.completed_at = timezone.now()
+        run.save(update_fields=["status", "completed_at"])
+    return True
+
+
+async def _execute_with_heartbeat(shard: EvalRunShard, engine: EvalRunEngine) -> Dict[str, int]:
+    task = asyncio.create_task(engine.execute())
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=settings.EVAL_RUN_SHARD_HEARTBEAT_INTERVAL)
+        if done:
+            return task.result()
+        if not await arenew_lease(shard):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise LeaseLost(f"Lost the lease on shard {shard.id}")
+
+
+def run_shard(shard: EvalRunShard) -> None:
+    """
+    Execute and score a leased shard, renewing the lease while it works.
+    Scoring happens here too, so CPU-bound metric computation is spread
+    across shard workers as well as the endpoint calls.
+    """
+    row_range = (shard.first_row, shard.last_row)
+    try:
+        # Flushes skip the run's summary rows, which every shard would contend on;
+        # finalize_run_if_done builds them from the shards' aggregates instead
+        writer = RunResultWriter(summarize=False)
+        engine = EvalRunEngine(shard.run, row_range=row_range, writer=writer)
+        stats = async_to_sync(_execute_with_heartbeat)(shard, engine)
+
+        def heartbeat():
+            if not renew_lease(shard):
+                raise LeaseLost(f"Lost the lease on shard {shard.id}")
+
+        results = RunResult.objects.filter(
+            run_id=shard.run_id, eval_set_item__row_number__range=row_range
+        )
+        score_stats, _ = score_results(results, on_batch=heartbeat)
+        # Everything the writer would have summarized, plus the computed metrics
+        aggregates = aggregate_results(
+            results.only("id", "metrics", "scores").iterator(chunk_size=settings.METRICS_BATCH_SIZE)
+        )
+        complete_shard(shard, {**stats, **score_stats}, aggregates)
+    except LeaseLost as e:
+        # Another worker owns the shard now; leave it to them
+        logger.warning(str(e))
+    except Exception as e:
+        logger.error(f"Shard {shard.id} of run {shard.run_id} failed: {str(e)}")
+        fail_shard(shard, "".join(traceback.format_exception_only(type(e), e)).strip())
+
+
+def run_shard_worker(
+    worker_id: Optional[str] = None,
+    poll_interval: Optional[float] = None,
+    max_shards: Optional[int] = None,
+    burst: bool = False,
+    run_id=None,
+) -> int:
+    """
+    Lease and run shards until `max_shards` have been processed, or, in burst
+    mode, until none are left. Returns the number of shards processed.
+    """
+    worker_id = worker_id or default_worker_id()
+
+    def handle(shard: EvalRunShard) -> None:
+        logger.info(
+            f"Worker {worker_id} running shard {shard.index} of run {shard.run_id} "
+            f"(rows {shard.first_row}-{shard.last_row})"
+        )
+        run_shard(shard)
+
+    return poll(
+        lambda: lease_shard(worker_id, run_id=run_id), handle, poll_interval, max_shards, burst
+    )
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, ContentSettings
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded eval set files live. Files are addressed by the URL
+    returned from `save`, which is what gets stored in EvalSet.file_url.
+    """
+
+    @abstractmethod
+    def save(self, name: str, content, content_type: str = "text/csv") -> str:
+        pass
+
+    @abstractmethod
+    def read(self, url: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        pass
+
+    @abstractmethod
+    def delete(self, url: str) -> None:
+        pass
+
+    # Async variants default to running the sync implementation in a thread
+
+    async def asave(self, name: str, content, content_type: str = "text/csv") -> str:
+        return await asyncio.to_thread(self.save, name, content, content_type)
+
+    async def aread(self, url: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        return await asyncio.to_thread(self.read, url, offset, length)
+
+    async def adelete(self, url: str) -> None:
+        await asyncio.to_thread(self.delete, url)
+
+    def name_from_url(self, url: str) -> str:
+        return url.split("/")[-1]
+
+
+class AzureBlobStorage(StorageBackend):
+    """
+    Azure Blob Storage backend. A single BlobServiceClient, and with it one
+    HTTP connection pool, is shared by every call in the process. Async calls
+    run the same client in a thread rather than opening an aio client per
+    event loop, which under WSGI would mean one per request.
+    """
+
+    def __init__(self, account_name: str, account_key: str, container: str, pool_size: int):
+        self.account_name = account_name
+        self.account_key = account_key
+        self.container = container
+        self.pool_size = pool_size
+        self._container_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def container_client(self):
+        if self._container_client is None:
+            with self._lock:
+                if self._container_client is None:
+                    self._container_client = self._build_container_client()
+        return self._container_client
+
+    def _build_container_client(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size
+        )
+        session.mount("https://", adapter)
+
+        blob_service_client = BlobServiceClient.from_connection_string(
+            self.connection_string,
+            transport=RequestsTransport(session=session, session_owner=False),
+        )
+        return blob_service_client.get_container_client(self.container)
+
+    @property
+    def connection_string(self) -> str:
+        return f"DefaultEndpointsProtocol=https;AccountName={self.account_name};AccountKey={self.account_key};EndpointSuffix=core.windows.net"
+
+    def url(self, name: str) -> str:
+        return f"https://{self.account_name}.blob.core.windows.net/{self.container}/{name}"
+
+    def save(self, name, content, content_type="text/csv"):
+        self.container_client.upload_blob(
+            name=name,
+            data=content,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+        )
+        return self.url(name)
+
+    def read(self, url, offset=0, length=None):
+        blob_client = self.container_client.get_blob_client(self.name_from_url(url))
+        return blob_client.download_blob(offset=offset, length=length).readall()
+
+    def delete(self, url):
+        self.container_client.delete_blob(self.name_from_url(url))
+
+
+class LocalFileSystemStorage(StorageBackend):
+    """
+    Stores eval set files on local disk, for development and benchmarking.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = str(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.root, self.name_from_url(url))
+
+    def save(self, name, content, content_type="text/csv"):
+        os.makedirs(self.root, exist_ok=True)
+        url = f"{self.base_url}/{name}"
+        with open(self.path(url), "wb") as destination:
+            if isinstance(content, bytes):
+                destination.write(content)
+            else:
+                shutil.copyfileobj(content, destination)
+        return url
+
+    def read(self, url, offset=0, length=None):
+        with open(self.path(url), "rb") as source:
+            source.seek(offset)
+            return source.read() if length is None else source.read(length)
+
+    def delete(self, url):
+        os.remove(self.path(url))
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    Keeps eval set files in process memory. Intended for tests.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.files: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def save(self, name, content, content_type="text/csv"):
+        data = content if isinstance(content, bytes) else content.read()
+        with self._lock:
+            self.files[name] = data
+        return f"{self.base_url}/{name}"
+
+    def read(self, url, offset=0, length=None):
+        data = self.files[self.name_from_url(url)]
+        return data[offset:] if length is None else data[offset : offset + length]
+
+    def delete(self, url):
+        with self._lock:
+            del self.files[self.name_from_url(url)]
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def _build_storage() -> StorageBackend:
+    backend = settings.EVAL_SET_STORAGE_BACKEND
+    if backend == "azure":
+        return AzureBlobStorage(
+            account_name=settings.AZURE_STORAGE_ACCOUNT_NAME,
+            account_key=settings.AZURE_STORAGE_ACCOUNT_KEY,
+            container=settings.AZURE_STORAGE_CONTAINER,
+            pool_size=settings.AZURE_STORAGE_POOL_SIZE,
+        )
+    if backend == "local":
+        return LocalFileSystemStorage(
+            root=settings.EVAL_SET_STORAGE_ROOT,
+            base_url=settings.EVAL_SET_STORAGE_BASE_URL,
+        )
+    if backend == "memory":
+        return InMemoryStorage(base_url=settings.EVAL_SET_STORAGE_BASE_URL)
+    raise ValueError(f"Unknown eval set storage backend: {backend}")
+
+
+def get_storage() -> StorageBackend:
+    """
+    Return the process-wide storage backend selected by EVAL_SET_STORAGE_BACKEND.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _build_storage()
+    return _storage
+
+
+def reset_storage():
+    global _storage
+    with _storage_lock:
+        _storage = None
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting.startswith(("EVAL_SET_STORAGE", "AZURE_STORAGE")):
+        reset_storage()
+
+
+setting_changed.connect(_on_setting_changed)
@@ -1,13 +1,68 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from unittest.mock import patch, MagicMock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from unittest.mock import patch, AsyncMock, MagicMock
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
 
-from .models import Project, Eval, EndpointIntegration, CodeVersion
-from .api_endpoint_integrations import generate_eval_runner
-from .schemas import GenerateEvalRunnerSchema
+import httpx
+import openai
+from asgiref.sync import async_to_sync
 
+from .models import (
+    Project,
+    Eval,
+    EndpointIntegration,
+    CodeVersion,
+    EvalSet,
+    EvalSetItem,
+    EvalRun,
+    EvalRunShard,
+    RunResult,
+    Job,
+)
+from .run_engine import EvalRunEngine, execute_eval_run
+from .result_writer import RunResultWriter
+from .jobs import enqueue_job, run_worker
+from .metrics import compute_metrics
+from .scoring import score_run
+from .run_summary import MetricAggregate, QuantileSketch, apply_run_summary
+from .sharding import lease_shard, renew_lease, run_shard_worker
+from .ingest import ingest_csv
+from .pagination import encode_keyset_cursor
+from .helpers import parse_csv_sample
+from .storage import get_storage
+from .sample_cache import get_cached_sample
+from .completion_gateway import (
+    LLMCompletionsGateway,
+    build_messages,
+    get_gateway,
+    _encode_image_file,
+)
+from .completion_cache import CompletionCache
+from .rate_limiter import RateLimiter, TokenBucket
+from .retry import RetryPolicy, retry_after_seconds
+from .api_endpoint_integrations import (
+    generate_eval_runner,
+    get_code_version,
+    list_eval_code_versions,
+    update_code_version,
+)
+from .schemas import CodeVersionUpdateSchema, GenerateEvalRunnerSchema
 
+
+@override_settings(EVAL_SET_STORAGE_BACKEND="memory")
 class GenerateEvalRunnerTestCase(TestCase):
     def setUp(self):
         """Set up test data."""
@@ -32,13 +87,25 @@ class GenerateEvalRunnerTestCase(TestCase):
                 {"prompt": "How are you?", "temperature": 0.8},
             ],
         )
+        file_url = get_storage().save(
+            "test_eval_set.csv",
+            b"prompt,expected_output\nTest prompt 1,Test output 1\nTest prompt 2,Test output 2\n",
+        )
+        self.eval_set = EvalSet.objects.create(
+            name="Test Eval Set",
+            eval=self.eval,
+            endpoint_integration=self.endpoint_integration,
+            file_url=file_url,
+            row_count=2,
+            uploaded_by=self.user,
+        )
 
-    @patch("api.api_endpoint_integrations.LLMCompletionsGateway")
-    def test_generate_eval_runner_success(self, mock_gateway_class):
+    @patch("api.api_endpoint_integrations.get_gateway")
+    def test_generate_eval_runner_success(self, mock_get_gateway):
         """Test successful eval runner generation."""
         # Mock the LLM gateway
         mock_gateway = MagicMock()
-        mock_gateway.create_completion.return_value = """
+        mock_gateway.async_create_completion = AsyncMock(return_value="""
 import requests
 import pandas as pd
 import json
@@ -48,8 +115,8 @@ def main():
     
 if __name__ == "__main__":
     main()
-"""
-        mock_gateway_class.return_value = mock_gateway
+""")
+        mock_get_gateway.return_value = mock_gateway
 
         # Create mock request
         mock_request = MagicMock()
@@ -59,15 +126,12 @@ if __name__ == "__main__":
         test_data = GenerateEvalRunnerSchema(
             eval_id=self.eval.id,
             endpoint_integration_id=self.endpoint_integration.id,
-            csv_sample_rows=[
-                {"prompt": "Test prompt 1", "expected_output": "Test output 1"},
-                {"prompt": "Test prompt 2", "expected_output": "Test output 2"},
-            ],
+            eval_set_id=self.eval_set.id,
             instructions="Test the API responses for accuracy",
         )
 
         # Call the function
-        result = generate_eval_runner(mock_request, test_data)
+        result = async_to_sync(generate_eval_runner)(mock_request, test_data)
 
         # Verify the result
         self.assertIsNotNone(result.generated_code)
@@ -81,11 +145,1324 @@ if __name__ == "__main__":
         self.assertEqual(code_version.created_by, self.user)
 
         # Verify the LLM was called with the right prompt
-        mock_gateway.create_completion.assert_called_once()
-        call_args = mock_gateway.create_completion.call_args[0]
+        mock_gateway.async_create_completion.assert_awaited_once()
+        call_args = mock_gateway.async_create_completion.call_args[0]
         self.assertIn("Test Eval", call_args[0])
         self.assertIn("Test Integration", call_args[0])
         self.assertIn("https://api.example.com/chat", call_args[0])
+        self.assertIn("Test prompt 2", call_args[0])
+
+    def test_generate_rejects_invalid_sample_size(self):
+        """A zero or null sample_size is a client error, not a server error."""
+        payload = {
+            "eval_id": str(self.eval.id),
+            "endpoint_integration_id": str(self.endpoint_integration.id),
+            "eval_set_id": str(self.eval_set.id),
+            "sample_size": 0,
+        }
+        response = self.client.post(
+            "/api/generate-eval-runner", json.dumps(payload), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        payload["sample_size"] = None
+        response = self.client.post(
+            "/api/generate-eval-runner", json.dumps(payload), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 422)
+
+    @patch("api.api_endpoint_integrations.get_gateway")
+    async def test_stream_eval_runner(self, mock_get_gateway):
+        """Tokens are streamed as SSE deltas and the version is saved at the end."""
+        async def stream(prompt):
+            for delta in ["import json\n", "print('hi')\n"]:
+                yield delta
+
+        mock_get_gateway.return_value.async_stream_completion = stream
+
+        response = await self.async_client.post(
+            "/api/generate-eval-runner/stream",
+            json.dumps(
+                {
+                    "eval_id": str(self.eval.id),
+                    "endpoint_integration_id": str(self.endpoint_integration.id),
+                    "eval_set_id": str(self.eval_set.id),
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        events = content.decode().strip().split("\n\n")
+        self.assertEqual(len(events), 3)
+        self.assertTrue(events[0].startswith("event: delta"))
+        done = json.loads(events[2].split("data: ", 1)[1])
+
+        code_version = await CodeVersion.objects.aget(id=done["code_version_id"])
+        self.assertEqual(code_version.code, "import json\nprint('hi')\n")
+        self.assertEqual(done["generated_code"], code_version.code)
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ListPaginationTestCase(TestCase):
+    def setUp(self):
+        """Set up an eval with a handful of endpoint integrations."""
+        self.user = User.objects.create_user(username="pager", password="testpass")
+        self.project = Project.objects.create(name="Page Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Page Eval", project=self.project)
+        for i in range(5):
+            EndpointIntegration.objects.create(
+                name=f"Integration {i}",
+                eval=self.eval,
+                endpoint_url=f"https://api.example.com/{i}",
+                param_schema={"prompt": "string"},
+                test_examples=[{"prompt": "x" * 100}],
+            )
+
+    def test_cursor_walks_every_row_once(self):
+        """Following X-Next-Cursor returns each row once, newest first."""
+        names, cursor, pages = [], None, 0
+        while True:
+            url = f"/api/evals/{self.eval.id}/endpoint-integrations"
+            response = self.client.get(url, {"cursor": cursor} if cursor else {"limit": 2})
+            names += [row["name"] for row in response.json()]
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, [f"Integration {i}" for i in reversed(range(5))])
+
+    def test_fields_projection(self):
+        """Only the requested fields are selected and serialized."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/endpoint-integrations", {"fields": "id,name", "limit": 10}
+            )
+        rows = response.json()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set(rows[0]), {"id", "name"})
+        self.assertNotIn("test_examples", queries[-1]["sql"])
+
+        response = self.client.get("/api/endpoint-integrations", {"fields": "code"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unpaginated_request_returns_every_row(self):
+        """Without limit or cursor the whole list comes back, as for existing callers."""
+        response = self.client.get(f"/api/evals/{self.eval.id}/endpoint-integrations")
+        self.assertEqual(len(response.json()), 5)
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+    def test_invalid_cursor_is_rejected(self):
+        """A cursor whose id isn't a UUID is a 400, not a database error."""
+        for cursor in (
+            encode_keyset_cursor("2026-01-01T00:00:00+00:00", "not-a-uuid"),
+            encode_keyset_cursor("2026-01-01T00:00:00+00:00", 7),
+            "garbage",
+        ):
+            response = self.client.get("/api/endpoint-integrations", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class CodeVersionQueryTestCase(TestCase):
+    def setUp(self):
+        """Set up an eval with several code versions."""
+        self.user = User.objects.create_user(username="versions", password="testpass")
+        self.project = Project.objects.create(name="Version Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Version Eval", project=self.project)
+        self.endpoint_integration = EndpointIntegration.objects.create(
+            name="Versioned",
+            eval=self.eval,
+            endpoint_url="https://api.example.com/v",
+            param_schema={},
+        )
+        self.eval_set = EvalSet.objects.create(
+            name="Version Set",
+            eval=self.eval,
+            file_url="https://example.com/eval-sets/v.csv",
+            uploaded_by=self.user,
+        )
+        self.code_versions = [
+            CodeVersion.objects.create(
+                eval=self.eval,
+                eval_set=self.eval_set,
+                endpoint_integration=self.endpoint_integration,
+                code=f"print({i})",
+                created_by=self.user,
+            )
+            for i in range(5)
+        ]
+
+    def test_list_fetches_related_names_in_one_query(self):
+        """Listing costs the eval lookup plus one query, however many versions exist."""
+        with self.assertNumQueries(2):
+            versions = list_eval_code_versions(MagicMock(), str(self.eval.id))
+        self.assertEqual(len(versions), 5)
+        self.assertEqual(versions[0].version, 5)
+        self.assertEqual(versions[0].eval_set_name, "Version Set")
+        self.assertEqual(versions[0].endpoint_integration_name, "Versioned")
+
+    def test_detail_and_update_avoid_lazy_lookups(self):
+        """Detail is a single query; update only adds the user and version writes."""
+        with self.assertNumQueries(1):
+            detail = get_code_version(MagicMock(), str(self.code_versions[0].id))
+        self.assertEqual(detail.endpoint_integration_name, "Versioned")
+
+        # lookup, user, then the duplicate check and the version insert, each under the eval lock
+        with self.assertNumQueries(12):
+            updated = update_code_version(
+                MagicMock(),
+                str(self.code_versions[0].id),
+                CodeVersionUpdateSchema(code="print('edited')"),
+            )
+        self.assertEqual(updated.version, 6)
+        self.assertEqual(updated.eval_set_name, "Version Set")
+
+    def test_identical_code_reuses_existing_version(self):
+        """Saving code the eval already has re-activates that version instead of copying it."""
+        first = self.code_versions[0]
+        updated = update_code_version(
+            MagicMock(), str(self.code_versions[-1].id), CodeVersionUpdateSchema(code=first.code)
+        )
+        self.assertEqual(updated.id, first.id)
+        self.assertEqual(CodeVersion.objects.filter(eval=self.eval).count(), 5)
+        self.assertEqual(CodeVersion.objects.get(is_active=True).id, first.id)
+
+    def test_list_can_collapse_duplicate_code(self):
+        """Collapsing keeps only the newest version of each distinct code."""
+        CodeVersion.objects.filter(id=self.code_versions[1].id).update(
+            code_sha256=self.code_versions[3].code_sha256
+        )
+        versions = list_eval_code_versions(MagicMock(), str(self.eval.id), collapse_duplicates=True)
+        self.assertEqual([v.version for v in versions], [5, 4, 3, 1])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class CodeVersionConcurrencyTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="concurrent", password="testpass")
+        self.project = Project.objects.create(name="Concurrent Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Concurrent Eval", project=self.project)
+
+    def test_parallel_saves_allocate_distinct_versions(self):
+        """Parallel saves for one eval never collide or leave two active versions."""
+
+        def create_version(i):
+            try:
+                CodeVersion.objects.create(
+                    eval=self.eval, code=f"print({i})", created_by=self.user, is_active=True
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(create_version, range(24)))
+
+        versions = sorted(CodeVersion.objects.filter(eval=self.eval).values_list("version", flat=True))
+        self.assertEqual(versions, list(range(1, 25)))
+        self.assertEqual(CodeVersion.objects.filter(eval=self.eval, is_active=True).count(), 1)
+
+
+class CompressedTextFieldTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="compressor", password="testpass")
+        self.project = Project.objects.create(name="Compress Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Compress Eval", project=self.project)
+
+    def stored_bytes(self, code_version):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT code FROM api_codeversion WHERE id = %s", [code_version.id.hex])
+            return bytes(cursor.fetchone()[0])
+
+    def test_large_values_are_compressed_and_read_back(self):
+        """Large code is stored compressed and loads as the original text."""
+        code = "print('hello world')\n" * 500
+        code_version = CodeVersion.objects.create(eval=self.eval, code=code, created_by=self.user)
+
+        stored = self.stored_bytes(code_version)
+        self.assertEqual(stored[:1], b"z")
+        self.assertLess(len(stored), len(code) // 20)
+        self.assertEqual(CodeVersion.objects.get(id=code_version.id).code, code)
+        self.assertEqual(CodeVersion.objects.filter(code=code).count(), 1)
+
+    @override_settings(COMPRESSED_FIELD_ALGORITHM="none")
+    def test_small_or_uncompressed_values_are_stored_raw(self):
+        """With compression off, values keep a raw header and still load as text."""
+        code_version = CodeVersion.objects.create(eval=self.eval, code="x" * 1000, created_by=self.user)
+        self.assertEqual(self.stored_bytes(code_version), b"r" + b"x" * 1000)
+        self.assertEqual(CodeVersion.objects.values_list("code", flat=True).get(), "x" * 1000)
+
+
+class EvalRunEngineTestCase(TestCase):
+    def setUp(self):
+        """Set up an eval set with items and a run against it."""
+        self.user = User.objects.create_user(username="runner", password="testpass")
+        self.project = Project.objects.create(name="Run Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Run Eval", project=self.project)
+        self.endpoint_integration = EndpointIntegration.objects.create(
+            name="Echo",
+            eval=self.eval,
+            endpoint_url="https://api.example.com/echo",
+            http_method="POST",
+            param_schema={"prompt": "string", "temperature": "number"},
+            param_defaults={"temperature": 0.2},
+        )
+        self.eval_set = EvalSet.objects.create(
+            name="Run Set",
+            eval=self.eval,
+            endpoint_integration=self.endpoint_integration,
+            file_url="https://example.com/eval-sets/run.csv",
+            row_count=20,
+            uploaded_by=self.user,
+        )
+        for i in range(20):
+            EvalSetItem.objects.create(
+                eval_set=self.eval_set,
+                row_number=i + 2,
+                input_payload={"prompt": f"prompt {i}", "ignored": "x"},
+            )
+        self.code_version = CodeVersion.objects.create(
+            eval=self.eval,
+            eval_set=self.eval_set,
+            endpoint_integration=self.endpoint_integration,
+            code="print('hi')",
+            created_by=self.user,
+        )
+        self.run = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+
+    def test_run_writes_result_per_item(self):
+        """Every item gets a RunResult and the run is marked completed."""
+        requests = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            requests.append(body)
+            if body["prompt"] == "prompt 3":
+                return httpx.Response(500, text="boom")
+            return httpx.Response(200, text=f"echo: {body['prompt']}")
+
+        stats = execute_eval_run(
+            self.run, concurrency=4, transport=httpx.MockTransport(handler)
+        )
+
+        self.assertEqual(stats, {"total": 20, "succeeded": 19, "failed": 1, "skipped": 0})
+        self.assertEqual(RunResult.objects.filter(run=self.run).count(), 20)
+        self.assertEqual(requests[0], {"temperature": 0.2, "prompt": requests[0]["prompt"]})
+
+        failed = RunResult.objects.get(run=self.run, eval_set_item__row_number=5)
+        self.assertEqual(failed.metrics["error"], "HTTP 500")
+
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, "completed")
+        self.assertIsNotNone(self.run.completed_at)
+
+    def test_run_without_integration_fails(self):
+        """A run with nothing to call is marked failed."""
+        self.eval_set.endpoint_integration = None
+        self.eval_set.save()
+        self.code_version.endpoint_integration = None
+        self.code_version.save()
+
+        with self.assertRaises(ValueError):
+            execute_eval_run(self.run)
+
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, "failed")
+
+    def test_item_error_fails_the_run(self):
+        """An exception raised while processing an item fails the run instead of being dropped."""
+
+        def on_progress(succeeded, failed):
+            if succeeded == 5:
+                raise RuntimeError("progress store unavailable")
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        with self.assertRaises(RuntimeError):
+            execute_eval_run(
+                self.run, concurrency=4, transport=transport, on_progress=on_progress
+            )
+
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, "failed")
+        self.assertLess(RunResult.objects.filter(run=self.run).count(), 20)
+
+    def test_results_are_flushed_in_batches(self):
+        """The engine's results are bulk inserted in batch_size chunks."""
+        writer = RunResultWriter(batch_size=8, flush_interval=0)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        execute_eval_run(self.run, concurrency=1, transport=transport, writer=writer)
+
+        self.assertEqual(RunResult.objects.filter(run=self.run).count(), 20)
+        self.assertEqual(writer.stats["flushes"], 3)
+        self.assertEqual(writer.flush_stats()["rows"], 20)
+
+    def test_rewriting_an_item_is_ignored(self):
+        """Re-adding results for items that already have one doesn't duplicate them."""
+        items = list(EvalSetItem.objects.filter(eval_set=self.eval_set)[:3])
+
+        async def write(raw_output):
+            async with RunResultWriter(batch_size=10, flush_interval=0) as writer:
+                for item in items:
+                    await writer.add(
+                        RunResult(run=self.run, eval_set_item=item, raw_output=raw_output)
+                    )
+
+        async_to_sync(write)("first")
+        async_to_sync(write)("second")
+
+        results = RunResult.objects.filter(run=self.run)
+        self.assertEqual(results.count(), 3)
+        self.assertFalse(results.filter(raw_output="second").exists())
+        self.assertEqual(self.run.metric_summaries.get(source="run", name="failed").count, 3)
+
+    def test_summary_counts_only_inserted_rows(self):
+        """Results skipped as conflicts, within a batch or against existing rows, aren't summarized."""
+        items = list(EvalSetItem.objects.filter(eval_set=self.eval_set)[:2])
+        RunResult.objects.create(run=self.run, eval_set_item=items[0], metrics={"error": "x"})
+
+        writer = RunResultWriter(batch_size=10, flush_interval=0)
+        writer._write(
+            [
+                RunResult(run=self.run, eval_set_item=items[0], metrics={}),
+                RunResult(run=self.run, eval_set_item=items[1], metrics={}),
+                RunResult(run=self.run, eval_set_item=items[1], metrics={"error": "y"}),
+            ]
+        )
+
+        self.assertEqual(RunResult.objects.filter(run=self.run).count(), 2)
+        failed = self.run.metric_summaries.get(source="run", name="failed")
+        self.assertEqual((failed.count, failed.total), (1, 0.0))
+
+    def test_summary_rows_are_locked_by_exact_key_in_order(self):
+        """Only the (source, name) rows being merged are selected, in key order."""
+        aggregates = {("scores", "f1"): MetricAggregate(), ("metrics", "f1"): MetricAggregate()}
+        for aggregate in aggregates.values():
+            aggregate.add(1.0)
+        apply_run_summary(self.run.id, {("scores", "f1"): aggregates[("scores", "f1")]})
+
+        with CaptureQueriesContext(connection) as queries:
+            apply_run_summary(self.run.id, {("metrics", "f1"): aggregates[("metrics", "f1")]})
+        select = next(q["sql"] for q in queries if q["sql"].startswith("SELECT"))
+        self.assertIn("\"source\" = 'metrics'", select)
+        self.assertIn('ORDER BY "api_runmetricsummary"."source" ASC', select)
+
+        apply_run_summary(self.run.id, aggregates)
+        counts = dict(
+            self.run.metric_summaries.values_list("source", "count").filter(name="f1")
+        )
+        self.assertEqual(counts, {"metrics": 2, "scores": 2})
+
+    def test_rerun_only_dispatches_remaining_items(self):
+        """Items that already have a result are skipped when a run is executed again."""
+        for item in EvalSetItem.objects.filter(eval_set=self.eval_set, row_number__lt=7):
+            RunResult.objects.create(
+                run=self.run, eval_set_item=item, raw_output="done", metrics={}
+            )
+
+        prompts = []
+
+        def handler(request):
+            prompts.append(json.loads(request.content)["prompt"])
+            return httpx.Response(200, text="ok")
+
+        stats = execute_eval_run(self.run, transport=httpx.MockTransport(handler))
+
+        self.assertEqual(stats, {"total": 15, "succeeded": 15, "failed": 0, "skipped": 5})
+        self.assertNotIn("prompt 0", prompts)
+        self.assertEqual(RunResult.objects.filter(run=self.run).count(), 20)
+        self.assertEqual(RunResult.objects.filter(run=self.run, raw_output="done").count(), 5)
+
+    def test_retry_failed_redispatches_errored_items(self):
+        """retry_failed replaces errored results and their summary counts."""
+        def failing(request):
+            if json.loads(request.content)["prompt"] == "prompt 3":
+                return httpx.Response(500, text="boom")
+            return httpx.Response(200, text="ok")
+
+        execute_eval_run(self.run, transport=httpx.MockTransport(failing))
+
+        prompts = []
+
+        def handler(request):
+            prompts.append(json.loads(request.content)["prompt"])
+            return httpx.Response(200, text="recovered")
+
+        stats = execute_eval_run(
+            self.run, transport=httpx.MockTransport(handler), retry_failed=True
+        )
+
+        self.assertEqual(prompts, ["prompt 3"])
+        self.assertEqual(stats["skipped"], 19)
+        self.assertFalse(
+            RunResult.objects.filter(run=self.run, metrics__has_key="error").exists()
+        )
+        summary = self.run.metric_summaries.get(source="run", name="failed")
+        self.assertEqual((summary.count, summary.total), (20, 0.0))
+
+    def test_summary_is_updated_as_results_are_written(self):
+        """The summary endpoint reports aggregates maintained by the writer."""
+        def handler(request):
+            if json.loads(request.content)["prompt"] in ("prompt 3", "prompt 4"):
+                return httpx.Response(500, text="boom")
+            return httpx.Response(200, text="ok")
+
+        writer = RunResultWriter(batch_size=8, flush_interval=0)
+        execute_eval_run(
+            self.run, concurrency=1, transport=httpx.MockTransport(handler), writer=writer
+        )
+
+        response = self.client.get(f"/api/eval-runs/{self.run.id}/summary")
+        body = response.json()
+        self.assertEqual(body["result_count"], 20)
+        self.assertEqual(body["failed_count"], 2)
+
+        metrics = {metric["name"]: metric for metric in body["metrics"]}
+        status = metrics["status_code"]
+        self.assertEqual(status["count"], 20)
+        self.assertAlmostEqual(status["mean"], (18 * 200 + 2 * 500) / 20)
+        self.assertEqual((status["min"], status["max"]), (200, 500))
+        self.assertAlmostEqual(status["p50"], 200, delta=2)
+        self.assertAlmostEqual(status["p95"], 500, delta=5)
+        self.assertEqual(metrics["latency_ms"]["count"], 20)
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        """Set up a code version whose eval set has a few items."""
+        self.user = User.objects.create_user(username="worker", password="testpass")
+        self.project = Project.objects.create(name="Job Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Job Eval", project=self.project)
+        self.endpoint_integration = EndpointIntegration.objects.create(
+            name="Echo",
+            eval=self.eval,
+            endpoint_url="https://api.example.com/echo",
+            param_schema={"prompt": "string"},
+        )
+        self.eval_set = EvalSet.objects.create(
+            name="Job Set",
+            eval=self.eval,
+            endpoint_integration=self.endpoint_integration,
+            file_url="https://example.com/eval-sets/job.csv",
+            row_count=3,
+            uploaded_by=self.user,
+        )
+        for i in range(3):
+            EvalSetItem.objects.create(
+                eval_set=self.eval_set, row_number=i + 2, input_payload={"prompt": str(i)}
+            )
+        self.code_version = CodeVersion.objects.create(
+            eval=self.eval,
+            eval_set=self.eval_set,
+            endpoint_integration=self.endpoint_integration,
+            code="print('hi')",
+            created_by=self.user,
+        )
+
+    def test_queued_run_is_executed_by_worker(self):
+        """A run created through the API stays pending until a worker runs it."""
+        response = self.client.post(
+            "/api/eval-runs",
+            json.dumps({"code_version_id": str(self.code_version.id)}),
+            content_type="application/json",
+        )
+        body = response.json()
+        self.assertEqual(body["status"], "pending")
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        with patch("api.jobs.execute_eval_run", partial(execute_eval_run, transport=transport)):
+            self.assertEqual(run_worker(worker_id="test", burst=True), 1)
+
+        job = Job.objects.get(id=body["job_id"])
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.worker, "test")
+        self.assertEqual(job.progress, {"succeeded": 3, "failed": 0})
+        self.assertEqual(EvalRun.objects.get(id=body["id"]).status, "completed")
+        self.assertEqual(RunResult.objects.filter(run_id=body["id"]).count(), 3)
+
+    def test_resume_queues_run_again(self):
+        """Resuming needs force while a job is active and passes retry_failed to the job."""
+        run = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+        stale = enqueue_job("eval_run", eval_run=run)
+        Job.objects.filter(id=stale.id).update(status="running")
+        url = f"/api/eval-runs/{run.id}/resume"
+
+        response = self.client.post(url, json.dumps({}), content_type="application/json")
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.post(
+            url, json.dumps({"retry_failed": True, "force": True}), content_type="application/json"
+        )
+        body = response.json()
+        self.assertEqual(body["status"], "pending")
+        self.assertNotEqual(body["job_id"], str(stale.id))
+        self.assertEqual(Job.objects.get(id=stale.id).status, "failed")
+        self.assertEqual(Job.objects.get(id=body["job_id"]).payload, {"retry_failed": True})
+
+    def test_failed_job_does_not_stop_worker(self):
+        """Handler errors are recorded on the job and the worker moves on."""
+        bad_job = enqueue_job("generate_eval_runner", {"eval_id": "not-a-uuid"})
+        enqueue_job("eval_run", eval_run=EvalRun.objects.create(
+            eval=self.eval, code_version=self.code_version
+        ))
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        with patch("api.jobs.execute_eval_run", partial(execute_eval_run, transport=transport)):
+            self.assertEqual(run_worker(worker_id="test", burst=True), 2)
+
+        bad_job.refresh_from_db()
+        self.assertEqual(bad_job.status, "failed")
+        self.assertIn("ValidationError", bad_job.error)
+        self.assertEqual(Job.objects.filter(status="completed").count(), 1)
+
+    def test_scoring_error_fails_the_run(self):
+        """A run whose scoring raised isn't left reported as completed."""
+        run = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+        job = enqueue_job("eval_run", eval_run=run)
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        with (
+            patch("api.jobs.execute_eval_run", partial(execute_eval_run, transport=transport)),
+            patch("api.jobs.score_run", side_effect=RuntimeError("scoring failed")),
+        ):
+            run_worker(worker_id="test", burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("scoring failed", job.error)
+        run.refresh_from_db()
+        self.assertEqual(run.status, "failed")
+
+    def test_job_of_dead_worker_is_reclaimed(self):
+        """A running job whose lease expired is claimed again, or failed once out of attempts."""
+        expired = timezone.now() - timedelta(seconds=1)
+        run = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+        orphaned = enqueue_job("eval_run", eval_run=run)
+        Job.objects.filter(id=orphaned.id).update(
+            status="running", worker="dead", attempts=1, lease_expires_at=expired
+        )
+        exhausted_run = EvalRun.objects.create(
+            eval=self.eval, code_version=self.code_version, status="running"
+        )
+        exhausted = enqueue_job("eval_run", eval_run=exhausted_run)
+        Job.objects.filter(id=exhausted.id).update(
+            status="running", worker="dead", attempts=3, lease_expires_at=expired
+        )
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        with patch("api.jobs.execute_eval_run", partial(execute_eval_run, transport=transport)):
+            self.assertEqual(run_worker(worker_id="test", burst=True), 1)
+
+        orphaned.refresh_from_db()
+        self.assertEqual((orphaned.status, orphaned.worker, orphaned.attempts), ("completed", "test", 2))
+        self.assertIsNone(orphaned.lease_expires_at)
+        exhausted.refresh_from_db()
+        self.assertEqual((exhausted.status, exhausted.error), ("failed", "Lease expired"))
+        self.assertEqual(EvalRun.objects.get(id=exhausted_run.id).status, "failed")
+
+    def test_live_lease_is_not_claimed(self):
+        """A job whose worker is still renewing its lease is left alone."""
+        job = enqueue_job("eval_run", eval_run=EvalRun.objects.create(
+            eval=self.eval, code_version=self.code_version
+        ))
+        Job.objects.filter(id=job.id).update(
+            status="running",
+            worker="alive",
+            attempts=1,
+            lease_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(run_worker(worker_id="test", burst=True), 0)
+        self.assertEqual(Job.objects.get(id=job.id).worker, "alive")
+
+
+class RunSummaryTestCase(TestCase):
+    def test_sketch_quantiles_are_within_relative_accuracy(self):
+        """Quantiles of merged sketches match the exact values to within 1%."""
+        values = [float(v) for v in range(1, 10001)]
+        first, second = QuantileSketch(), QuantileSketch()
+        for value in values[::2]:
+            first.add(value)
+        for value in values[1::2]:
+            second.add(value)
+        first.merge(QuantileSketch(second.to_json()))
+
+        self.assertEqual(first.count, 10000)
+        self.assertAlmostEqual(first.quantile(0.5), 5000, delta=50)
+        self.assertAlmostEqual(first.quantile(0.95), 9500, delta=95)
+
+    def test_sketch_handles_zero_and_negative_values(self):
+        sketch = QuantileSketch()
+        for value in (-10.0, -1.0, 0.0, 0.0, 5.0):
+            sketch.add(value)
+        self.assertAlmostEqual(sketch.quantile(0), -10, delta=0.1)
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1), 5, delta=0.05)
+
+
+class RunComparisonTestCase(TestCase):
+    def setUp(self):
+        """Set up two runs over the same items with known per-item scores."""
+        self.user = User.objects.create_user(username="comparer", password="testpass")
+        self.project = Project.objects.create(name="Compare Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Compare Eval", project=self.project)
+        self.eval_set = EvalSet.objects.create(
+            name="Compare Set",
+            eval=self.eval,
+            file_url="https://example.com/eval-sets/compare.csv",
+            uploaded_by=self.user,
+        )
+        self.code_version = CodeVersion.objects.create(
+            eval=self.eval, eval_set=self.eval_set, code="print('hi')", created_by=self.user
+        )
+        self.base = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+        self.other = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+
+        base_scores = [0.9, 0.8, 0.5, 0.5, 0.2, 0.7]
+        other_scores = [0.4, 0.6, 0.5, 0.9, 0.3, None]
+        for i, (base_score, other_score) in enumerate(zip(base_scores, other_scores)):
+            item = EvalSetItem.objects.create(
+                eval_set=self.eval_set, row_number=i + 2, input_payload={"prompt": str(i)}
+            )
+            RunResult.objects.create(
+                run=self.base, eval_set_item=item, raw_output="",
+                metrics={"token_f1": base_score, "latency_ms": 100.0},
+            )
+            metrics = {"latency_ms": 100.0 - i}
+            if other_score is not None:
+                metrics["token_f1"] = other_score
+            RunResult.objects.create(
+                run=self.other, eval_set_item=item, raw_output="", metrics=metrics
+            )
+
+    def compare(self, **params):
+        return self.client.get(
+            f"/api/eval-runs/{self.base.id}/compare/{self.other.id}", params
+        )
+
+    def test_paired_statistics(self):
+        """Deltas, win/loss/tie counts and p-values are computed over paired items."""
+        with self.assertNumQueries(4):
+            response = self.compare(metrics="token_f1,latency_ms", lower_is_better="latency_ms")
+        self.assertEqual(response.status_code, 200)
+        f1, latency = response.json()["metrics"]
+
+        deltas = [-0.5, -0.2, 0.0, 0.4, 0.1]
+        self.assertEqual(f1["paired"], 5)
+        self.assertEqual((f1["wins"], f1["losses"], f1["ties"]), (2, 2, 1))
+        self.assertAlmostEqual(f1["mean_delta"], sum(deltas) / 5)
+        self.assertAlmostEqual(f1["base_mean"], 2.9 / 5)
+        self.assertGreater(f1["p_value"], 0.5)
+        self.assertEqual(f1["sign_test_p_value"], 1.0)
+
+        self.assertFalse(latency["higher_is_better"])
+        self.assertEqual((latency["wins"], latency["losses"], latency["ties"]), (5, 0, 1))
+        self.assertAlmostEqual(latency["sign_test_p_value"], 2 / 2**5)
+
+    def test_regressions_are_paginated_worst_first(self):
+        """Regressed items come back worst first and a cursor walks all of them."""
+        rows, cursor = [], None
+        while True:
+            params = {"metrics": "token_f1", "limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            body = self.compare(**params).json()
+            rows.extend(body["regressions"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual([row["row_number"] for row in rows], [2, 3])
+        self.assertAlmostEqual(rows[0]["delta"], -0.5)
+
+    def test_non_numeric_scores_are_not_cast(self):
+        """Booleans compare as 1/0 like the summaries; strings and objects are left unpaired."""
+        values = [(True, False), (False, True), ("high", 0.5), ({"a": 1}, 0.5), (1, True)]
+        for (base_value, other_value), item in zip(
+            values, EvalSetItem.objects.order_by("row_number")
+        ):
+            RunResult.objects.filter(run=self.base, eval_set_item=item).update(
+                scores={"passed": base_value}
+            )
+            RunResult.objects.filter(run=self.other, eval_set_item=item).update(
+                scores={"passed": other_value}
+            )
+
+        response = self.compare(source="scores", metrics="passed")
+        self.assertEqual(response.status_code, 200)
+        (passed,) = response.json()["metrics"]
+        self.assertEqual(passed["paired"], 3)
+        self.assertEqual((passed["wins"], passed["losses"], passed["ties"]), (1, 1, 1))
+        self.assertEqual([row["row_number"] for row in response.json()["regressions"]], [2])
+
+    def test_malformed_regression_cursor_is_rejected(self):
+        """Cursors with a non-UUID item id or a boolean loss are a 400."""
+        item_id = str(EvalSetItem.objects.first().id)
+        for cursor in (
+            encode_keyset_cursor(0.5, "not-a-uuid"),
+            encode_keyset_cursor(True, item_id),
+            encode_keyset_cursor(0.5, 7),
+        ):
+            response = self.compare(metrics="token_f1", cursor=cursor)
+            self.assertEqual(response.status_code, 400)
+
+    def test_runs_on_different_eval_sets_are_rejected(self):
+        other_set = EvalSet.objects.create(
+            name="Other Set",
+            eval=self.eval,
+            file_url="https://example.com/eval-sets/other.csv",
+            uploaded_by=self.user,
+        )
+        self.other.code_version = CodeVersion.objects.create(
+            eval=self.eval, eval_set=other_set, code="print('other')", created_by=self.user
+        )
+        self.other.save()
+
+        self.assertEqual(self.compare(metrics="token_f1").status_code, 400)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        """Set up a run with results against items that have reference outputs."""
+        self.user = User.objects.create_user(username="scorer", password="testpass")
+        self.project = Project.objects.create(name="Metrics Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Metrics Eval", project=self.project)
+        self.eval_set = EvalSet.objects.create(
+            name="Metrics Set",
+            eval=self.eval,
+            file_url="https://example.com/eval-sets/metrics.csv",
+            uploaded_by=self.user,
+        )
+        self.code_version = CodeVersion.objects.create(
+            eval=self.eval, code="print('hi')", created_by=self.user
+        )
+        self.run = EvalRun.objects.create(eval=self.eval, code_version=self.code_version)
+
+        rows = [
+            ("The answer is 42", "the answer is 42", {"status_code": 200}),
+            ("a cat sat", "the cat sat on the mat", {"status_code": 200}),
+            ("boom", "anything", {"status_code": 500, "error": "HTTP 500"}),
+            ("no reference", None, {"status_code": 200}),
+        ]
+        for i, (output, reference, metrics) in enumerate(rows):
+            item = EvalSetItem.objects.create(
+                eval_set=self.eval_set,
+                row_number=i + 2,
+                input_payload={"prompt": str(i)},
+                reference_output=reference,
+            )
+            RunResult.objects.create(
+                run=self.run, eval_set_item=item, raw_output=output, metrics=metrics
+            )
+
+    def test_compute_metrics_known_values(self):
+        """Scores match hand-computed values and NaN metrics are left out."""
+        scores = compute_metrics(
+            ["The cat sat on the mat", "42.0", "", "hello"],
+            ["the cat sat on a mat", "The answer is 42", "", "world"],
+        )
+
+        self.assertEqual(scores[0]["exact_match"], 0.0)
+        self.assertAlmostEqual(scores[0]["token_f1"], 5 / 6, places=5)
+        self.assertAlmostEqual(scores[0]["rouge_l"], 5 / 6, places=5)
+        self.assertEqual(scores[0]["output_tokens"], 6)
+        self.assertNotIn("numeric_accuracy", scores[0])
+        self.assertEqual(scores[1]["numeric_accuracy"], 1.0)
+        self.assertEqual(scores[2]["exact_match"], 1.0)
+        self.assertEqual(scores[2]["token_f1"], 1.0)
+        self.assertEqual(scores[2]["bleu"], 0.0)
+        self.assertNotIn("length_ratio", scores[2])
+        self.assertEqual(scores[3]["token_f1"], 0.0)
+        self.assertEqual(scores[3]["rouge_l"], 0.0)
+
+    def test_identical_outputs_score_perfectly(self):
+        """An output equal to its reference gets full marks on every metric."""
+        text = "one two three four five six"
+        scores = compute_metrics([text], [text.upper()])[0]
+        for name in ("exact_match", "token_f1", "bleu", "rouge_l", "length_ratio"):
+            self.assertAlmostEqual(scores[name], 1.0, places=5)
+
+    def test_score_run_merges_metrics(self):
+        """Scoring keeps existing metrics and skips errored or unreferenced results."""
+        stats = score_run(self.run, batch_size=10)
+        self.assertEqual(stats, {"scored": 2, "skipped": 2})
+
+        results = {
+            r.raw_output: r.metrics for r in RunResult.objects.filter(run=self.run)
+        }
+        self.assertEqual(results["The answer is 42"]["exact_match"], 1.0)
+        self.assertEqual(results["The answer is 42"]["status_code"], 200)
+        self.assertAlmostEqual(results["a cat sat"]["token_f1"], 2 * 2 / 9, places=5)
+        self.assertEqual(results["boom"], {"status_code": 500, "error": "HTTP 500"})
+        self.assertEqual(results["no reference"], {"status_code": 200})
+
+        # Rescoring replaces the metric summaries rather than adding to them
+        score_run(self.run, batch_size=1)
+        summary = self.run.metric_summaries.get(source="metrics", name="exact_match")
+        self.assertEqual((summary.count, summary.total), (2, 1.0))
+
+
+class ShardedRunTestCase(TestCase):
+    def setUp(self):
+        """Set up a code version whose eval set has ten referenced items."""
+        self.user = User.objects.create_user(username="sharder", password="testpass")
+        self.project = Project.objects.create(name="Shard Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Shard Eval", project=self.project)
+        self.endpoint_integration = EndpointIntegration.objects.create(
+            name="Echo",
+            eval=self.eval,
+            endpoint_url="https://api.example.com/echo",
+            param_schema={"prompt": "string"},
+        )
+        self.eval_set = EvalSet.objects.create(
+            name="Shard Set",
+            eval=self.eval,
+            endpoint_integration=self.endpoint_integration,
+            file_url="https://example.com/eval-sets/shard.csv",
+            row_count=10,
+            uploaded_by=self.user,
+        )
+        for i in range(10):
+            EvalSetItem.objects.create(
+                eval_set=self.eval_set,
+                row_number=i + 2,
+                input_payload={"prompt": str(i)},
+                reference_output="ok",
+            )
+        self.code_version = CodeVersion.objects.create(
+            eval=self.eval,
+            eval_set=self.eval_set,
+            endpoint_integration=self.endpoint_integration,
+            code="print('hi')",
+            created_by=self.user,
+        )
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        self.engine = partial(EvalRunEngine, transport=transport)
+
+    def create_run(self, shard_size):
+        response = self.client.post(
+            "/api/eval-runs",
+            json.dumps({"code_version_id": str(self.code_version.id), "shard_size": shard_size}),
+            content_type="application/json",
+        )
+        return response.json()
+
+    def test_workers_share_a_run(self):
+        """Shards are split by row range, run by several workers and merged at the end."""
+        body = self.create_run(shard_size=4)
+        self.assertEqual(body["shard_count"], 3)
+        self.assertIsNone(body["job_id"])
+        run = EvalRun.objects.get(id=body["id"])
+        self.assertEqual(
+            list(run.shards.values_list("first_row", "last_row")), [(2, 5), (6, 9), (10, 11)]
+        )
+
+        with patch("api.sharding.EvalRunEngine", self.engine):
+            self.assertEqual(run_shard_worker(worker_id="a", max_shards=1), 1)
+            run.refresh_from_db()
+            self.assertEqual(run.status, "running")
+            # Shard flushes leave the run's summary rows to finalization
+            self.assertFalse(run.metric_summaries.exists())
+            self.assertEqual(run_shard_worker(worker_id="b", burst=True), 2)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(RunResult.objects.filter(run=run).count(), 10)
+        self.assertEqual(
+            list(run.shards.values_list("worker", flat=True)), ["a", "b", "b"]
+        )
+        self.assertEqual(run.shards.get(index=0).stats["scored"], 4)
+
+        summary = self.client.get(f"/api/eval-runs/{run.id}/summary").json()
+        metrics = {metric["name"]: metric for metric in summary["metrics"]}
+        self.assertEqual(summary["result_count"], 10)
+        self.assertEqual(metrics["exact_match"]["count"], 10)
+        self.assertEqual(metrics["exact_match"]["mean"], 1.0)
+        self.assertEqual(metrics["latency_ms"]["count"], 10)
+
+    def test_expired_lease_is_taken_over(self):
+        """A shard whose lease wasn't renewed is leased again by another worker."""
+        run = EvalRun.objects.get(id=self.create_run(shard_size=10)["id"])
+        first = lease_shard("a")
+        self.assertIsNone(lease_shard("b"))
+
+        EvalRunShard.objects.filter(id=first.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        second = lease_shard("b")
+
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.attempts, 2)
+        self.assertFalse(renew_lease(first))
+        self.assertTrue(renew_lease(second))
+        self.assertEqual(run.shards.get().worker, "b")
+
+    @override_settings(EVAL_RUN_SHARD_MAX_ATTEMPTS=2)
+    def test_failing_shard_fails_run_until_resumed(self):
+        """A shard is retried up to the attempt limit, then fails the run; resume requeues it."""
+        run = EvalRun.objects.get(id=self.create_run(shard_size=10)["id"])
+
+        with patch.object(EvalRunEngine, "execute", side_effect=RuntimeError("boom")):
+            self.assertEqual(run_shard_worker(worker_id="a", burst=True), 2)
+
+        run.refresh_from_db()
+        shard = run.shards.get()
+        self.assertEqual(run.status, "failed")
+        self.assertEqual((shard.status, shard.attempts), ("failed", 2))
+        self.assertIn("boom", shard.error)
+
+        response = self.client.post(
+            f"/api/eval-runs/{run.id}/resume", json.dumps({}), content_type="application/json"
+        )
+        self.assertEqual(response.json()["status"], "pending")
+        with patch("api.sharding.EvalRunEngine", self.engine):
+            self.assertEqual(run_shard_worker(worker_id="a", burst=True), 1)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(RunResult.objects.filter(run=run).count(), 10)
+
+
+class IngestCsvTestCase(TestCase):
+    def setUp(self):
+        """Set up an empty eval set to ingest into."""
+        self.user = User.objects.create_user(username="ingester", password="testpass")
+        self.project = Project.objects.create(name="Ingest Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Ingest Eval", project=self.project)
+        self.eval_set = EvalSet.objects.create(
+            name="Ingest Set",
+            eval=self.eval,
+            file_url="https://example.com/eval-sets/ingest.csv",
+            uploaded_by=self.user,
+        )
+
+    def test_ingest_creates_items_in_batches(self):
+        """Rows are bulk inserted with line numbers and reference outputs."""
+        content = '\ufeffprompt,expected_output\nhi,hello\n"multi\nline",two\nlast,three\n'
+        upload = SimpleUploadedFile("set.csv", content.encode("utf-8"))
+
+        with self.assertNumQueries(2):
+            row_count = ingest_csv(self.eval_set, upload, batch_size=2)
+
+        self.assertEqual(row_count, 3)
+        items = list(EvalSetItem.objects.filter(eval_set=self.eval_set))
+        self.assertEqual([item.row_number for item in items], [2, 3, 5])
+        self.assertEqual(items[0].input_payload, {"prompt": "hi"})
+        self.assertEqual(items[0].reference_output, "hello")
+        self.assertEqual(items[1].input_payload, {"prompt": "multi\nline"})
+        self.assertFalse(upload.closed)
+
+
+class ParseCsvSampleTestCase(TestCase):
+    def test_needs_a_row_past_the_sample(self):
+        """A partial range only yields a sample once the rows are provably complete."""
+        data = b'prompt,answer\na,1\n"b\nstill b",2\nc,3\nd'
+        self.assertIsNone(parse_csv_sample(data[:30], 2, at_eof=False))
+        self.assertEqual(
+            parse_csv_sample(data, 2, at_eof=False),
+            [{"prompt": "a", "answer": "1"}, {"prompt": "b\nstill b", "answer": "2"}],
+        )
+
+    def test_short_file_returns_all_rows_at_eof(self):
+        """A whole file with fewer rows than requested returns what it has."""
+        data = "prompt\nh\u00e9\n".encode("utf-8")
+        self.assertIsNone(parse_csv_sample(data, 5, at_eof=False))
+        self.assertEqual(parse_csv_sample(data, 5, at_eof=True), [{"prompt": "h\u00e9"}])
+
+
+@override_settings(EVAL_SET_STORAGE_BACKEND="memory")
+class EvalSetUploadTestCase(TestCase):
+    def setUp(self):
+        """Set up an eval to upload into."""
+        self.user = User.objects.create_user(username="uploader", password="testpass")
+        self.project = Project.objects.create(name="Upload Project", owner=self.user)
+        self.eval = Eval.objects.create(name="Upload Eval", project=self.project)
+
+    def test_upload_sample_and_delete(self):
+        """An uploaded CSV is stored, ingested, sampled and removed through storage."""
+        upload = SimpleUploadedFile(
+            "greetings_set.csv", b"prompt,expected_output\nhi,hello\nbye,goodbye\n"
+        )
+        response = self.client.post(
+            "/api/eval-sets", {"eval_id": str(self.eval.id), "file": upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["name"], "Greetings Set")
+        self.assertEqual(body["row_count"], 2)
+        self.assertEqual(EvalSetItem.objects.filter(eval_set_id=body["id"]).count(), 2)
+
+        response = self.client.get(f"/api/eval-sets/{body['id']}/sample-data?sample_size=1")
+        self.assertEqual(response.json()["sample_rows"], [{"prompt": "hi", "expected_output": "hello"}])
+        self.assertEqual(response.json()["total_rows"], 2)
+
+        self.client.delete(f"/api/eval-sets/{body['id']}")
+        self.assertEqual(get_storage().files, {})
+
+    def test_sample_prefilled_at_upload_and_invalidated(self):
+        """The default sample is cached at upload and dropped with the eval set."""
+        upload = SimpleUploadedFile("cached.csv", b"prompt\none\ntwo\n")
+        eval_set_id = self.client.post(
+            "/api/eval-sets", {"eval_id": str(self.eval.id), "file": upload}
+        ).json()["id"]
+        get_storage().files.clear()
+
+        response = self.client.get(f"/api/eval-sets/{eval_set_id}/sample-data")
+        self.assertEqual(response.json()["sample_rows"], [{"prompt": "one"}, {"prompt": "two"}])
+        self.assertEqual(get_cached_sample(eval_set_id, 5)["total_rows"], 2)
+
+        self.client.delete(f"/api/eval-sets/{eval_set_id}")
+        self.assertIsNone(get_cached_sample(eval_set_id, 5))
+
+    def test_sample_size_must_be_positive(self):
+        """Non-positive sample sizes are rejected before anything is read or cached."""
+        upload = SimpleUploadedFile("sized.csv", b"prompt\none\n")
+        eval_set_id = self.client.post(
+            "/api/eval-sets", {"eval_id": str(self.eval.id), "file": upload}
+        ).json()["id"]
+
+        for sample_size in (0, -1):
+            response = self.client.get(
+                f"/api/eval-sets/{eval_set_id}/sample-data", {"sample_size": sample_size}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIsNone(get_cached_sample(eval_set_id, sample_size))
+
+        self.client.delete(f"/api/eval-sets/{eval_set_id}")
+
+    def test_malformed_upload_is_rolled_back(self):
+        """A CSV that fails to decode partway through leaves no eval set, items or blob behind."""
+        rows = "".join(f"row {i}\n" for i in range(2000)).encode()
+        upload = SimpleUploadedFile("broken.csv", b"prompt\n" + rows + b"bad \xff\n")
+        stored = dict(get_storage().files)
+        response = self.client.post(
+            "/api/eval-sets", {"eval_id": str(self.eval.id), "file": upload}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid CSV file", response.json()["detail"])
+        self.assertFalse(EvalSet.objects.exists())
+        self.assertFalse(EvalSetItem.objects.exists())
+        self.assertEqual(get_storage().files, stored)
+
+
+class BuildMessagesTestCase(TestCase):
+    def test_text_only_prompt(self):
+        """A prompt without images is a single plain user message."""
+        self.assertEqual(build_messages("hi"), [{"role": "user", "content": "hi"}])
+
+    def test_images_share_one_message_and_are_encoded_once(self):
+        """Local images are encoded once per path and mtime."""
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as image_file:
+            image_file.write(b"fake-jpeg")
+        self.addCleanup(os.remove, image_file.name)
+        _encode_image_file.cache_clear()
+
+        for _ in range(3):
+            messages = build_messages(
+                "describe", [image_file.name, "https://example.com/a.png"]
+            )
+
+        self.assertEqual(len(messages), 1)
+        content = messages[0]["content"]
+        self.assertEqual(content[0], {"type": "text", "text": "describe"})
+        self.assertEqual(
+            content[1]["image_url"]["url"], "data:image/jpeg;base64,ZmFrZS1qcGVn"
+        )
+        self.assertEqual(content[2]["image_url"]["url"], "https://example.com/a.png")
+        self.assertEqual(_encode_image_file.cache_info().misses, 1)
+
+
+class CompletionCacheTestCase(TestCase):
+    def setUp(self):
+        """Set up a gateway with a temporary completion cache and a fake client."""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache = CompletionCache(os.path.join(cache_dir.name, "completions.sqlite3"))
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.gateway = LLMCompletionsGateway(cache=self.cache)
+        self.gateway.client = MagicMock()
+        self.gateway.client.chat.completions.create.return_value.choices = [
+            MagicMock(message=MagicMock(content="cached answer"))
+        ]
+
+    def test_identical_requests_hit_the_cache(self):
+        """Repeating a prompt with the same params is served from the cache."""
+        self.assertEqual(self.gateway.create_completion("score this"), "cached answer")
+        self.assertEqual(self.gateway.create_completion("score this"), "cached answer")
+        self.gateway.create_completion("score this", params={"temperature": 0.5})
+
+        self.assertEqual(self.gateway.client.chat.completions.create.call_count, 2)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2, "entries": 2})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Past max_entries the least recently used entry is dropped."""
+        self.cache.max_entries = 2
+        self.cache.set("a", "1")
+        self.cache.set("b", "2")
+        self.cache.get("a")
+        self.cache.set("c", "3")
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "1")
+
+
+class CompletionBatchTestCase(TestCase):
+    def setUp(self):
+        """Set up a gateway whose single-prompt call is faked."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.gateway = LLMCompletionsGateway(rate_limiter=RateLimiter())
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def fake_completion(prompt, model, images, params):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            if prompt == "bad":
+                raise RuntimeError("rate limited")
+            return prompt.upper()
+
+        self.gateway.async_create_completion = fake_completion
+
+    def test_results_in_order_with_per_item_errors(self):
+        """Batch results keep prompt order and capture failures per item."""
+        prompts = ["a", "bad", "c", "d", "e"]
+        results = asyncio.run(
+            self.gateway.async_create_completions_batch(prompts, max_concurrency=2)
+        )
+
+        self.assertEqual([r.result for r in results], ["A", None, "C", "D", "E"])
+        self.assertIsInstance(results[1].error, RuntimeError)
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_token_bucket_waits_for_refill(self):
+        """Acquiring past capacity waits for the bucket to refill."""
+        bucket = TokenBucket(2, period=0.2)
+
+        async def acquire_three():
+            for _ in range(3):
+                await bucket.acquire(1)
+
+        start_time = time.monotonic()
+        asyncio.run(acquire_three())
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.09)
+
+
+class GatewayRetryTestCase(TestCase):
+    def setUp(self):
+        """Set up a gateway with an immediate retry policy and a fake client."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.gateway = LLMCompletionsGateway(
+                retry_policy=RetryPolicy(max_attempts=3, base_delay=0)
+            )
+        self.gateway.client = MagicMock()
+
+    def _error(self, error_class, status_code, headers=None):
+        response = httpx.Response(
+            status_code,
+            headers=headers,
+            request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+        )
+        return error_class("error", response=response, body=None)
+
+    def test_transient_errors_are_retried(self):
+        """Throttling is retried and counted in the gateway metrics."""
+        success = MagicMock(choices=[MagicMock(message=MagicMock(content="ok"))])
+        self.gateway.client.chat.completions.create.side_effect = [
+            self._error(openai.RateLimitError, 429, {"retry-after": "0"}),
+            self._error(openai.InternalServerError, 503),
+            success,
+        ]
+
+        self.assertEqual(self.gateway.create_completion("hi"), "ok")
+        self.assertEqual(
+            self.gateway.stats(),
+            {"calls": 1, "retries": 2, "retried_calls": 1, "failed_calls": 0},
+        )
+
+    def test_client_errors_are_not_retried(self):
+        """A 400 fails immediately."""
+        self.gateway.client.chat.completions.create.side_effect = self._error(
+            openai.BadRequestError, 400
+        )
+
+        with self.assertRaises(openai.BadRequestError):
+            self.gateway.create_completion("hi")
+        self.assertEqual(self.gateway.client.chat.completions.create.call_count, 1)
+        self.assertEqual(self.gateway.stats()["failed_calls"], 1)
+
+    def test_async_attempts_are_rate_limited_after_the_cache(self):
+        """Each async attempt draws from the rate limiter; cache hits do not."""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.gateway.cache = CompletionCache(os.path.join(cache_dir.name, "completions.sqlite3"))
+        self.gateway.rate_limiter = MagicMock(acquire=AsyncMock())
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(
+            side_effect=[
+                self._error(openai.RateLimitError, 429, {"retry-after": "0"}),
+                MagicMock(choices=[MagicMock(message=MagicMock(content="ok"))]),
+            ]
+        )
+
+        async def complete_twice():
+            return [await self.gateway.async_create_completion("hi") for _ in range(2)]
+
+        with patch.object(LLMCompletionsGateway, "async_client", client):
+            self.assertEqual(asyncio.run(complete_twice()), ["ok", "ok"])
+        self.assertEqual(client.chat.completions.create.await_count, 2)
+        self.assertEqual(self.gateway.rate_limiter.acquire.await_count, 2)
+
+    def test_retry_after_header_is_honored(self):
+        """Retry-After seconds take precedence over backoff."""
+        error = self._error(openai.RateLimitError, 429, {"retry-after": "7"})
+        self.assertEqual(retry_after_seconds(error), 7.0)
+        self.assertEqual(RetryPolicy(base_delay=100).delay(1, error), 7.0)
+
+
+class GatewayRegistryTestCase(TestCase):
+    def test_gateway_is_shared_and_clients_are_lazy(self):
+        """One gateway per process, with instructor wrapping the plain client."""
+        gateway = get_gateway()
+        self.assertIs(get_gateway(), gateway)
+        self.assertNotIn("client", gateway.__dict__)
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.assertIs(gateway.instructor_client.client, gateway.client)
+
+    def test_async_clients_are_closed_with_their_loop(self):
+        """A per-request loop's async client is closed when async_to_sync tears the loop down."""
+        gateway = LLMCompletionsGateway()
+
+        async def use_client():
+            client = gateway.async_client
+            self.assertIs(gateway.async_client, client)
+            return client
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            first = async_to_sync(use_client)()
+            second = async_to_sync(use_client)()
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed())
+        self.assertTrue(second.is_closed())
+
+    def test_import_does_not_load_sdks(self):
+        """Importing the gateway module does not import openai or instructor."""
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, api.completion_gateway; "
+                "print('openai' in sys.modules or 'instructor' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
 
 
 # Create your tests here.
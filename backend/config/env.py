@@ -13,6 +13,44 @@ class Environment:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         return api_key
 
+    @property
+    def COMPLETION_CACHE_PATH(self) -> Optional[str]:
+        """Get the SQLite completion cache path; caching is disabled when unset."""
+        return os.getenv("COMPLETION_CACHE_PATH") or None
+
+    @property
+    def COMPLETION_CACHE_MAX_ENTRIES(self) -> int:
+        """Get the maximum number of cached completions."""
+        return int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "10000"))
+
+    @property
+    def COMPLETION_CACHE_TTL(self) -> Optional[float]:
+        """Get the completion cache TTL in seconds; entries never expire when unset."""
+        ttl = os.getenv("COMPLETION_CACHE_TTL")
+        return float(ttl) if ttl else None
+
+    @property
+    def OPENAI_REQUESTS_PER_MINUTE(self) -> Optional[int]:
+        """Get the OpenAI requests-per-minute budget; unlimited when unset."""
+        value = os.getenv("OPENAI_REQUESTS_PER_MINUTE")
+        return int(value) if value else None
+
+    @property
+    def OPENAI_TOKENS_PER_MINUTE(self) -> Optional[int]:
+        """Get the OpenAI tokens-per-minute budget; unlimited when unset."""
+        value = os.getenv("OPENAI_TOKENS_PER_MINUTE")
+        return int(value) if value else None
+
+    @property
+    def COMPLETION_BATCH_CONCURRENCY(self) -> int:
+        """Get the default number of in-flight requests per completion batch."""
+        return int(os.getenv("COMPLETION_BATCH_CONCURRENCY", "8"))
+
+    @property
+    def COMPLETION_MAX_ATTEMPTS(self) -> int:
+        """Get the maximum attempts per completion call, including the first."""
+        return int(os.getenv("COMPLETION_MAX_ATTEMPTS", "5"))
+
 
 # Global instance
 env = Environment()
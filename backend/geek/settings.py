@@ -123,3 +123,65 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_ALL_ORIGINS = False
+
+# Lets browser clients read the pagination cursor on list responses
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]
+
+# List endpoint pagination
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+
+# Eval run execution
+EVAL_RUN_CONCURRENCY = int(os.getenv("EVAL_RUN_CONCURRENCY", "16"))
+EVAL_RUN_REQUEST_TIMEOUT = float(os.getenv("EVAL_RUN_REQUEST_TIMEOUT", "60"))
+RUN_RESULT_BATCH_SIZE = int(os.getenv("RUN_RESULT_BATCH_SIZE", "500"))
+RUN_RESULT_FLUSH_INTERVAL = float(os.getenv("RUN_RESULT_FLUSH_INTERVAL", "1"))
+METRICS_BATCH_SIZE = int(os.getenv("METRICS_BATCH_SIZE", "2000"))
+
+# Compression for large text columns (RunResult.raw_output, CodeVersion.code):
+# "zstd" (needs the zstandard package), "zlib" or "none"
+COMPRESSED_FIELD_ALGORITHM = os.getenv("COMPRESSED_FIELD_ALGORITHM", "zlib")
+COMPRESSED_FIELD_MIN_SIZE = int(os.getenv("COMPRESSED_FIELD_MIN_SIZE", "256"))
+
+# Background jobs (see `manage.py run_worker`)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Sharded eval runs (see `manage.py run_shard_worker`)
+EVAL_RUN_SHARD_SIZE = int(os.getenv("EVAL_RUN_SHARD_SIZE", "1000"))
+EVAL_RUN_SHARD_LEASE_SECONDS = float(os.getenv("EVAL_RUN_SHARD_LEASE_SECONDS", "60"))
+EVAL_RUN_SHARD_HEARTBEAT_INTERVAL = float(os.getenv("EVAL_RUN_SHARD_HEARTBEAT_INTERVAL", "15"))
+EVAL_RUN_SHARD_MAX_ATTEMPTS = int(os.getenv("EVAL_RUN_SHARD_MAX_ATTEMPTS", "3"))
+
+# Eval set file storage: "azure", "local" or "memory"
+EVAL_SET_STORAGE_BACKEND = os.getenv("EVAL_SET_STORAGE_BACKEND", "azure")
+EVAL_SET_STORAGE_ROOT = os.getenv("EVAL_SET_STORAGE_ROOT", str(BASE_DIR / "eval_set_files"))
+EVAL_SET_STORAGE_BASE_URL = os.getenv(
+    "EVAL_SET_STORAGE_BASE_URL", "http://localhost:8000/eval-set-files"
+)
+AZURE_STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME", "dunesa")
+AZURE_STORAGE_ACCOUNT_KEY = os.getenv("AZURE_ACCOUNT_KEY")
+AZURE_STORAGE_CONTAINER = os.getenv("AZURE_STORAGE_CONTAINER", "geek-evals")
+AZURE_STORAGE_POOL_SIZE = int(os.getenv("AZURE_STORAGE_POOL_SIZE", "20"))
+
+# Caches
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Eval set sample rows; LocMemCache evicts least recently used entries past MAX_ENTRIES
+    "eval_set_samples": {
+        "BACKEND": os.getenv(
+            "EVAL_SET_SAMPLE_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("EVAL_SET_SAMPLE_CACHE_LOCATION", "eval-set-samples"),
+        "TIMEOUT": int(os.getenv("EVAL_SET_SAMPLE_CACHE_TTL", "3600")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("EVAL_SET_SAMPLE_CACHE_MAX_ENTRIES", "1000")),
+        },
+    },
+}
@@ -6,6 +6,8 @@ from api.api_projects import router as projects_router
 from api.api_evals import router as evals_router
 from api.api_eval_sets import router as eval_sets_router
 from api.api_endpoint_integrations import router as integrations_router
+from api.api_eval_runs import router as eval_runs_router
+from api.api_jobs import router as jobs_router
 
 api = NinjaAPI()
 
@@ -17,6 +19,8 @@ api.add_router("", projects_router)
 api.add_router("", evals_router)
 api.add_router("", eval_sets_router)
 api.add_router("", integrations_router)
+api.add_router("", eval_runs_router)
+api.add_router("", jobs_router)
 
 urlpatterns = [
     path("admin/", admin.site.urls),